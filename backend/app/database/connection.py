@@ -1,36 +1,141 @@
 """
 MongoDB Database Connection Configuration
 Uses Motor (async MongoDB driver) with Beanie ODM
+
+The client is created once per worker with pool settings from the
+environment, warmed up with concurrent pings so the first requests don't pay
+for connection setup, and closed from the application lifespan.
 """
 
+import asyncio
+import importlib.util
+import logging
 import os
+from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from dotenv import load_dotenv
 
+from app.database.monitoring import command_monitor, pool_monitor, DB_MONITORING
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # MongoDB connection settings
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "lets_learn")
 
+# Connection pool settings
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "10"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "zstd,snappy,zlib")
+MONGODB_READ_PREFERENCE = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+MONGODB_WARMUP_CONNECTIONS = int(os.getenv("MONGODB_WARMUP_CONNECTIONS", str(MONGODB_MIN_POOL_SIZE)))
 
-async def init_db():
-    """Initialize MongoDB connection and Beanie ODM."""
+# Python module each wire compressor needs (zlib ships with Python)
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+# Index checks at startup
+CHECK_QUERY_PLANS = os.getenv("DB_CHECK_QUERY_PLANS", "false").lower() == "true"
+
+
+def document_models() -> list:
+    """All Beanie document models registered with the database."""
     from app.models.user import User
-    from app.models.progress import Progress
+    from app.models.progress import Progress, LessonProgress
     from app.models.achievement import Achievement, AchievementDefinition
-    from app.models.course import Course, Lesson
+    from app.models.course import Course, Lesson, ContentVersion
+    from app.models.sync import ProcessedEvent, IdempotencyRecord
+    from app.models.jobs import OutboxJob
+    from app.models.classroom import ClassGroup
+    from app.models.analytics import AnalyticsRollup, AnalyticsCheckpoint
+
+    return [
+        User, Progress, LessonProgress, Achievement, AchievementDefinition,
+        Course, Lesson, ContentVersion, ProcessedEvent, IdempotencyRecord, OutboxJob,
+        ClassGroup, AnalyticsRollup, AnalyticsCheckpoint,
+    ]
+
+
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def available_compressors(names: str) -> List[str]:
+    """Keep the configured compressors whose Python module is installed, in order."""
+    available = []
+    for name in (name.strip() for name in names.split(",")):
+        if not name:
+            continue
+        module = COMPRESSOR_MODULES.get(name)
+        if module is None or importlib.util.find_spec(module) is None:
+            logger.info("MongoDB compressor %s is unavailable, skipping it", name)
+            continue
+        available.append(name)
+    return available
 
-    client = AsyncIOMotorClient(MONGODB_URL)
+
+def create_client() -> AsyncIOMotorClient:
+    """Create a Motor client with the configured pool settings."""
+    options = dict(
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        readPreference=MONGODB_READ_PREFERENCE,
+    )
+    compressors = available_compressors(MONGODB_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    options["event_listeners"] = [pool_monitor]
+    if DB_MONITORING:
+        options["event_listeners"].append(command_monitor)
+    return AsyncIOMotorClient(MONGODB_URL, **options)
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Return the client created by init_db()."""
+    if _client is None:
+        raise RuntimeError("Database is not initialized; call init_db() first")
+    return _client
+
+
+async def warm_up(client: AsyncIOMotorClient, connections: int):
+    """Open pool connections ahead of traffic with concurrent pings."""
+    if connections <= 0:
+        return
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(connections)))
+
+
+async def init_db():
+    """Initialize MongoDB connection and Beanie ODM."""
+    from app.database.indexes import report_indexes, check_query_plans
+    global _client
+
+    client = _client = create_client()
+    command_monitor.attach(client, asyncio.get_running_loop())
+    await warm_up(client, min(MONGODB_WARMUP_CONNECTIONS, MONGODB_MAX_POOL_SIZE))
+    models = document_models()
     
+    # init_beanie creates any index declared in a model's Settings.indexes
     await init_beanie(
         database=client[DATABASE_NAME],
-        document_models=[User, Progress, Achievement, AchievementDefinition, Course, Lesson]
+        document_models=models
     )
 
+    await report_indexes(models)
+    if CHECK_QUERY_PLANS:
+        await check_query_plans()
+
 
 async def close_db():
-    """Close MongoDB connection."""
-    # Motor handles connection pooling, explicit close not typically needed
-    pass
+    """Close MongoDB connection and its pool."""
+    global _client
+
+    if _client is not None:
+        _client.close()
+        _client = None
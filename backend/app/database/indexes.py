@@ -0,0 +1,120 @@
+"""
+MongoDB Index Management
+Reports declared vs. existing indexes and checks hot query plans with explain().
+
+Indexes are declared on each model's Settings.indexes and created by init_beanie.
+Run `python -m app.database.indexes` to print the report and plan check on demand.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional, Type
+
+from beanie import Document
+
+logger = logging.getLogger(__name__)
+
+
+def _hot_queries() -> list:
+    """Queries on the request path that must be served by an index."""
+    from app.models.user import User
+    from app.models.progress import Progress, LessonProgress
+    from app.models.achievement import Achievement
+    from app.models.course import Lesson
+    from app.models.classroom import ClassGroup
+
+    # (label, model, filter, sort, limit)
+    return [
+        ("user by username", User, {"username": "scratch_kid"}, None, 1),
+        ("user by email", User, {"email": "kid@example.com"}, None, 1),
+        ("revoked tokens", User, {"tokens_revoked_at": {"$type": "date", "$gte": datetime(2024, 1, 1)}}, None, 0),
+        ("leaderboard", User, {}, [("scratchy_coins", -1)], 10),
+        ("progress by user", Progress, {"user_id": "000000000000000000000000"}, None, 1),
+        ("lesson progress by user", LessonProgress,
+         {"user_id": "000000000000000000000000", "lesson_id": "lesson_001"}, None, 1),
+        ("achievements by user", Achievement, {"user_id": "000000000000000000000000"}, None, 0),
+        ("lesson catalog", Lesson, {"course_id": {"$ne": "daily_challenges"}}, [("order", 1)], 0),
+        ("daily challenges", Lesson, {"course_id": "daily_challenges"}, [("order", 1)], 0),
+        ("classes by owner", ClassGroup, {"owner_id": "000000000000000000000000"}, [("created_at", 1)], 0),
+    ]
+
+
+def declared_index_names(model: Type[Document]) -> List[str]:
+    """Names of the indexes declared in a model's Settings."""
+    return [index.name for index in model.get_settings().indexes or []]
+
+
+async def report_indexes(models: Iterable[Type[Document]]) -> dict:
+    """Compare declared indexes with the ones present in MongoDB and log differences."""
+    report = {}
+    for model in models:
+        collection = model.get_motor_collection()
+        existing = set(await collection.index_information()) - {"_id_"}
+        declared = set(declared_index_names(model))
+
+        missing = sorted(declared - existing)
+        extra = sorted(existing - declared)
+        report[collection.name] = {"missing": missing, "extra": extra}
+
+        if missing:
+            logger.warning("Collection %s is missing indexes: %s", collection.name, ", ".join(missing))
+        if extra:
+            logger.info("Collection %s has undeclared indexes: %s", collection.name, ", ".join(extra))
+    return report
+
+
+def plan_stages(plan, stages: Optional[list] = None) -> list:
+    """Collect every stage name in an explain() plan tree."""
+    if stages is None:
+        stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            plan_stages(value, stages)
+    elif isinstance(plan, list):
+        for item in plan:
+            plan_stages(item, stages)
+    return stages
+
+
+async def check_query_plans() -> List[str]:
+    """Explain every hot query and return the labels of those still doing a COLLSCAN."""
+    collscans = []
+    for label, model, query, sort, limit in _hot_queries():
+        cursor = model.get_motor_collection().find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+
+        explanation = await cursor.explain()
+        stages = plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+        if "COLLSCAN" in stages:
+            collscans.append(label)
+            logger.warning("Hot query '%s' on %s is doing a COLLSCAN", label, model.get_collection_name())
+    return collscans
+
+
+async def main():
+    """Print the index report and query plan check for the configured database."""
+    from app.database.connection import init_db, close_db, document_models
+
+    await init_db()
+
+    report = await report_indexes(document_models())
+    for collection, diff in report.items():
+        print(f"{collection}: missing={diff['missing'] or '-'} extra={diff['extra'] or '-'}")
+
+    collscans = await check_query_plans()
+    if collscans:
+        print(f"Queries doing a COLLSCAN: {', '.join(collscans)}")
+    else:
+        print("All hot queries use an index.")
+
+    await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Data Migrations
+One-off document migrations for schema changes.
+
+Run `python -m app.database.migrations` after deploying a release that needs
+one. Every migration streams the documents it has to change in batches of
+--batch-size with one unordered bulk write per batch, and is idempotent, so
+it can run while the API serves traffic and be re-run after an interruption.
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import date
+from typing import List
+
+from pymongo import UpdateOne
+
+from app.models.progress import Progress
+from app.services.activity_calendar import mark_days
+
+logger = logging.getLogger(__name__)
+
+LEGACY_DAILY_CHALLENGES_FIELD = "daily_challenges_completed"
+
+
+def _parse_days(values) -> List[date]:
+    """Parse ISO dates, skipping anything malformed."""
+    days = []
+    for value in values or []:
+        try:
+            days.append(date.fromisoformat(value))
+        except (TypeError, ValueError):
+            logger.warning("Skipping malformed daily challenge date %r", value)
+    return days
+
+
+async def migrate_daily_challenge_calendar(batch_size: int = 1000) -> int:
+    """
+    Move Progress.daily_challenges_completed (ISO date list) into challenge_calendar.
+
+    Days are OR-ed into the calendar with $bit, so days the API recorded
+    since the deploy are kept, and the list is removed in the same update.
+    """
+    collection = Progress.get_motor_collection()
+    cursor = collection.find(
+        {LEGACY_DAILY_CHALLENGES_FIELD: {"$exists": True}},
+        projection={LEGACY_DAILY_CHALLENGES_FIELD: True},
+        batch_size=batch_size,
+    )
+
+    migrated = 0
+    writes: List[UpdateOne] = []
+
+    async def flush():
+        nonlocal migrated, writes
+        if writes:
+            await collection.bulk_write(writes, ordered=False)
+            migrated += len(writes)
+            logger.info("Migrated %s progress documents", migrated)
+            writes = []
+
+    async for doc in cursor:
+        update = {"$unset": {LEGACY_DAILY_CHALLENGES_FIELD: ""}}
+        days = _parse_days(doc.get(LEGACY_DAILY_CHALLENGES_FIELD))
+        if days:
+            update["$bit"] = mark_days(days)
+        writes.append(UpdateOne(
+            {"_id": doc["_id"], LEGACY_DAILY_CHALLENGES_FIELD: {"$exists": True}},
+            update,
+        ))
+        if len(writes) >= batch_size:
+            await flush()
+    await flush()
+
+    return migrated
+
+
+# Applied in this order
+MIGRATIONS = [
+    ("daily-challenge-calendar", migrate_daily_challenge_calendar),
+]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the Lets Learn data migrations.")
+    parser.add_argument("names", nargs="*", help="migrations to run (default: all)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="documents per bulk write")
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - {name for name, _ in MIGRATIONS}
+    if unknown:
+        parser.error(f"unknown migrations: {', '.join(sorted(unknown))}")
+    return args
+
+
+async def main(argv=None):
+    """Run the selected migrations against the configured database."""
+    from app.database.connection import init_db, close_db
+
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    await init_db()
+    for name, migrate in MIGRATIONS:
+        if args.names and name not in args.names:
+            continue
+        print(f"{name}: {await migrate(args.batch_size)} documents migrated")
+    await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
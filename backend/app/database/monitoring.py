@@ -0,0 +1,358 @@
+"""
+MongoDB Command Monitoring
+Counts and times every MongoDB command per request and logs slow ones.
+
+A pymongo command listener is installed on the client. Motor runs commands
+in executor threads with a copy of the caller's context, so the listener sees
+the request-scoped RequestStats that DBStatsMiddleware puts in a context
+variable and adds each command's duration and collection to it. Totals are
+also kept per (collection, command) and per route template for metrics.
+
+Commands slower than DB_SLOW_COMMAND_MS are logged with the shape of their
+filter (values replaced by "?") and, for explainable commands, a summary of
+the winning plan. Explains run on the event loop, at most once per command
+shape every DB_EXPLAIN_INTERVAL_SECONDS.
+
+With DB_DEBUG_HEADERS=true responses carry X-DB-Commands, X-DB-Time-Ms and
+X-DB-Collections headers. PoolMonitor tracks connection pool usage.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.database.indexes import plan_stages
+
+logger = logging.getLogger(__name__)
+
+# Monitoring settings
+DB_MONITORING = os.getenv("DB_MONITORING", "true").lower() == "true"
+DB_DEBUG_HEADERS = os.getenv("DB_DEBUG_HEADERS", "false").lower() == "true"
+DB_SLOW_COMMAND_MS = float(os.getenv("DB_SLOW_COMMAND_MS", "100"))
+DB_EXPLAIN_SLOW = os.getenv("DB_EXPLAIN_SLOW", "true").lower() == "true"
+DB_EXPLAIN_INTERVAL_SECONDS = float(os.getenv("DB_EXPLAIN_INTERVAL_SECONDS", "60"))
+
+# Driver housekeeping that isn't attributed to requests or logged as slow
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "explain", "buildInfo", "saslStart", "saslContinue"}
+# Commands explain() accepts, with the field holding their filter
+EXPLAINABLE = {"find": "filter", "aggregate": None, "count": "query", "distinct": "query", "findAndModify": "query"}
+# Where non-explainable commands keep their filter
+FILTER_FIELDS = {"update": ("updates", "q"), "delete": ("deletes", "q")}
+# Per-call fields that must not be sent again inside an explain
+SESSION_FIELDS = {"lsid", "txnNumber", "readConcern", "writeConcern", "$db", "$clusterTime", "$readPreference"}
+
+
+class RequestStats:
+    """MongoDB commands issued while handling one request."""
+
+    __slots__ = ("commands", "duration_ms", "collections")
+
+    def __init__(self):
+        self.commands = 0
+        self.duration_ms = 0.0
+        self.collections: Dict[str, int] = {}
+
+
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "db_request_stats", default=None
+)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Stats of the request being handled, if any."""
+    return _request_stats.get()
+
+
+def filter_shape(value):
+    """Replace the values in a filter with "?" while keeping fields and operators."""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [filter_shape(item) for item in value]
+        # Collapse {$in: [...]} style value lists to one element
+        return shapes[:1] if all(shape == "?" for shape in shapes) else shapes
+    return "?"
+
+
+def command_filter(command_name: str, command) -> Optional[dict]:
+    """Extract the filter of a command, if it has one."""
+    if command_name in EXPLAINABLE:
+        field = EXPLAINABLE[command_name]
+        if field is None:
+            pipeline = command.get("pipeline") or [{}]
+            return pipeline[0].get("$match")
+        return command.get(field)
+    if command_name in FILTER_FIELDS:
+        field, key = FILTER_FIELDS[command_name]
+        statements = command.get(field) or [{}]
+        return statements[0].get(key)
+    return None
+
+
+def plan_summary(explanation: dict) -> str:
+    """Summarize the winning plan as its stages plus the indexes it uses."""
+    winning = explanation.get("queryPlanner", {}).get("winningPlan", {})
+    indexes = []
+
+    def collect(plan):
+        if isinstance(plan, dict):
+            if "indexName" in plan:
+                indexes.append(plan["indexName"])
+            for value in plan.values():
+                collect(value)
+        elif isinstance(plan, list):
+            for item in plan:
+                collect(item)
+
+    collect(winning)
+    summary = " <- ".join(plan_stages(winning)) or "unknown"
+    return f"{summary} ({', '.join(indexes)})" if indexes else summary
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Pymongo listener feeding request stats, per-collection totals and the slow log."""
+
+    def __init__(self, slow_ms: float, explain_slow: bool, explain_interval: float):
+        self.slow_ms = slow_ms
+        self.explain_slow = explain_slow
+        self.explain_interval = explain_interval
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Tuple, Tuple[str, Optional[str], object, object]] = {}
+        self._explained: Dict[Tuple[str, str], float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+
+        # Metrics: (collection, command) -> [count, total_ms, max_ms, failures]
+        self.commands: Dict[Tuple[str, str], list] = {}
+        # route template -> [requests, commands, total_ms]
+        self.routes: Dict[str, list] = {}
+        self.slow_commands = 0
+
+    def attach(self, client, loop: asyncio.AbstractEventLoop):
+        """Use this client and loop for explaining slow commands."""
+        self._client = client
+        self._loop = loop
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        # getMore names its collection in a separate field
+        collection = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        with self._lock:
+            self._in_flight[(event.connection_id, event.request_id)] = (
+                event.command_name,
+                collection if isinstance(collection, str) else None,
+                event.database_name,
+                event.command,
+            )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            started = self._in_flight.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        command_name, collection, database_name, command = started
+        duration_ms = event.duration_micros / 1000
+        label = collection or "-"
+
+        with self._lock:
+            totals = self.commands.setdefault((label, command_name), [0, 0.0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += duration_ms
+            totals[2] = max(totals[2], duration_ms)
+            totals[3] += failed
+
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.commands += 1
+                stats.duration_ms += duration_ms
+                stats.collections[label] = stats.collections.get(label, 0) + 1
+
+        if duration_ms >= self.slow_ms:
+            self._log_slow(command_name, collection, database_name, command, duration_ms)
+
+    def _log_slow(self, command_name: str, collection: Optional[str], database_name: str, command, duration_ms: float):
+        self.slow_commands += 1
+        shape = filter_shape(command_filter(command_name, command) or {})
+        logger.warning(
+            "Slow MongoDB command: %s on %s took %.1f ms, filter %s",
+            command_name, collection, duration_ms, shape,
+        )
+        if not (self.explain_slow and command_name in EXPLAINABLE and self._loop and self._client):
+            return
+
+        key = (f"{collection}.{command_name}", repr(shape))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained.get(key, float("-inf")) < self.explain_interval:
+                return
+            self._explained[key] = now
+
+        explain = {field: value for field, value in command.items() if field not in SESSION_FIELDS}
+        self._loop.call_soon_threadsafe(
+            lambda: asyncio.ensure_future(self._explain(database_name, explain, collection, shape))
+        )
+
+    async def _explain(self, database_name: str, command: dict, collection: Optional[str], shape):
+        try:
+            explanation = await self._client[database_name].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+        except Exception as error:
+            logger.info("Could not explain slow command on %s: %s", collection, error)
+            return
+        logger.warning("Slow MongoDB command plan for %s %s: %s", collection, shape, plan_summary(explanation))
+
+    def record_route(self, route: str, stats: RequestStats):
+        """Add a finished request's commands to its route totals."""
+        with self._lock:
+            totals = self.routes.setdefault(route, [0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += stats.commands
+            totals[2] += stats.duration_ms
+
+    def snapshot(self) -> Dict[Tuple[str, str], list]:
+        """Copy of the (collection, command) totals."""
+        with self._lock:
+            return {key: list(totals) for key, totals in self.commands.items()}
+
+    def stats(self) -> dict:
+        """Return per-collection and per-route command totals."""
+        with self._lock:
+            return {
+                "slow_commands": self.slow_commands,
+                "commands": {
+                    f"{collection}.{command_name}": {
+                        "count": count,
+                        "total_ms": round(total_ms, 2),
+                        "max_ms": round(max_ms, 2),
+                        "failures": failures,
+                    }
+                    for (collection, command_name), (count, total_ms, max_ms, failures) in self.commands.items()
+                },
+                "routes": {
+                    route: {
+                        "requests": requests,
+                        "commands_per_request": round(commands / requests, 2),
+                        "db_ms_per_request": round(total_ms / requests, 3),
+                    }
+                    for route, (requests, commands, total_ms) in self.routes.items()
+                },
+            }
+
+
+command_monitor = CommandMonitor(
+    slow_ms=DB_SLOW_COMMAND_MS,
+    explain_slow=DB_EXPLAIN_SLOW,
+    explain_interval=DB_EXPLAIN_INTERVAL_SECONDS,
+)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks open, checked-out and waiting connections across the client's pools."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+
+    def _add(self, **deltas):
+        with self._lock:
+            for field, delta in deltas.items():
+                setattr(self, field, getattr(self, field) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiting=-1, checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+    def stats(self) -> dict:
+        """Return current pool usage."""
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                "checkout_failures": self.checkout_failures,
+            }
+
+
+pool_monitor = PoolMonitor()
+
+
+class DBStatsMiddleware:
+    """ASGI middleware giving each HTTP request its own RequestStats."""
+
+    def __init__(self, app, debug_headers: bool = DB_DEBUG_HEADERS):
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers += [
+                    (b"x-db-commands", str(stats.commands).encode()),
+                    (b"x-db-time-ms", f"{stats.duration_ms:.2f}".encode()),
+                    (b"x-db-collections", ",".join(
+                        f"{collection}:{count}" for collection, count in stats.collections.items()
+                    ).encode()),
+                ]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers if self.debug_headers else send)
+        finally:
+            _request_stats.reset(token)
+            route = scope.get("route")
+            command_monitor.record_route(getattr(route, "path", "(unmatched)"), stats)
@@ -0,0 +1,125 @@
+"""
+Read/Write Routing
+Chooses a read preference per kind of query and tracks causal sessions.
+
+Writes, auth lookups and reads of a user's own progress and badges always
+go to the primary. Catalog, leaderboard and class dashboard reads tolerate
+bounded staleness and use secondaryPreferred with a maxStalenessSeconds cap,
+taking load off the primary that serves coin awards.
+
+Own-progress reads also run in a causally consistent session advanced to the
+user's last write. Sessions are tracked per worker (the last operation and
+cluster time of each user's writes are kept in a bounded LRU), so the
+session alone can't promise read-your-writes when the next request lands on
+another worker; reading from the primary does.
+
+Locally this needs a replica set, e.g. a single-node one started with
+`mongod --replSet rs0` and `rs.initiate()`, with
+MONGODB_URL=mongodb://localhost:27017/?replicaSet=rs0. On a standalone
+server every read simply goes to that server.
+"""
+
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from app.database.connection import get_client
+
+# Routing settings
+MONGODB_SECONDARY_READS = os.getenv("MONGODB_SECONDARY_READS", "true").lower() == "true"
+# MongoDB rejects maxStalenessSeconds below 90
+MONGODB_MAX_STALENESS_SECONDS = max(90, int(os.getenv("MONGODB_MAX_STALENESS_SECONDS", "90")))
+CAUSAL_SESSION_ENTRIES = int(os.getenv("CAUSAL_SESSION_ENTRIES", "10000"))
+
+# Query routes
+PRIMARY = "primary"          # auth lookups and anything feeding a write
+CATALOG = "catalog"          # lessons, courses, badge definitions, content version polling
+LEADERBOARD = "leaderboard"  # leaderboard rebuilds
+USER_READS = "user"          # a user's own progress and badges: primary, in a causal session
+DASHBOARD = "dashboard"      # class dashboards: other users' progress, cached briefly anyway
+REPORTS = "reports"          # admin reports over the analytics rollups
+
+
+def read_preference(route: str):
+    """Return the read preference for a query route."""
+    if route in (PRIMARY, USER_READS) or not MONGODB_SECONDARY_READS:
+        return Primary()
+    return SecondaryPreferred(max_staleness=MONGODB_MAX_STALENESS_SECONDS)
+
+
+def collection(model, route: str = PRIMARY):
+    """Return a model's Motor collection with the route's read preference."""
+    options = {"read_preference": read_preference(route)}
+    if route == USER_READS:
+        # Causal read-your-writes needs majority reads (writes default to w: majority)
+        options["read_concern"] = ReadConcern("majority")
+    return model.get_motor_collection().with_options(**options)
+
+
+def supports_transactions() -> bool:
+    """Whether the deployment runs multi-document transactions (not a standalone server)."""
+    return get_client().topology_description.topology_type_name in (
+        "ReplicaSetWithPrimary", "Sharded", "LoadBalanced"
+    )
+
+
+class CausalSessions:
+    """Causally consistent sessions that remember each user's last write."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._times: "OrderedDict[str, Tuple[Optional[dict], Optional[object]]]" = OrderedDict()
+
+        # Metrics
+        self.sessions = 0
+        self.advanced = 0
+
+    def _record(self, key: str, cluster_time: Optional[dict], operation_time):
+        if operation_time is None:
+            return
+        known = self._times.get(key)
+        if known is not None and known[1] is not None and known[1] >= operation_time:
+            return
+        self._times[key] = (cluster_time, operation_time)
+        self._times.move_to_end(key)
+        while len(self._times) > self.max_entries:
+            self._times.popitem(last=False)
+
+    @asynccontextmanager
+    async def session(self, key=None):
+        """
+        Start a causally consistent session.
+
+        With a key (a user id) the session first catches up with that user's
+        last tracked write, and its own operations are tracked on exit.
+        """
+        key = str(key) if key is not None else None
+        self.sessions += 1
+        async with await get_client().start_session(causal_consistency=True) as session:
+            known = self._times.get(key) if key is not None else None
+            if known is not None:
+                cluster_time, operation_time = known
+                if cluster_time is not None:
+                    session.advance_cluster_time(cluster_time)
+                session.advance_operation_time(operation_time)
+                self.advanced += 1
+
+            yield session
+
+            if key is not None:
+                self._record(key, session.cluster_time, session.operation_time)
+
+    def stats(self) -> dict:
+        """Return session counters."""
+        return {
+            "tracked_users": len(self._times),
+            "sessions": self.sessions,
+            "advanced": self.advanced,
+        }
+
+
+causal_sessions = CausalSessions(max_entries=CAUSAL_SESSION_ENTRIES)
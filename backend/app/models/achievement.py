@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import Optional, List
 from beanie import Document
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING
 
 
 class AchievementDefinition(Document):
@@ -35,6 +36,9 @@ class AchievementDefinition(Document):
     
     class Settings:
         name = "achievement_definitions"
+        indexes = [
+            IndexModel([("achievement_id", ASCENDING)], name="achievement_id_unique", unique=True),
+        ]
         
     class Config:
         json_schema_extra = {
@@ -69,6 +73,15 @@ class Achievement(Document):
     
     class Settings:
         name = "achievements"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("achievement_id", ASCENDING)],
+                name="user_achievement_unique",
+                unique=True,
+            ),
+            # Analytics backfill reads badges by date
+            IndexModel([("earned_at", ASCENDING)], name="earned_at"),
+        ]
         
     class Config:
         json_schema_extra = {
@@ -0,0 +1,56 @@
+"""
+Analytics Models for MongoDB
+Pre-aggregated reporting counters and the state of the nightly rollup.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+
+class AnalyticsRollup(Document):
+    """Counters for one (scope, key, day), e.g. ("lesson", "lesson_001", "2026-10-16")."""
+    
+    scope: str  # daily, lesson, badge, streaks
+    key: str  # "all", lesson_id, achievement_id or streak bucket
+    day: str  # ISO date (UTC)
+    counters: Dict[str, int] = Field(default_factory=dict)
+    
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "analytics_rollups"
+        indexes = [
+            # Upsert and $merge target
+            IndexModel(
+                [("scope", ASCENDING), ("key", ASCENDING), ("day", ASCENDING)],
+                name="scope_key_day_unique",
+                unique=True,
+            ),
+            IndexModel([("scope", ASCENDING), ("day", ASCENDING)], name="scope_day"),
+        ]
+
+
+class AnalyticsCheckpoint(Document):
+    """Lease and progress of the nightly rollup, shared by all workers."""
+    
+    name: str
+    
+    # Incremental counting covers this day onwards; earlier days are backfilled
+    tracking_started: str
+    backfilled_through: Optional[str] = None
+    last_run_day: Optional[str] = None
+    
+    # Lease held by the worker running the rollup
+    owner: Optional[str] = None
+    lease_until: Optional[datetime] = None
+    
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "analytics_checkpoints"
+        indexes = [
+            IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+        ]
@@ -0,0 +1,29 @@
+"""
+Class Group Model for MongoDB
+Groups of students followed by a teacher or parent.
+"""
+
+from datetime import datetime
+from typing import List
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+
+class ClassGroup(Document):
+    """A class (or family) whose members' progress the owner can follow."""
+    
+    name: str = Field(..., min_length=1, max_length=100)
+    owner_id: str  # teacher or parent user id
+    member_ids: List[str] = Field(default_factory=list)  # student user ids
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "class_groups"
+        indexes = [
+            IndexModel([("owner_id", ASCENDING), ("created_at", ASCENDING)], name="owner_created"),
+            IndexModel([("member_ids", ASCENDING)], name="member_ids"),
+        ]
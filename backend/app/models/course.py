@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import Optional, List
 from beanie import Document
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING
 
 
 class LessonContent(Document):
@@ -73,6 +74,10 @@ class Lesson(Document):
     
     class Settings:
         name = "lessons"
+        indexes = [
+            IndexModel([("lesson_id", ASCENDING)], name="lesson_id_unique", unique=True),
+            IndexModel([("course_id", ASCENDING), ("order", ASCENDING)], name="course_order"),
+        ]
         
     class Config:
         json_schema_extra = {
@@ -129,6 +134,9 @@ class Course(Document):
     
     class Settings:
         name = "courses"
+        indexes = [
+            IndexModel([("course_id", ASCENDING)], name="course_id_unique", unique=True),
+        ]
         
     class Config:
         json_schema_extra = {
@@ -143,3 +151,17 @@ class Course(Document):
                 "completion_coins": 50
             }
         }
+
+
+class ContentVersion(Document):
+    """Version counter bumped whenever lessons, courses or badge definitions change."""
+    
+    key: str = Field(default="catalog")
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "content_version"
+        indexes = [
+            IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        ]
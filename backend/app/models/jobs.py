@@ -0,0 +1,32 @@
+"""
+Outbox Job Model for MongoDB
+Durable copy of background jobs so they survive a worker restart.
+"""
+
+from datetime import datetime
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+
+class OutboxJob(Document):
+    """A background job waiting to be processed by a worker."""
+    
+    kind: str  # e.g. evaluate_achievements
+    user_id: str
+    payload: dict = Field(default_factory=dict)
+    attempts: int = Field(default=0)
+    
+    # Lease held by the worker process that is running the job
+    owner: Optional[str] = None
+    lease_until: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "job_outbox"
+        indexes = [
+            IndexModel([("lease_until", ASCENDING)], name="lease_until"),
+        ]
@@ -4,9 +4,10 @@ Tracks user progress through courses, lessons, and challenges.
 """
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional
 from beanie import Document
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING
 
 
 class LessonProgress(Document):
@@ -35,6 +36,15 @@ class LessonProgress(Document):
     
     class Settings:
         name = "lesson_progress"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("lesson_id", ASCENDING)],
+                name="user_lesson_unique",
+                unique=True,
+            ),
+            # Analytics backfill reads completions by date
+            IndexModel([("completed_at", ASCENDING)], name="completed_at"),
+        ]
 
 
 class Progress(Document):
@@ -53,8 +63,8 @@ class Progress(Document):
     longest_streak: int = Field(default=0)
     last_activity_date: Optional[datetime] = None
     
-    # Daily challenges
-    daily_challenges_completed: List[str] = Field(default_factory=list)
+    # Daily challenges: year -> 64-bit words of completed days (see app.services.activity_calendar)
+    challenge_calendar: Dict[str, Dict[str, int]] = Field(default_factory=dict)
     
     # Timestamps
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -62,6 +72,9 @@ class Progress(Document):
     
     class Settings:
         name = "progress"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+        ]
         
     class Config:
         json_schema_extra = {
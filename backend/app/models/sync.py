@@ -0,0 +1,68 @@
+"""
+Idempotency Models for MongoDB
+Remember which offline-sync events and mutating requests were already applied.
+"""
+
+import os
+from datetime import datetime
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+# How long applied event keys are remembered for de-duplication
+SYNC_EVENT_RETENTION_DAYS = int(os.getenv("SYNC_EVENT_RETENTION_DAYS", "30"))
+
+# How long stored responses for Idempotency-Key requests are kept
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+
+
+class ProcessedEvent(Document):
+    """An offline-sync event that has been applied, keyed by its idempotency key."""
+    
+    user_id: str
+    idempotency_key: str
+    event_type: str
+    client_timestamp: datetime
+    
+    # Timestamps
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "processed_events"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+                name="user_key_unique",
+                unique=True,
+            ),
+            IndexModel(
+                [("applied_at", ASCENDING)],
+                name="applied_at_ttl",
+                expireAfterSeconds=SYNC_EVENT_RETENTION_DAYS * 24 * 3600,
+            ),
+        ]
+
+
+class IdempotencyRecord(Document):
+    """Stored outcome of a mutating request sent with an Idempotency-Key header."""
+    
+    scope: str  # route and user, e.g. "add-coins:<user id>"
+    key: str
+    fingerprint: str  # request parameters, to reject a key reused for a different request
+    status: str = Field(default="in_progress")  # in_progress, completed
+    response: Optional[dict] = None
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "idempotency_records"
+        indexes = [
+            IndexModel([("scope", ASCENDING), ("key", ASCENDING)], name="scope_key_unique", unique=True),
+            IndexModel(
+                [("created_at", ASCENDING)],
+                name="created_at_ttl",
+                expireAfterSeconds=IDEMPOTENCY_TTL_HOURS * 3600,
+            ),
+        ]
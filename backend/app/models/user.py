@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import Optional, List
 from beanie import Document
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 
 
 class User(Document):
@@ -17,15 +18,21 @@ class User(Document):
     email: Optional[str] = None
     password_hash: Optional[str] = None  # Hashed password for authentication
     avatar: Optional[str] = Field(default="default_avatar")
-    role: str = Field(default="student")  # student, parent, teacher
+    role: str = Field(default="student")  # student, parent, teacher, admin
     
     # Gamification
     scratchy_coins: int = Field(default=0)
     unlocked_skins: List[str] = Field(default_factory=list)
+    # Badges whose coin reward has been paid
+    rewarded_badges: List[str] = Field(default_factory=list)
     
     # Settings
     preferred_language: str = Field(default="en")  # en, ar
     
+    # Sessions: tokens carrying an older version are rejected
+    token_version: int = Field(default=0)
+    tokens_revoked_at: Optional[datetime] = None
+    
     # Timestamps
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -33,6 +40,23 @@ class User(Document):
     
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+            # Only real addresses must be unique; users without an email are not indexed
+            IndexModel(
+                [("email", ASCENDING)],
+                name="email_unique",
+                unique=True,
+                partialFilterExpression={"email": {"$type": "string"}},
+            ),
+            IndexModel([("scratchy_coins", DESCENDING)], name="scratchy_coins_desc"),
+            # Polled by the token revocation list; only users who ever revoked are indexed
+            IndexModel(
+                [("tokens_revoked_at", ASCENDING)],
+                name="tokens_revoked_at",
+                partialFilterExpression={"tokens_revoked_at": {"$type": "date"}},
+            ),
+        ]
         
     class Config:
         json_schema_extra = {
@@ -0,0 +1,195 @@
+"""
+Admin Router
+Handles reporting over the precomputed analytics rollups.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Depends, status
+
+from app.database.routing import collection, REPORTS
+from app.models.analytics import AnalyticsRollup
+from app.routers.auth import get_token_claims, TokenClaims
+from app.services.analytics import (
+    rollup_scheduler,
+    ALL,
+    BADGE,
+    DAILY,
+    LESSON,
+    STREAKS,
+    STREAK_BUCKETS,
+    STREAK_OVERFLOW,
+)
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+# Longest range a report may cover
+REPORT_MAX_DAYS = 366
+REPORT_DEFAULT_DAYS = 30
+
+
+# Helper Functions
+def require_admin(claims: TokenClaims = Depends(get_token_claims)) -> TokenClaims:
+    """Only admins read reports; checked from the token claims."""
+    if claims.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return claims
+
+
+def _date_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """Resolve an inclusive report range, defaulting to the last 30 days."""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+    if start > end or (end - start).days >= REPORT_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"start must be on or before end, at most {REPORT_MAX_DAYS} days apart"
+        )
+    return start, end
+
+
+def _day_filter(start: date, end: date) -> dict:
+    return {"$gte": start.isoformat(), "$lte": end.isoformat()}
+
+
+async def _totals_by_key(scope: str, start: date, end: date, counters: Tuple[str, ...]) -> list:
+    """Sum a scope's counters per key over the range, reading only rollups."""
+    pipeline = [
+        {"$match": {"scope": scope, "day": _day_filter(start, end)}},
+        {"$group": {
+            "_id": "$key",
+            **{name: {"$sum": {"$ifNull": [f"$counters.{name}", 0]}} for name in counters},
+        }},
+        {"$sort": {counters[0]: -1, "_id": 1}},
+    ]
+    return await collection(AnalyticsRollup, REPORTS).aggregate(pipeline).to_list(length=None)
+
+
+# Routes
+@router.get("/analytics/daily")
+async def get_daily_report(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    _: TokenClaims = Depends(require_admin)
+):
+    """Lessons, challenges, coins, badges and time spent per day."""
+    start, end = _date_range(start, end)
+    cursor = collection(AnalyticsRollup, REPORTS).find(
+        {"scope": DAILY, "key": ALL, "day": _day_filter(start, end)},
+        projection={"_id": False, "day": True, "counters": True},
+        sort=[("day", 1)],
+    )
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": [{"day": doc["day"], **doc.get("counters", {})} async for doc in cursor],
+    }
+
+
+@router.get("/analytics/lessons")
+async def get_lesson_report(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    _: TokenClaims = Depends(require_admin)
+):
+    """
+    Completions, time spent and average time to complete per lesson.
+
+    time_spent_seconds covers every session in the lesson, including users who
+    never finished it; average_time_seconds only covers completions.
+    """
+    start, end = _date_range(start, end)
+    totals = await _totals_by_key(
+        LESSON, start, end, ("completions", "time_spent_seconds", "timed_completions", "completion_time_seconds")
+    )
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "lessons": [
+            {
+                "lesson_id": row["_id"],
+                "completions": row["completions"],
+                "time_spent_seconds": row["time_spent_seconds"],
+                "average_time_seconds": (
+                    round(row["completion_time_seconds"] / row["timed_completions"], 1)
+                    if row["timed_completions"] else None
+                ),
+            }
+            for row in totals
+        ],
+    }
+
+
+@router.get("/analytics/badges")
+async def get_badge_report(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    _: TokenClaims = Depends(require_admin)
+):
+    """How often each badge was earned."""
+    start, end = _date_range(start, end)
+    days = (end - start).days + 1
+    totals = await _totals_by_key(BADGE, start, end, ("earned",))
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "badges": [
+            {
+                "achievement_id": row["_id"],
+                "earned": row["earned"],
+                "earned_per_day": round(row["earned"] / days, 2),
+            }
+            for row in totals
+        ],
+    }
+
+
+@router.get("/analytics/streaks")
+async def get_streak_report(
+    day: Optional[date] = None,
+    _: TokenClaims = Depends(require_admin)
+):
+    """Distribution of current streaks from the latest (or a given day's) snapshot."""
+    rollups = collection(AnalyticsRollup, REPORTS)
+    if day is None:
+        latest = await rollups.find_one({"scope": STREAKS}, projection={"day": True}, sort=[("day", -1)])
+        if latest is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No streak snapshot yet"
+            )
+        day_key = latest["day"]
+    else:
+        day_key = day.isoformat()
+
+    users = {
+        doc["key"]: doc.get("counters", {}).get("users", 0)
+        async for doc in rollups.find({"scope": STREAKS, "day": day_key}, projection={"key": True, "counters": True})
+    }
+    bounds = STREAK_BUCKETS[1:] + [None]
+    buckets = [str(bound) for bound in STREAK_BUCKETS[:-1]] + [STREAK_OVERFLOW]
+    return {
+        "day": day_key,
+        "buckets": [
+            {
+                "min_days": low,
+                "max_days": high - 1 if high is not None else None,
+                "users": users.get(bucket, 0),
+            }
+            for low, high, bucket in zip(STREAK_BUCKETS, bounds, buckets)
+        ],
+    }
+
+
+@router.post("/analytics/rollup")
+async def run_rollup(_: TokenClaims = Depends(require_admin)):
+    """Run the streak snapshot and history backfill now instead of waiting for the daily run."""
+    if not await rollup_scheduler.run(force=True):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A rollup is already running"
+        )
+    return rollup_scheduler.stats()
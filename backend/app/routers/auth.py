@@ -5,14 +5,25 @@ Handles user signup, login, and JWT token management.
 
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, Field
+from bson import ObjectId
 from jose import JWTError, jwt
-import bcrypt
+from pymongo import ReturnDocument
 import os
 
+from app.database.routing import causal_sessions
 from app.models.user import User
+from app.services.hashing import hasher, HashingBusyError, HASH_RETRY_AFTER_SECONDS
+from app.services.user_cache import user_cache
+from app.services.token_revocation import token_revocations
+from app.services.rewards import award_coins
+from app.services.leaderboard import leaderboard
+from app.services.idempotency import idempotency, fingerprint
+from app.services.metrics import LOGINS
+from app.services.achievements import counter_changes, queue_progress_effects
+from app.services.analytics import activity_rows
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 security = HTTPBearer()
@@ -59,14 +70,29 @@ class UserResponse(BaseModel):
 
 
 # Helper Functions
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def _hashing_unavailable() -> HTTPException:
+    """Build the fast-fail response used when the hashing pool is saturated."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins right now, please try again",
+        headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)}
+    )
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password using bcrypt on the hashing executor."""
+    try:
+        return await hasher.hash(password)
+    except HashingBusyError:
+        raise _hashing_unavailable()
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash."""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash on the hashing executor."""
+    try:
+        return await hasher.verify(plain_password, hashed_password)
+    except HashingBusyError:
+        raise _hashing_unavailable()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -77,6 +103,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def create_user_token(user: User) -> str:
+    """Create an access token carrying the user's identity claims."""
+    return create_access_token({
+        "sub": user.username,
+        "uid": str(user.id),
+        "role": user.role,
+        "tv": user.token_version,
+    })
+
+
+def create_scoped_token(claims: "TokenClaims", scope: str, expires_delta: timedelta) -> str:
+    """Create a short-lived token for one purpose, carrying the caller's identity claims."""
+    return create_access_token({
+        "sub": claims.username,
+        "uid": str(claims.user_id),
+        "role": claims.role,
+        "tv": claims.token_version,
+        "scope": scope,
+    }, expires_delta)
+
+
 def decode_token(token: str) -> dict:
     """Decode and verify a JWT token."""
     try:
@@ -89,27 +136,110 @@ def decode_token(token: str) -> dict:
         )
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    """Get the current authenticated user from JWT token."""
-    payload = decode_token(credentials.credentials)
-    user_id = payload.get("sub")
+class TokenClaims:
+    """Identity carried by an access token, trusted without reading the user."""
+
+    __slots__ = ("user_id", "username", "role", "token_version")
+
+    def __init__(self, user_id: ObjectId, username: str, role: str, token_version: int):
+        self.user_id = user_id
+        self.username = username
+        self.role = role
+        self.token_version = token_version
+
+
+def _invalid_token(detail: str = "Invalid token") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail
+    )
+
+
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenClaims:
+    """
+    Get the caller's identity from the JWT alone.
     
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
+    For routes that only need the user id or role: no MongoDB read, only the
+    signature, expiry and an in-memory revocation check.
+    """
+    return await claims_from_token(credentials.credentials)
+
+
+async def claims_from_token(token: str, scope: Optional[str] = None) -> TokenClaims:
+    """
+    Verify a raw token and return its claims (see get_token_claims).
     
-    user = await User.find_one(User.username == user_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    Access tokens have no scope; tokens from create_scoped_token are only
+    accepted where their scope is asked for.
+    """
+    payload = decode_token(token)
+    if payload.get("scope") != scope:
+        raise _invalid_token()
+    username = payload.get("sub")
+    user_id = payload.get("uid")
+    
+    if user_id is None:
+        # Tokens issued before identity claims existed only carry the username
+        # (and cost a user read per request until they expire). They predate
+        # token versions, so they count as version 0 and any logout-all revokes them.
+        if not username:
+            raise _invalid_token()
+        user = await User.find_one(User.username == username)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        token_version = payload.get("tv", 0)
+        if token_version < user.token_version:
+            raise _invalid_token("Token has been revoked")
+        user_cache.put(user)
+        return TokenClaims(user.id, user.username, user.role, token_version)
+    
+    if not ObjectId.is_valid(user_id):
+        raise _invalid_token()
+    token_version = payload.get("tv", 0)
+    if token_revocations.is_revoked(user_id, token_version):
+        raise _invalid_token("Token has been revoked")
+    
+    return TokenClaims(ObjectId(user_id), username, payload.get("role", "student"), token_version)
+
+
+async def get_current_user(claims: TokenClaims = Depends(get_token_claims)) -> User:
+    """Get the current authenticated user from JWT token."""
+    user = user_cache.get(claims.user_id)
+    if user is None:
+        user = await User.get(claims.user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        user_cache.put(user)
+    
+    # The loaded user is authoritative even before the revocation poll catches up
+    if claims.token_version < user.token_version:
+        raise _invalid_token("Token has been revoked")
     
     return user
 
 
+async def set_user_fields(user_id, fields: dict) -> Optional[User]:
+    """
+    $set only the given fields and return the updated user, or None if missing.
+    
+    Never save() a loaded (possibly cached) User: that rewrites every field and
+    would roll back concurrent coin, badge and token_version updates.
+    """
+    doc = await User.get_motor_collection().find_one_and_update(
+        {"_id": user_id},
+        {"$set": fields},
+        return_document=ReturnDocument.AFTER,
+    )
+    user_cache.invalidate(user_id)
+    return User.model_validate(doc) if doc is not None else None
+
+
 def user_to_response(user: User) -> dict:
     """Convert User model to response dict."""
     return {
@@ -150,7 +280,7 @@ async def signup(request: SignupRequest):
         )
     
     # Hash password and create user
-    hashed_password = hash_password(request.password)
+    hashed_password = await hash_password(request.password)
     
     user = User(
         username=request.username,
@@ -167,9 +297,10 @@ async def signup(request: SignupRequest):
     )
     
     await user.insert()
+    leaderboard.update(str(user.id), user.scratchy_coins, user.display_name, user.avatar)
     
     # Create JWT token
-    token = create_access_token({"sub": user.username})
+    token = create_user_token(user)
     
     return TokenResponse(
         token=token,
@@ -184,24 +315,32 @@ async def login(request: LoginRequest):
     user = await User.find_one(User.email == request.email)
     
     if not user:
+        LOGINS.inc(1, "failure")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
     # Verify password
-    if not user.password_hash or not verify_password(request.password, user.password_hash):
+    if not user.password_hash or not await verify_password(request.password, user.password_hash):
+        LOGINS.inc(1, "failure")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
+    LOGINS.inc(1, "success")
     
     # Update last login
-    user.last_login = datetime.utcnow()
-    await user.save()
+    user = await set_user_fields(user.id, {"last_login": datetime.utcnow()})
+    if user is None:
+        LOGINS.inc(1, "failure")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid email or password"
+        )
     
     # Create JWT token
-    token = create_access_token({"sub": user.username})
+    token = create_user_token(user)
     
     return TokenResponse(
         token=token,
@@ -218,25 +357,42 @@ async def get_me(current_user: User = Depends(get_current_user)):
 @router.put("/me")
 async def update_me(
     updates: dict,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(default=None, max_length=100)
 ):
     """Update current user profile."""
     allowed_fields = ["display_name", "avatar", "preferred_language"]
     
-    for field in allowed_fields:
-        if field in updates:
-            setattr(current_user, field, updates[field])
-    
-    current_user.updated_at = datetime.utcnow()
-    await current_user.save()
+    async def apply() -> dict:
+        fields = {field: updates[field] for field in allowed_fields if field in updates}
+        fields["updated_at"] = datetime.utcnow()
+        user = await set_user_fields(current_user.id, fields)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        leaderboard.update(
+            str(user.id),
+            display_name=user.display_name,
+            avatar=user.avatar
+        )
+        
+        return {"user": user_to_response(user)}
     
-    return {"user": user_to_response(current_user)}
+    return await idempotency.run(
+        idempotency_key,
+        f"update-me:{current_user.id}",
+        fingerprint(sorted((field, updates[field]) for field in allowed_fields if field in updates)),
+        apply
+    )
 
 
 @router.post("/add-coins")
 async def add_coins(
     amount: int,
-    current_user: User = Depends(get_current_user)
+    claims: TokenClaims = Depends(get_token_claims),
+    idempotency_key: Optional[str] = Header(default=None, max_length=100)
 ):
     """Add Scratchy Coins to user account."""
     if amount <= 0:
@@ -245,11 +401,55 @@ async def add_coins(
             detail="Amount must be positive"
         )
     
-    current_user.scratchy_coins += amount
-    current_user.updated_at = datetime.utcnow()
-    await current_user.save()
+    async def apply() -> dict:
+        async with causal_sessions.session(claims.user_id) as session:
+            total_coins = await award_coins(claims.user_id, amount, session)
+        
+        if total_coins is None:
+            user_cache.invalidate(claims.user_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        user_cache.invalidate(claims.user_id)
+        await queue_progress_effects(
+            claims.user_id,
+            counter_changes(total_coins=total_coins, coins=amount),
+            activity_rows(datetime.utcnow().date(), coins=amount)
+        )
+        
+        return {
+            "message": f"Added {amount} coins",
+            "total_coins": total_coins
+        }
     
-    return {
-        "message": f"Added {amount} coins",
-        "total_coins": current_user.scratchy_coins
-    }
+    return await idempotency.run(
+        idempotency_key,
+        f"add-coins:{claims.user_id}",
+        fingerprint(amount),
+        apply
+    )
+
+
+@router.post("/logout-all")
+async def logout_all(current_user: User = Depends(get_current_user)):
+    """Revoke every access token issued to the current user, including this one."""
+    now = datetime.utcnow()
+    doc = await User.get_motor_collection().find_one_and_update(
+        {"_id": current_user.id},
+        {"$inc": {"token_version": 1}, "$set": {"tokens_revoked_at": now, "updated_at": now}},
+        projection={"token_version": True},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    # Other workers pick this up on their next revocation poll
+    token_revocations.record(str(current_user.id), doc["token_version"], now)
+    user_cache.invalidate(current_user.id)
+    
+    return {"message": "Logged out on all devices"}
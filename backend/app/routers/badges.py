@@ -3,50 +3,95 @@ Badges Router
 Handles badge definitions and user achievements.
 """
 
-from typing import List
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request
 from pydantic import BaseModel
 
-from app.models.achievement import AchievementDefinition
+from app.database.routing import causal_sessions, collection, USER_READS
+from app.models.achievement import Achievement
+from app.routers.auth import get_token_claims, TokenClaims
+from app.services.content_cache import content_cache
+from app.services.response_cache import catalog_responses
+from app.services.i18n import resolve_language, project_language, LANGUAGE_PATTERN
 
 router = APIRouter(prefix="/api/badges", tags=["Badges"])
 
 
 class BadgeResponse(BaseModel):
-    """Badge definition response."""
+    """Badge definition response (`*_ar` fields only in the bilingual shape)."""
     id: str
     title: str
-    title_ar: str
+    title_ar: Optional[str] = None
     description: str
-    description_ar: str
+    description_ar: Optional[str] = None
     icon: str
     category: str
     requirement_type: str
     requirement_value: int
     coins_reward: int
     funny_message: str
-    funny_message_ar: str
+    funny_message_ar: Optional[str] = None
+    lang: Optional[str] = None
+
+
+class EarnedBadgeResponse(BaseModel):
+    """A badge earned by the current user."""
+    id: str
+    earned_at: datetime
+    context: Optional[str] = None
 
 
 @router.get("/", response_model=List[BadgeResponse])
-async def get_all_badges():
+async def get_all_badges(
+    request: Request,
+    lang: Optional[str] = Query(None, pattern=LANGUAGE_PATTERN)
+):
     """Get all available badge definitions."""
-    badges = await AchievementDefinition.find_all().to_list()
+    # Served as pre-encoded JSON built once per content version and language
+    lang = resolve_language(request, lang)
+    return catalog_responses.respond(request, ("badges", lang), lambda: _build_badges(lang))
+
+
+def _build_badges(lang: str) -> list:
+    """Build badge definitions in the BadgeResponse shape from the content cache."""
+    return [
+        project_language({
+            "id": badge.achievement_id,
+            "title": badge.title,
+            "title_ar": badge.title_ar,
+            "description": badge.description,
+            "description_ar": badge.description_ar,
+            "icon": badge.icon,
+            "category": badge.category,
+            "requirement_type": badge.requirement_type,
+            "requirement_value": badge.requirement_value,
+            "coins_reward": badge.coins_reward,
+            "funny_message": badge.funny_message,
+            "funny_message_ar": badge.funny_message_ar,
+        }, lang, ("title", "description", "funny_message"))
+        for badge in content_cache.badges
+    ]
+
+
+@router.get("/me", response_model=List[EarnedBadgeResponse])
+async def get_my_badges(claims: TokenClaims = Depends(get_token_claims)):
+    """Get the badges earned by the current user."""
+    # Secondary read that still observes this user's own latest writes
+    async with causal_sessions.session(claims.user_id) as session:
+        cursor = collection(Achievement, USER_READS).find(
+            {"user_id": str(claims.user_id)},
+            projection={"_id": False, "achievement_id": True, "earned_at": True, "context": True},
+            sort=[("earned_at", 1)],
+            session=session,
+        )
+        achievements = await cursor.to_list(length=None)
     
     return [
-        BadgeResponse(
-            id=badge.achievement_id,
-            title=badge.title,
-            title_ar=badge.title_ar,
-            description=badge.description,
-            description_ar=badge.description_ar,
-            icon=badge.icon,
-            category=badge.category,
-            requirement_type=badge.requirement_type,
-            requirement_value=badge.requirement_value,
-            coins_reward=badge.coins_reward,
-            funny_message=badge.funny_message,
-            funny_message_ar=badge.funny_message_ar,
+        EarnedBadgeResponse(
+            id=achievement["achievement_id"],
+            earned_at=achievement["earned_at"],
+            context=achievement.get("context"),
         )
-        for badge in badges
+        for achievement in achievements
     ]
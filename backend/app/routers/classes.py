@@ -0,0 +1,188 @@
+"""
+Classes Router
+Handles class groups and the teacher/parent progress dashboard.
+"""
+
+from datetime import datetime
+from typing import List
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from pydantic import BaseModel, Field
+from pymongo import ReturnDocument
+
+from app.models.classroom import ClassGroup
+from app.models.user import User
+from app.routers.auth import get_token_claims, TokenClaims
+from app.services.class_dashboard import (
+    build_dashboard,
+    dashboard_cache,
+    CLASS_MAX_MEMBERS,
+    DASHBOARD_MAX_PAGE_SIZE,
+)
+
+router = APIRouter(prefix="/api/classes", tags=["Classes"])
+
+# Roles that may own classes
+CLASS_OWNER_ROLES = ("teacher", "parent")
+
+
+# Request/Response Models
+class CreateClassRequest(BaseModel):
+    """Request model for creating a class."""
+    name: str = Field(..., min_length=1, max_length=100)
+
+
+class MembersRequest(BaseModel):
+    """Request model for adding students by username."""
+    usernames: List[str] = Field(..., min_length=1, max_length=CLASS_MAX_MEMBERS)
+
+
+class ClassSummary(BaseModel):
+    """A class without its members' progress."""
+    id: str
+    name: str
+    member_count: int
+
+
+# Helper Functions
+def require_class_owner(claims: TokenClaims = Depends(get_token_claims)) -> TokenClaims:
+    """Only teachers and parents manage classes; checked from the token claims."""
+    if claims.role not in CLASS_OWNER_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers and parents can manage classes"
+        )
+    return claims
+
+
+def _class_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Class not found"
+    )
+
+
+async def _owned_class(class_id: str, claims: TokenClaims) -> ClassGroup:
+    """Load a class owned by the caller, or raise 404."""
+    if not ObjectId.is_valid(class_id):
+        raise _class_not_found()
+    group = await ClassGroup.find_one({"_id": ObjectId(class_id), "owner_id": str(claims.user_id)})
+    if group is None:
+        raise _class_not_found()
+    return group
+
+
+def _summary(group: ClassGroup) -> ClassSummary:
+    return ClassSummary(id=str(group.id), name=group.name, member_count=len(group.member_ids))
+
+
+# Routes
+@router.post("", response_model=ClassSummary)
+async def create_class(
+    request: CreateClassRequest,
+    claims: TokenClaims = Depends(require_class_owner)
+):
+    """Create an empty class owned by the current user."""
+    group = ClassGroup(name=request.name, owner_id=str(claims.user_id))
+    await group.insert()
+    return _summary(group)
+
+
+@router.get("", response_model=List[ClassSummary])
+async def list_classes(claims: TokenClaims = Depends(require_class_owner)):
+    """List the classes owned by the current user."""
+    groups = await ClassGroup.find(
+        {"owner_id": str(claims.user_id)}
+    ).sort("created_at").to_list()
+    return [_summary(group) for group in groups]
+
+
+@router.post("/{class_id}/members")
+async def add_members(
+    class_id: str,
+    request: MembersRequest,
+    claims: TokenClaims = Depends(require_class_owner)
+):
+    """Add students to a class by username."""
+    group = await _owned_class(class_id, claims)
+
+    usernames = list(dict.fromkeys(request.usernames))
+    students = await User.get_motor_collection().find(
+        {"username": {"$in": usernames}, "role": "student"},
+        projection={"username": True},
+    ).to_list(length=None)
+    found = {student["username"] for student in students}
+    member_ids = [str(student["_id"]) for student in students if str(student["_id"]) not in group.member_ids]
+
+    if member_ids:
+        # Matches only while the class has room for every new member
+        updated = await ClassGroup.get_motor_collection().find_one_and_update(
+            {
+                "_id": group.id,
+                "owner_id": group.owner_id,
+                f"member_ids.{CLASS_MAX_MEMBERS - len(member_ids)}": {"$exists": False},
+            },
+            {
+                "$addToSet": {"member_ids": {"$each": member_ids}},
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+            projection={"member_ids": True},
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"A class can have at most {CLASS_MAX_MEMBERS} members"
+            )
+        group.member_ids = updated["member_ids"]
+        dashboard_cache.invalidate(class_id)
+
+    return {
+        "class": _summary(group),
+        "added": len(member_ids),
+        "unknown_usernames": [username for username in usernames if username not in found],
+    }
+
+
+@router.delete("/{class_id}/members/{user_id}", response_model=ClassSummary)
+async def remove_member(
+    class_id: str,
+    user_id: str,
+    claims: TokenClaims = Depends(require_class_owner)
+):
+    """Remove a student from a class."""
+    if not ObjectId.is_valid(class_id):
+        raise _class_not_found()
+
+    group = await ClassGroup.get_motor_collection().find_one_and_update(
+        {"_id": ObjectId(class_id), "owner_id": str(claims.user_id)},
+        {"$pull": {"member_ids": user_id}, "$set": {"updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if group is None:
+        raise _class_not_found()
+
+    dashboard_cache.invalidate(class_id)
+    return ClassSummary(id=class_id, name=group["name"], member_count=len(group["member_ids"]))
+
+
+@router.get("/{class_id}/dashboard")
+async def get_class_dashboard(
+    class_id: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(30, ge=1, le=DASHBOARD_MAX_PAGE_SIZE),
+    claims: TokenClaims = Depends(require_class_owner)
+):
+    """Get the coins, progress and lesson progress of a page of class members."""
+    # Cached pages are served without any query, after the same ownership check
+    cached = dashboard_cache.get(class_id, page, page_size)
+    if cached is not None:
+        owner_id, dashboard = cached
+        if owner_id != str(claims.user_id):
+            raise _class_not_found()
+        return dashboard
+
+    group = await _owned_class(class_id, claims)
+    dashboard = await build_dashboard(group, page, page_size)
+    dashboard_cache.put(class_id, page, page_size, group.owner_id, dashboard)
+    return dashboard
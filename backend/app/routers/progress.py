@@ -3,19 +3,67 @@ Progress and Leaderboard Router
 Handles user progress, leaderboards, and daily challenges.
 """
 
-from datetime import datetime, date
+from datetime import date, datetime, time, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, status
 from pydantic import BaseModel, Field
 
-from app.models.user import User
+from app.database.routing import causal_sessions, collection, USER_READS
 from app.models.progress import Progress, LessonProgress
-from app.routers.auth import get_current_user
+from app.routers.auth import get_token_claims, TokenClaims
+from app.services.user_cache import user_cache
+from app.services.activity_calendar import completed_filter
+from app.services.rewards import award_coins, record_lesson_completion, record_daily_challenge
+from app.services.leaderboard import leaderboard, LEADERBOARD_MAX_PAGE_SIZE
+from app.services.content_cache import content_cache
+from app.services.response_cache import catalog_responses, CATALOG_MAX_AGE_SECONDS
+from app.services.i18n import resolve_language, project_language, LANGUAGE_PATTERN
+from app.services.idempotency import idempotency, fingerprint
+from app.services.achievements import counter_changes, queue_progress_effects
+from app.services.analytics import activity_rows
+from app.services.lesson_tracking import (
+    heartbeat_buffer,
+    start_lesson,
+    complete_lesson_progress,
+    HEARTBEAT_MAX_SECONDS,
+)
 
 router = APIRouter(prefix="/api", tags=["Progress & Leaderboard"])
 
+# Progress fields returned by GET /api/progress
+PROGRESS_FIELDS = (
+    "total_lessons_completed",
+    "total_courses_completed",
+    "total_challenges_completed",
+    "total_time_spent_seconds",
+    "current_streak",
+    "longest_streak",
+)
+
+# LessonProgress fields returned by GET /api/progress/lessons
+LESSON_PROGRESS_FIELDS = (
+    "lesson_id",
+    "course_id",
+    "status",
+    "completion_percentage",
+    "time_spent_seconds",
+    "attempts",
+    "hints_used",
+    "coins_earned",
+    "started_at",
+    "completed_at",
+    "last_accessed",
+)
+
+
+# Request/Response Models
+class LessonHeartbeat(BaseModel):
+    """Time spent in a lesson since the client's previous heartbeat."""
+    seconds: int = Field(..., ge=0, le=HEARTBEAT_MAX_SECONDS)
+    completion_percentage: Optional[int] = Field(default=None, ge=0, le=100)
+    hints_used: int = Field(default=0, ge=0, le=100)
+
 
-# Response Models
 class LeaderboardEntry(BaseModel):
     """Leaderboard entry response."""
     rank: int
@@ -25,201 +73,337 @@ class LeaderboardEntry(BaseModel):
     scratchy_coins: int
 
 
+class LeaderboardPage(BaseModel):
+    """A page of leaderboard entries."""
+    entries: List[LeaderboardEntry]
+    next_cursor: Optional[str] = None
+
+
+class LeaderboardRank(BaseModel):
+    """A user's rank and the entries around it."""
+    rank: int
+    total: int
+    entries: List[LeaderboardEntry]
+
+
 class DailyChallenge(BaseModel):
-    """Daily challenge response."""
+    """Daily challenge response (`*_ar` fields only in the bilingual shape)."""
     id: str
     date: str
     title: str
-    title_ar: str
+    title_ar: Optional[str] = None
     description: str
-    description_ar: str
+    description_ar: Optional[str] = None
     coins_reward: int
     joke_of_the_day: str
-    joke_of_the_day_ar: str
+    joke_of_the_day_ar: Optional[str] = None
     puzzle_type: str = "drag-drop"
+    lang: Optional[str] = None
 
 
 @router.get("/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard(limit: int = 10):
+async def get_leaderboard(limit: int = Query(10, ge=1, le=LEADERBOARD_MAX_PAGE_SIZE)):
     """Get top users by Scratchy Coins."""
-    # Get users sorted by coins
-    users = await User.find_all().sort("-scratchy_coins").limit(limit).to_list()
-    
-    leaderboard = []
-    for rank, user in enumerate(users, 1):
-        leaderboard.append(LeaderboardEntry(
-            rank=rank,
-            user_id=str(user.id),
-            display_name=user.display_name,
-            avatar=user.avatar or "default_avatar",
-            scratchy_coins=user.scratchy_coins
-        ))
+    return leaderboard.top(limit)
+
+
+@router.get("/leaderboard/page", response_model=LeaderboardPage)
+async def get_leaderboard_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=LEADERBOARD_MAX_PAGE_SIZE)
+):
+    """Page through the full leaderboard using the cursor from the previous page."""
+    try:
+        entries, next_cursor = leaderboard.page(cursor, limit)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
     
-    return leaderboard
+    return LeaderboardPage(entries=entries, next_cursor=next_cursor)
+
+
+@router.get("/leaderboard/me", response_model=LeaderboardRank)
+async def get_my_rank(
+    neighbours: int = Query(2, ge=0, le=10),
+    claims: TokenClaims = Depends(get_token_claims)
+):
+    """Get the current user's rank with the users just above and below."""
+    return _rank_or_404(str(claims.user_id), neighbours)
+
+
+@router.get("/leaderboard/users/{user_id}", response_model=LeaderboardRank)
+async def get_user_rank(
+    user_id: str,
+    neighbours: int = Query(2, ge=0, le=10)
+):
+    """Get a user's rank with the users just above and below."""
+    return _rank_or_404(user_id, neighbours)
+
+
+def _rank_or_404(user_id: str, neighbours: int) -> dict:
+    """Look up a rank or raise 404 when the user is not on the leaderboard."""
+    rank = leaderboard.rank_of(user_id, neighbours)
+    if rank is None:
+        raise HTTPException(
+            status_code=404,
+            detail="User not on the leaderboard"
+        )
+    return rank
 
 
 @router.get("/daily-challenge", response_model=DailyChallenge)
-async def get_daily_challenge():
+async def get_daily_challenge(
+    request: Request,
+    lang: Optional[str] = Query(None, pattern=LANGUAGE_PATTERN)
+):
     """Get today's daily challenge."""
-    from app.models.course import Lesson
-    
-    # Get all daily challenges from database
-    challenges = await Lesson.find(Lesson.course_id == "daily_challenges").sort("+order").to_list()
+    # Get challenge based on day of year
+    today = date.today()
+    challenge = content_cache.daily_challenge_for(today)
     
-    if not challenges:
+    if not challenge:
         raise HTTPException(
             status_code=404,
             detail="No daily challenges available"
         )
     
-    # Get challenge based on day of year
-    today = date.today()
-    challenge_index = today.timetuple().tm_yday % len(challenges)
-    challenge = challenges[challenge_index]
-    
-    return DailyChallenge(
-        id=challenge.lesson_id,
-        date=today.isoformat(),
-        title=challenge.title,
-        title_ar=challenge.title_ar,
-        description=challenge.description,
-        description_ar=challenge.description_ar,
-        coins_reward=challenge.coins_reward,
-        joke_of_the_day=challenge.character_intro_joke or "",
-        joke_of_the_day_ar=challenge.character_intro_joke_ar or "",
-        puzzle_type="drag-drop"
+    # Don't let clients cache today's challenge past midnight
+    seconds_to_midnight = (datetime.combine(today + timedelta(days=1), time.min) - datetime.now()).seconds
+    
+    lang = resolve_language(request, lang)
+    return catalog_responses.respond(
+        request,
+        ("daily-challenge", today, lang),
+        lambda: _build_daily_challenge(challenge, today, lang),
+        max_age=min(CATALOG_MAX_AGE_SECONDS, seconds_to_midnight)
     )
 
 
+def _build_daily_challenge(challenge, today: date, lang: str) -> dict:
+    """Build a daily challenge in the DailyChallenge shape."""
+    return project_language({
+        "id": challenge.lesson_id,
+        "date": today.isoformat(),
+        "title": challenge.title,
+        "title_ar": challenge.title_ar,
+        "description": challenge.description,
+        "description_ar": challenge.description_ar,
+        "coins_reward": challenge.coins_reward,
+        "joke_of_the_day": challenge.character_intro_joke or "",
+        "joke_of_the_day_ar": challenge.character_intro_joke_ar or "",
+        "puzzle_type": "drag-drop",
+    }, lang, ("title", "description", "joke_of_the_day"))
+
+
+@router.get("/daily-challenge/status")
+async def get_daily_challenge_status(
+    claims: TokenClaims = Depends(get_token_claims)
+):
+    """Check whether the current user already completed today's challenge."""
+    today = date.today()
+    challenge = content_cache.daily_challenge_for(today)
+    
+    # Decided by the $bitsAllSet filter; the calendar itself is never loaded
+    async with causal_sessions.session(claims.user_id) as session:
+        progress = await collection(Progress, USER_READS).find_one(
+            {"user_id": str(claims.user_id), **completed_filter(today)},
+            projection={"_id": True},
+            session=session,
+        )
+    
+    return {
+        "date": today.isoformat(),
+        "challenge_id": challenge.lesson_id if challenge else None,
+        "completed": progress is not None
+    }
+
+
 @router.post("/daily-challenge/complete")
 async def complete_daily_challenge(
-    current_user: User = Depends(get_current_user)
+    claims: TokenClaims = Depends(get_token_claims),
+    idempotency_key: Optional[str] = Header(default=None, max_length=100)
 ):
     """Complete today's daily challenge and earn coins."""
-    from app.models.course import Lesson
-    
     today = date.today()
+    challenge = content_cache.daily_challenge_for(today)
     
-    # Get all daily challenges from database
-    challenges = await Lesson.find(Lesson.course_id == "daily_challenges").sort("+order").to_list()
-    
-    if not challenges:
+    if not challenge:
         raise HTTPException(
             status_code=404,
             detail="No daily challenges available"
         )
     
-    challenge_index = today.timetuple().tm_yday % len(challenges)
-    challenge = challenges[challenge_index]
+    async def apply() -> dict:
+        async with causal_sessions.session(claims.user_id) as session:
+            # Claim today's completion first so a retried request can't earn twice
+            progress = await record_daily_challenge(str(claims.user_id), today, session)
+            
+            if progress is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Already completed today's challenge"
+                )
+            
+            # Award coins
+            total_coins = await award_coins(claims.user_id, challenge.coins_reward, session)
+        
+        user_cache.invalidate(claims.user_id)
+        await queue_progress_effects(
+            claims.user_id,
+            counter_changes(progress, total_coins, coins=challenge.coins_reward, challenges=1),
+            activity_rows(datetime.utcnow().date(), challenges=1, coins=challenge.coins_reward),
+            context=f"Completed daily challenge: {challenge.lesson_id}"
+        )
+        
+        return {
+            "message": "Challenge completed!",
+            "coins_earned": challenge.coins_reward,
+            "total_coins": total_coins
+        }
     
-    # Check if already completed today
-    progress = await Progress.find_one(Progress.user_id == str(current_user.id))
+    return await idempotency.run(
+        idempotency_key,
+        f"daily-challenge:{claims.user_id}",
+        fingerprint(today.isoformat()),
+        apply
+    )
+
+
+@router.get("/progress")
+async def get_user_progress(
+    claims: TokenClaims = Depends(get_token_claims)
+):
+    """Get current user's progress."""
+    # Secondary read that still observes this user's own latest writes
+    async with causal_sessions.session(claims.user_id) as session:
+        progress = await collection(Progress, USER_READS).find_one(
+            {"user_id": str(claims.user_id)},
+            projection={"_id": False, **{field: True for field in PROGRESS_FIELDS}},
+            session=session,
+        ) or {}
     
-    if progress and today.isoformat() in progress.daily_challenges_completed:
+    return {field: progress.get(field, 0) for field in PROGRESS_FIELDS}
+
+
+def _lesson_or_404(lesson_id: str):
+    """Look up a lesson in the content cache or raise 404."""
+    lesson = content_cache.lesson(lesson_id)
+    if lesson is None:
         raise HTTPException(
-            status_code=400,
-            detail="Already completed today's challenge"
+            status_code=404,
+            detail="Lesson not found"
         )
+    return lesson
+
+
+@router.get("/progress/lessons")
+async def get_lesson_progress(
+    course_id: Optional[str] = None,
+    claims: TokenClaims = Depends(get_token_claims)
+):
+    """Get current user's progress in each lesson they opened."""
+    query = {"user_id": str(claims.user_id)}
+    if course_id is not None:
+        query["course_id"] = course_id
     
-    # Award coins
-    current_user.scratchy_coins += challenge.coins_reward
-    await current_user.save()
-    
-    # Update progress
-    if not progress:
-        progress = Progress(
-            user_id=str(current_user.id),
-            total_challenges_completed=1,
-            daily_challenges_completed=[today.isoformat()]
+    async with causal_sessions.session(claims.user_id) as session:
+        cursor = collection(LessonProgress, USER_READS).find(
+            query,
+            projection={"_id": False, **{field: True for field in LESSON_PROGRESS_FIELDS}},
+            sort=[("lesson_id", 1)],
+            session=session,
         )
-        await progress.insert()
-    else:
-        progress.total_challenges_completed += 1
-        progress.daily_challenges_completed.append(today.isoformat())
-        progress.updated_at = datetime.utcnow()
-        await progress.save()
+        lessons = await cursor.to_list(length=None)
     
-    return {
-        "message": "Challenge completed!",
-        "coins_earned": challenge.coins_reward,
-        "total_coins": current_user.scratchy_coins
-    }
+    return [
+        {
+            **lesson,
+            **{
+                field: lesson[field].isoformat() if lesson.get(field) else None
+                for field in ("started_at", "completed_at", "last_accessed")
+            },
+        }
+        for lesson in lessons
+    ]
 
 
-@router.get("/progress")
-async def get_user_progress(
-    current_user: User = Depends(get_current_user)
+@router.post("/progress/lesson/{lesson_id}/start")
+async def start_lesson_progress(
+    lesson_id: str,
+    claims: TokenClaims = Depends(get_token_claims)
 ):
-    """Get current user's progress."""
-    progress = await Progress.find_one(Progress.user_id == str(current_user.id))
+    """Start (or restart) a lesson."""
+    lesson = _lesson_or_404(lesson_id)
     
-    if not progress:
-        return {
-            "total_lessons_completed": 0,
-            "total_courses_completed": 0,
-            "total_challenges_completed": 0,
-            "total_time_spent_seconds": 0,
-            "current_streak": 0,
-            "longest_streak": 0
-        }
+    async with causal_sessions.session(claims.user_id) as session:
+        await start_lesson(str(claims.user_id), lesson, session)
     
-    return {
-        "total_lessons_completed": progress.total_lessons_completed,
-        "total_courses_completed": progress.total_courses_completed,
-        "total_challenges_completed": progress.total_challenges_completed,
-        "total_time_spent_seconds": progress.total_time_spent_seconds,
-        "current_streak": progress.current_streak,
-        "longest_streak": progress.longest_streak
-    }
+    return {"message": "Lesson started", "lesson_id": lesson_id}
+
+
+@router.post("/progress/lesson/{lesson_id}/heartbeat", status_code=status.HTTP_202_ACCEPTED)
+async def lesson_heartbeat(
+    lesson_id: str,
+    heartbeat: LessonHeartbeat,
+    claims: TokenClaims = Depends(get_token_claims)
+):
+    """Report time spent in a lesson; buffered and written in the next bulk flush."""
+    lesson = _lesson_or_404(lesson_id)
+    heartbeat_buffer.add(
+        str(claims.user_id),
+        lesson,
+        heartbeat.seconds,
+        heartbeat.completion_percentage,
+        heartbeat.hints_used,
+    )
+    return {"accepted": True}
 
 
 @router.post("/progress/lesson/{lesson_id}/complete")
 async def complete_lesson(
     lesson_id: str,
     coins_earned: int = 10,
-    current_user: User = Depends(get_current_user)
+    claims: TokenClaims = Depends(get_token_claims),
+    idempotency_key: Optional[str] = Header(default=None, max_length=100)
 ):
     """Mark a lesson as completed."""
-    # Award coins
-    current_user.scratchy_coins += coins_earned
-    await current_user.save()
-    
-    # Update progress
-    progress = await Progress.find_one(Progress.user_id == str(current_user.id))
-    
-    if not progress:
-        progress = Progress(
-            user_id=str(current_user.id),
-            total_lessons_completed=1,
-            last_activity_date=datetime.utcnow(),
-            current_streak=1,
-            longest_streak=1
-        )
-        await progress.insert()
-    else:
-        progress.total_lessons_completed += 1
-        
-        # Update streak
-        today = date.today()
-        last_activity = progress.last_activity_date.date() if progress.last_activity_date else None
+    lesson = _lesson_or_404(lesson_id)
+    
+    async def apply() -> dict:
+        async with causal_sessions.session(claims.user_id) as session:
+            # Award coins
+            total_coins = await award_coins(claims.user_id, coins_earned, session)
+            
+            # Update progress and streak in a single upsert
+            progress = await record_lesson_completion(str(claims.user_id), session)
+            time_spent = await complete_lesson_progress(str(claims.user_id), lesson, coins_earned, session)
         
-        if last_activity:
-            days_diff = (today - last_activity).days
-            if days_diff == 1:
-                progress.current_streak += 1
-            elif days_diff > 1:
-                progress.current_streak = 1
-        else:
-            progress.current_streak = 1
+        user_cache.invalidate(claims.user_id)
+        await queue_progress_effects(
+            claims.user_id,
+            counter_changes(progress, total_coins, coins=coins_earned, lessons=1),
+            activity_rows(
+                datetime.utcnow().date(),
+                lesson_id=lesson_id,
+                lessons=1,
+                coins=coins_earned,
+                completion_time_seconds=time_spent + heartbeat_buffer.pending_seconds(str(claims.user_id), lesson_id),
+            ),
+            context=f"Completed lesson: {lesson_id}"
+        )
         
-        progress.longest_streak = max(progress.longest_streak, progress.current_streak)
-        progress.last_activity_date = datetime.utcnow()
-        progress.updated_at = datetime.utcnow()
-        await progress.save()
+        return {
+            "message": "Lesson completed!",
+            "coins_earned": coins_earned,
+            "total_coins": total_coins,
+            "current_streak": progress["current_streak"]
+        }
     
-    return {
-        "message": "Lesson completed!",
-        "coins_earned": coins_earned,
-        "total_coins": current_user.scratchy_coins,
-        "current_streak": progress.current_streak
-    }
+    return await idempotency.run(
+        idempotency_key,
+        f"complete-lesson:{claims.user_id}",
+        fingerprint(lesson_id, coins_earned),
+        apply
+    )
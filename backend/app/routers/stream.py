@@ -0,0 +1,75 @@
+"""
+Stream Router
+Handles the Server-Sent Events stream of leaderboard and coin updates.
+"""
+
+from datetime import timedelta
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+from app.routers.auth import claims_from_token, create_scoped_token, get_token_claims, TokenClaims
+from app.services.live_updates import live_updates, LIVE_STREAM_TOKEN_SECONDS
+
+router = APIRouter(prefix="/api", tags=["Live Updates"])
+
+optional_security = HTTPBearer(auto_error=False)
+
+# Scope of the short-lived tokens accepted in ?token=
+STREAM_SCOPE = "stream"
+
+
+# Helper Functions
+async def get_stream_claims(
+    token: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> TokenClaims:
+    """
+    Claims from the Authorization header, or from a stream token in ?token=.
+
+    EventSource can't set headers, but URLs end up in access and proxy logs,
+    so the query string only accepts short-lived stream-scoped tokens.
+    """
+    if credentials is not None:
+        return await claims_from_token(credentials.credentials)
+    if token:
+        return await claims_from_token(token, scope=STREAM_SCOPE)
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated"
+    )
+
+
+# Routes
+@router.post("/stream/token")
+async def create_stream_token(claims: TokenClaims = Depends(get_token_claims)):
+    """Get a short-lived token for opening the stream with EventSource."""
+    return {
+        "token": create_scoped_token(claims, STREAM_SCOPE, timedelta(seconds=LIVE_STREAM_TOKEN_SECONDS)),
+        "expires_in": int(LIVE_STREAM_TOKEN_SECONDS),
+    }
+
+
+@router.get("/stream")
+async def stream_updates(claims: TokenClaims = Depends(get_stream_claims)):
+    """
+    Stream leaderboard and coin updates.
+
+    Sends a `snapshot` event (top of the leaderboard and the user's own coins
+    and rank), then `leaderboard` deltas ({changed, removed}) and `me` events
+    as they happen. The token is only checked here, when the stream opens; the
+    stream ends with a `reconnect` event, after which the client fetches a new
+    stream token and opens a new stream.
+    """
+    if not live_updates.has_capacity():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open streams, try again later"
+        )
+
+    return StreamingResponse(
+        live_updates.stream(str(claims.user_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
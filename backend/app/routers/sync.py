@@ -0,0 +1,69 @@
+"""
+Offline Sync Router
+Accepts batches of progress events queued by the PWA while offline.
+"""
+
+import os
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+
+from app.models.user import User
+from app.routers.auth import get_current_user, user_to_response
+from app.services.offline_sync import apply_events, EVENT_TYPES
+from app.services.user_cache import user_cache
+
+router = APIRouter(prefix="/api", tags=["Offline Sync"])
+
+SYNC_MAX_EVENTS = int(os.getenv("SYNC_MAX_EVENTS", "200"))
+
+
+# Request/Response Models
+class SyncEvent(BaseModel):
+    """A single event recorded by the client while offline."""
+    idempotency_key: str = Field(..., min_length=8, max_length=100)
+    type: str = Field(..., pattern="^(" + "|".join(EVENT_TYPES) + ")$")
+    client_timestamp: datetime
+    lesson_id: Optional[str] = None
+    coins: int = Field(default=0, ge=0, le=1000)  # add_coins only; lessons pay their own reward
+
+
+class SyncRequest(BaseModel):
+    """An ordered batch of offline events."""
+    events: List[SyncEvent] = Field(..., max_length=SYNC_MAX_EVENTS)
+
+
+class SyncEventResult(BaseModel):
+    """Outcome of one event: applied, duplicate or rejected."""
+    idempotency_key: str
+    status: str
+    reason: Optional[str] = None
+
+
+class SyncResponse(BaseModel):
+    """Per-event results and the merged user state after the batch."""
+    results: List[SyncEventResult]
+    coins_earned: int
+    user: dict
+    progress: dict
+
+
+@router.post("/sync", response_model=SyncResponse)
+async def sync_events(
+    request: SyncRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Apply a batch of offline events and return the merged user state."""
+    outcome = await apply_events(current_user.id, request.events)
+
+    user_cache.invalidate(current_user.id)
+    if outcome["total_coins"] is not None:
+        current_user = current_user.model_copy(update={"scratchy_coins": outcome["total_coins"]})
+
+    return SyncResponse(
+        results=outcome["results"],
+        coins_earned=outcome["coins_earned"],
+        user=user_to_response(current_user),
+        progress=outcome["progress"]
+    )
@@ -0,0 +1,270 @@
+"""
+Achievement Engine
+Awards badges incrementally as progress counters change.
+
+Badge definitions are indexed by requirement_type and sorted by
+requirement_value. A progress event reports each counter it moved as a
+(before, after) pair, and only the rules whose threshold lies in that range
+are considered, so the cost per event is O(affected rules) rather than a scan
+of every definition. Earned badges are written with one unordered
+insert_many; the unique (user_id, achievement_id) index drops repeats.
+Coin rewards are paid per crossed badge with award_badge_coins, which
+records the badge on the user in the same update, so a retried evaluation
+pays badges inserted by a failed attempt exactly once.
+
+Routes don't evaluate inline: they call queue_evaluation() (usually through
+queue_progress_effects()) and the job queue runs the engine after the
+response, merging a user's queued changes.
+"""
+
+import logging
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.database.routing import causal_sessions
+from app.models.achievement import Achievement, AchievementDefinition
+from app.services.analytics import activity_rows, record_activity
+from app.services.content_cache import content_cache
+from app.services.jobs import job_queue
+from app.services.rewards import award_badge_coins
+from app.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Counter names used as AchievementDefinition.requirement_type
+LESSONS_COMPLETED = "lessons_completed"
+CHALLENGES_COMPLETED = "challenges_completed"
+# Daily challenges are the drag-drop puzzle games, so they also count as puzzles
+PUZZLES_COMPLETED = "puzzles_completed"
+STREAK_DAYS = "streak_days"
+TOTAL_COINS = "total_coins"
+
+# Job kind for queued evaluations
+EVALUATE_ACHIEVEMENTS = "evaluate_achievements"
+
+CounterChanges = Dict[str, Tuple[int, int]]
+
+
+def counter_changes(
+    progress: Optional[dict] = None,
+    total_coins: Optional[int] = None,
+    coins: int = 0,
+    lessons: int = 0,
+    challenges: int = 0,
+    streak_before: Optional[int] = None,
+) -> CounterChanges:
+    """Build (before, after) counter pairs from post-update values and their deltas."""
+    changes: CounterChanges = {}
+    if total_coins is not None and coins:
+        changes[TOTAL_COINS] = (total_coins - coins, total_coins)
+    if progress:
+        if lessons:
+            after = progress.get("total_lessons_completed", 0)
+            changes[LESSONS_COMPLETED] = (after - lessons, after)
+            streak = progress.get("current_streak", 0)
+            changes[STREAK_DAYS] = (streak - 1 if streak_before is None else streak_before, streak)
+        if challenges:
+            after = progress.get("total_challenges_completed", 0)
+            changes[CHALLENGES_COMPLETED] = changes[PUZZLES_COMPLETED] = (after - challenges, after)
+    return changes
+
+
+class AchievementEngine:
+    """Rule index over badge definitions, rebuilt when the content version changes."""
+
+    def __init__(self):
+        self._version: Optional[int] = None
+        self._rules: Dict[str, List[AchievementDefinition]] = {}
+        self._thresholds: Dict[str, List[int]] = {}
+
+        # Metrics
+        self.evaluations = 0
+        self.rules_checked = 0
+        self.awarded = 0
+
+    def _ensure_index(self):
+        if self._version == content_cache.version:
+            return
+
+        rules: Dict[str, List[AchievementDefinition]] = {}
+        for definition in content_cache.badges:
+            rules.setdefault(definition.requirement_type, []).append(definition)
+        for definitions in rules.values():
+            definitions.sort(key=lambda definition: definition.requirement_value)
+
+        self._rules = rules
+        self._thresholds = {
+            requirement_type: [definition.requirement_value for definition in definitions]
+            for requirement_type, definitions in rules.items()
+        }
+        self._version = content_cache.version
+
+    def affected_rules(self, changes: CounterChanges) -> List[AchievementDefinition]:
+        """Return the definitions whose threshold was crossed by the counter changes."""
+        self._ensure_index()
+        affected = []
+        for requirement_type, (before, after) in changes.items():
+            thresholds = self._thresholds.get(requirement_type)
+            if not thresholds or after <= before:
+                continue
+            start = bisect_right(thresholds, before)
+            stop = bisect_right(thresholds, after)
+            affected.extend(self._rules[requirement_type][start:stop])
+        return affected
+
+    async def evaluate(
+        self,
+        user_id,
+        changes: CounterChanges,
+        context: Optional[str] = None,
+        session=None,
+    ) -> Tuple[List[AchievementDefinition], int]:
+        """Award every badge newly earned by the counter changes; return them and the coins paid."""
+        self.evaluations += 1
+        awarded: List[AchievementDefinition] = []
+        coins_paid = 0
+
+        while changes:
+            rules = self.affected_rules(changes)
+            self.rules_checked += len(rules)
+            if not rules:
+                break
+
+            inserted = await self._insert(str(user_id), rules, context, session)
+            awarded.extend(inserted)
+
+            # Every crossed rule, not just the new inserts: a failed earlier attempt
+            # may have inserted a badge without paying for it
+            bonus = 0
+            total_coins = None
+            for definition in rules:
+                if not definition.coins_reward:
+                    continue
+                balance = await award_badge_coins(user_id, definition.achievement_id, definition.coins_reward, session)
+                if balance is not None:
+                    bonus += definition.coins_reward
+                    total_coins = balance
+            coins_paid += bonus
+
+            # Badge coin rewards can cross total_coins thresholds in turn
+            changes = {}
+            if bonus:
+                changes = {TOTAL_COINS: (total_coins - bonus, total_coins)}
+
+        self.awarded += len(awarded)
+        return awarded, coins_paid
+
+    async def _insert(
+        self,
+        user_id: str,
+        rules: List[AchievementDefinition],
+        context: Optional[str],
+        session=None,
+    ) -> List[AchievementDefinition]:
+        """Insert Achievement documents, returning the definitions that were new."""
+        now = datetime.utcnow()
+        docs = [
+            {
+                "user_id": user_id,
+                "achievement_id": definition.achievement_id,
+                "earned_at": now,
+                "context": context,
+            }
+            for definition in rules
+        ]
+        duplicates = set()
+        try:
+            await Achievement.get_motor_collection().insert_many(docs, ordered=False, session=session)
+        except BulkWriteError as error:
+            for write_error in error.details.get("writeErrors", []):
+                if write_error["code"] != DUPLICATE_KEY_ERROR:
+                    raise
+                duplicates.add(write_error["index"])
+        return [definition for index, definition in enumerate(rules) if index not in duplicates]
+
+    def stats(self) -> dict:
+        """Return evaluation counters."""
+        return {
+            "rule_types": len(self._rules),
+            "evaluations": self.evaluations,
+            "rules_checked": self.rules_checked,
+            "awarded": self.awarded,
+        }
+
+
+achievement_engine = AchievementEngine()
+
+
+def merge_changes(batch: List[CounterChanges]) -> CounterChanges:
+    """Combine counter changes into one (lowest before, highest after) range per counter."""
+    merged: CounterChanges = {}
+    for changes in batch:
+        for requirement_type, (before, after) in changes.items():
+            if requirement_type in merged:
+                low, high = merged[requirement_type]
+                before, after = min(low, before), max(high, after)
+            merged[requirement_type] = (before, after)
+    return merged
+
+
+async def queue_evaluation(
+    user_id,
+    changes: CounterChanges,
+    context: Optional[str] = None,
+):
+    """Schedule badge evaluation for the counter changes of a progress event."""
+    if not changes:
+        return
+    await job_queue.enqueue(EVALUATE_ACHIEVEMENTS, user_id, {
+        "changes": {requirement_type: list(pair) for requirement_type, pair in changes.items()},
+        "context": context,
+    })
+
+
+async def queue_progress_effects(
+    user_id,
+    changes: CounterChanges,
+    rows: List[list],
+    context: Optional[str] = None,
+):
+    """
+    Queue badge evaluation and analytics rollups for an applied progress event.
+    
+    Errors are logged, not raised: the coins are already paid, and failing the
+    request would release its idempotency claim and let a retry pay again.
+    """
+    try:
+        await queue_evaluation(user_id, changes, context)
+        await record_activity(user_id, rows)
+    except Exception:
+        logger.exception("Could not queue progress effects for user %s", user_id)
+
+
+@job_queue.handler(EVALUATE_ACHIEVEMENTS)
+async def _evaluate_queued(user_id: str, payloads: List[dict]):
+    """Evaluate a user's queued changes as one batch."""
+    changes = merge_changes([
+        {requirement_type: tuple(pair) for requirement_type, pair in payload["changes"].items()}
+        for payload in payloads
+    ])
+    async with causal_sessions.session(user_id) as session:
+        awarded, coins_paid = await achievement_engine.evaluate(
+            ObjectId(user_id), changes, context=payloads[0]["context"], session=session
+        )
+
+    if awarded or coins_paid:
+        await record_activity(user_id, activity_rows(
+            datetime.utcnow().date(),
+            coins=coins_paid,
+            badges=[definition.achievement_id for definition in awarded],
+        ))
+
+    # Badge coin rewards changed the balance behind the cached user
+    if coins_paid:
+        user_cache.invalidate(user_id)
@@ -0,0 +1,75 @@
+"""
+Activity Calendar
+Compact record of the days on which a user completed the daily challenge.
+
+Days are bits in Progress.challenge_calendar: one subdocument per year with
+six 64-bit words ("w0".."w5") covering days 1-366, so a full year of history
+is at most six integers instead of an ever growing list of ISO dates.
+MongoDB sets a day with $bit and tests it with $bitsAllSet, so "already
+completed today?" is decided by the query filter without loading the
+calendar, and in Python a membership check is a shift and a mask.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, Tuple
+
+from bson import Int64
+
+CALENDAR_FIELD = "challenge_calendar"
+WORD_BITS = 64
+
+
+def day_slot(day: date) -> Tuple[str, str, int]:
+    """The (year, word, bit) holding a day."""
+    index = day.timetuple().tm_yday - 1
+    return str(day.year), f"w{index // WORD_BITS}", index % WORD_BITS
+
+
+def _day_path(day: date) -> Tuple[str, int]:
+    year, word, bit = day_slot(day)
+    return f"{CALENDAR_FIELD}.{year}.{word}", bit
+
+
+def _int64(word: int) -> Int64:
+    """Store an unsigned 64-bit word as MongoDB's signed long."""
+    return Int64(word - (1 << WORD_BITS) if word >= 1 << (WORD_BITS - 1) else word)
+
+
+def completed_filter(day: date) -> dict:
+    """Query filter matching progress documents with the day set."""
+    path, bit = _day_path(day)
+    return {path: {"$bitsAllSet": [bit]}}
+
+
+def not_completed_filter(day: date) -> dict:
+    """Query filter matching progress documents without the day (or without a calendar)."""
+    path, bit = _day_path(day)
+    return {path: {"$not": {"$bitsAllSet": [bit]}}}
+
+
+def mark_days(days: Iterable[date]) -> dict:
+    """$bit update operand setting every given day, one "or" per touched word."""
+    masks: Dict[str, int] = {}
+    for day in days:
+        path, bit = _day_path(day)
+        masks[path] = masks.get(path, 0) | (1 << bit)
+    return {path: {"or": _int64(mask)} for path, mask in masks.items()}
+
+
+def encode_days(days: Iterable[date]) -> dict:
+    """Build a calendar subdocument for inserting documents directly."""
+    words: Dict[str, Dict[str, int]] = {}
+    for day in days:
+        year, word, bit = day_slot(day)
+        year_words = words.setdefault(year, {})
+        year_words[word] = year_words.get(word, 0) | (1 << bit)
+    return {
+        year: {word: _int64(mask) for word, mask in sorted(year_words.items())}
+        for year, year_words in words.items()
+    }
+
+
+def contains(calendar: dict, day: date) -> bool:
+    """Whether a loaded calendar (or the part of it for the day's year) has the day."""
+    year, word, bit = day_slot(day)
+    return bool((calendar.get(year, {}).get(word, 0) >> bit) & 1)
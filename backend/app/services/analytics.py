@@ -0,0 +1,392 @@
+"""
+Analytics Rollups
+Pre-aggregated counters that reports read instead of scanning user history.
+
+Rollups are AnalyticsRollup documents keyed by (scope, key, day):
+
+    daily   / "all"           lessons, challenges, coins, badges, time_spent_seconds
+    lesson  / lesson_id       completions, time_spent_seconds (all sessions, finished or not),
+                              timed_completions, completion_time_seconds
+    badge   / achievement_id  earned
+    streaks / bucket          users (snapshot of the current streak distribution)
+
+Average time to complete a lesson is completion_time_seconds /
+timed_completions: the time on the user's lesson row when it was completed,
+counted only for completions that know it (offline sync completions don't).
+
+Progress events are counted as they happen: routes call record_activity(),
+which queues an analytics job, and the handler folds a user's queued events
+into one unordered bulk write of $inc upserts. A retried batch can count
+twice, which reporting tolerates.
+
+The streak distribution can't be counted from events, so once a day one
+worker (under a lease in analytics_checkpoints) snapshots it with $bucket and
+$merge. The same pass backfills days from before incremental counting
+started out of lesson_progress (which only keeps a user's latest completion
+of each lesson) and achievements, ANALYTICS_BACKFILL_CHUNK_DAYS at a time,
+and records each finished chunk so an interrupted backfill resumes where it
+stopped. Coins and challenges have no history to backfill.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.models.achievement import Achievement
+from app.models.analytics import AnalyticsCheckpoint, AnalyticsRollup
+from app.models.progress import Progress, LessonProgress
+from app.services.jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+# Analytics settings
+ANALYTICS_CHECK_SECONDS = float(os.getenv("ANALYTICS_CHECK_SECONDS", "3600"))
+ANALYTICS_BACKFILL_DAYS = int(os.getenv("ANALYTICS_BACKFILL_DAYS", "90"))
+ANALYTICS_BACKFILL_CHUNK_DAYS = int(os.getenv("ANALYTICS_BACKFILL_CHUNK_DAYS", "7"))
+ANALYTICS_LEASE_SECONDS = float(os.getenv("ANALYTICS_LEASE_SECONDS", "900"))
+
+RECORD_ACTIVITY = "analytics_rollup"
+NIGHTLY_CHECKPOINT = "nightly"
+
+# Rollup scopes
+DAILY = "daily"
+LESSON = "lesson"
+BADGE = "badge"
+STREAKS = "streaks"
+ALL = "all"
+
+# Streak distribution buckets: [0, 1), [1, 2), ... [60, 100) and 100+
+STREAK_BUCKETS = [0, 1, 2, 3, 4, 7, 14, 30, 60, 100]
+STREAK_OVERFLOW = "100+"
+
+RollupKey = Tuple[str, str, str]
+
+
+def activity_rows(
+    day: date,
+    lesson_id: Optional[str] = None,
+    lessons: int = 0,
+    challenges: int = 0,
+    coins: int = 0,
+    time_spent_seconds: int = 0,
+    badges: Iterable[str] = (),
+    completion_time_seconds: Optional[int] = None,
+) -> List[list]:
+    """Rollup increments of one progress event, as [scope, key, day, counters] rows."""
+    day_key = day.isoformat()
+    badges = list(badges)
+    rows = [[DAILY, ALL, day_key, {
+        "lessons": lessons,
+        "challenges": challenges,
+        "coins": coins,
+        "badges": len(badges),
+        "time_spent_seconds": time_spent_seconds,
+    }]]
+    if lesson_id is not None:
+        counters = {"completions": lessons, "time_spent_seconds": time_spent_seconds}
+        if completion_time_seconds is not None:
+            counters.update(timed_completions=lessons, completion_time_seconds=completion_time_seconds)
+        rows.append([LESSON, lesson_id, day_key, counters])
+    rows.extend([BADGE, achievement_id, day_key, {"earned": 1}] for achievement_id in badges)
+    return rows
+
+
+def merge_rows(rows: Iterable[list]) -> Dict[RollupKey, Dict[str, int]]:
+    """Sum rows per rollup document, dropping zero counters."""
+    merged: Dict[RollupKey, Dict[str, int]] = {}
+    for scope, key, day, counters in rows:
+        totals = merged.setdefault((scope, key, day), {})
+        for name, value in counters.items():
+            if value:
+                totals[name] = totals.get(name, 0) + value
+    return {rollup: counters for rollup, counters in merged.items() if counters}
+
+
+async def record_activity(user_id, rows: List[list]):
+    """Queue rollup increments; applied in the background by _apply_activity."""
+    if rows:
+        await job_queue.enqueue(RECORD_ACTIVITY, user_id, {"rows": rows})
+
+
+async def apply_rows(rows: Iterable[list]):
+    """Apply rollup increments now, as one bulk write of $inc upserts."""
+    merged = merge_rows(rows)
+    if not merged:
+        return
+    now = datetime.utcnow()
+    await AnalyticsRollup.get_motor_collection().bulk_write([
+        UpdateOne(
+            {"scope": scope, "key": key, "day": day},
+            {
+                "$inc": {f"counters.{name}": value for name, value in counters.items()},
+                "$set": {"updated_at": now},
+            },
+            upsert=True,
+        )
+        for (scope, key, day), counters in merged.items()
+    ], ordered=False)
+
+
+@job_queue.handler(RECORD_ACTIVITY)
+async def _apply_activity(user_id: str, payloads: List[dict]):
+    """Apply a user's queued increments as one bulk write."""
+    await apply_rows(row for payload in payloads for row in payload["rows"])
+
+
+def _merge_stage() -> dict:
+    """$merge into the rollups, replacing the counters of existing documents."""
+    return {"$merge": {
+        "into": AnalyticsRollup.Settings.name,
+        "on": ["scope", "key", "day"],
+        "whenMatched": [{"$set": {"counters": "$$new.counters", "updated_at": "$$new.updated_at"}}],
+        "whenNotMatched": "insert",
+    }}
+
+
+def _day_string(field: str) -> dict:
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": f"${field}"}}
+
+
+def streak_snapshot_pipeline(day: date, now: datetime) -> list:
+    """Aggregation on progress writing today's streak distribution."""
+    # current_streak is only rewritten on activity, so a streak counts only if
+    # the user was active today or yesterday; older ones have lapsed to 0
+    active_since = datetime.combine(day - timedelta(days=1), time.min)
+    return [
+        {"$bucket": {
+            "groupBy": {"$cond": [
+                # Missing and null dates sort below any date
+                {"$gte": ["$last_activity_date", active_since]},
+                {"$ifNull": ["$current_streak", 0]},
+                0,
+            ]},
+            "boundaries": STREAK_BUCKETS,
+            "default": STREAK_OVERFLOW,
+            "output": {"users": {"$sum": 1}},
+        }},
+        {"$project": {
+            "_id": False,
+            "scope": {"$literal": STREAKS},
+            "key": {"$toString": "$_id"},
+            "day": {"$literal": day.isoformat()},
+            "counters": {"users": "$users"},
+            "updated_at": {"$literal": now},
+        }},
+        _merge_stage(),
+    ]
+
+
+def lesson_backfill_pipeline(start: datetime, end: datetime, now: datetime) -> list:
+    """Aggregation on lesson_progress rebuilding per-lesson rollups for [start, end)."""
+    return [
+        {"$match": {"completed_at": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {"key": "$lesson_id", "day": _day_string("completed_at")},
+            "completions": {"$sum": 1},
+            "time_spent_seconds": {"$sum": {"$ifNull": ["$time_spent_seconds", 0]}},
+        }},
+        {"$project": {
+            "_id": False,
+            "scope": {"$literal": LESSON},
+            "key": "$_id.key",
+            "day": "$_id.day",
+            "counters": {
+                "completions": "$completions",
+                "time_spent_seconds": "$time_spent_seconds",
+                "timed_completions": "$completions",
+                "completion_time_seconds": "$time_spent_seconds",
+            },
+            "updated_at": {"$literal": now},
+        }},
+        _merge_stage(),
+    ]
+
+
+def badge_backfill_pipeline(start: datetime, end: datetime, now: datetime) -> list:
+    """Aggregation on achievements rebuilding per-badge rollups for [start, end)."""
+    return [
+        {"$match": {"earned_at": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {"key": "$achievement_id", "day": _day_string("earned_at")},
+            "earned": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": False,
+            "scope": {"$literal": BADGE},
+            "key": "$_id.key",
+            "day": "$_id.day",
+            "counters": {"earned": "$earned"},
+            "updated_at": {"$literal": now},
+        }},
+        _merge_stage(),
+    ]
+
+
+def daily_backfill_pipeline(start: date, end: date, now: datetime) -> list:
+    """Aggregation on the rollups themselves deriving daily totals for [start, end)."""
+    return [
+        {"$match": {"scope": {"$in": [LESSON, BADGE]}, "day": {"$gte": start.isoformat(), "$lt": end.isoformat()}}},
+        {"$group": {
+            "_id": "$day",
+            "lessons": {"$sum": {"$ifNull": ["$counters.completions", 0]}},
+            "time_spent_seconds": {"$sum": {"$ifNull": ["$counters.time_spent_seconds", 0]}},
+            "badges": {"$sum": {"$ifNull": ["$counters.earned", 0]}},
+        }},
+        {"$project": {
+            "_id": False,
+            "scope": {"$literal": DAILY},
+            "key": {"$literal": ALL},
+            "day": "$_id",
+            "counters": {"lessons": "$lessons", "time_spent_seconds": "$time_spent_seconds", "badges": "$badges"},
+            "updated_at": {"$literal": now},
+        }},
+        _merge_stage(),
+    ]
+
+
+class RollupScheduler:
+    """Runs the daily streak snapshot and history backfill on one worker at a time."""
+
+    def __init__(self, check_interval: float, backfill_days: int, chunk_days: int, lease_seconds: float):
+        self.check_interval = check_interval
+        self.backfill_days = backfill_days
+        self.chunk_days = chunk_days
+        self.lease = timedelta(seconds=lease_seconds)
+        self.owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.runs = 0
+        self.chunks_backfilled = 0
+        self.last_run_at: Optional[datetime] = None
+
+    async def _acquire(self, today: date, force: bool) -> Optional[dict]:
+        """Take the lease if the rollup is due (or forced) and nobody holds it."""
+        now = datetime.utcnow()
+        due = {} if force else {"last_run_day": {"$ne": today.isoformat()}}
+        try:
+            return await AnalyticsCheckpoint.get_motor_collection().find_one_and_update(
+                {
+                    "name": NIGHTLY_CHECKPOINT,
+                    "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+                    **due,
+                },
+                {
+                    "$set": {"owner": self.owner, "lease_until": now + self.lease, "updated_at": now},
+                    "$setOnInsert": {"tracking_started": today.isoformat()},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Not due, or another worker holds the lease
+            return None
+
+    async def _update_checkpoint(self, fields: dict):
+        await AnalyticsCheckpoint.get_motor_collection().update_one(
+            {"name": NIGHTLY_CHECKPOINT, "owner": self.owner},
+            {"$set": {**fields, "updated_at": datetime.utcnow()}},
+        )
+
+    async def backfill(self, checkpoint: dict):
+        """Rebuild rollups for the days before incremental counting started, chunk by chunk."""
+        tracking_started = date.fromisoformat(checkpoint["tracking_started"])
+        start = tracking_started - timedelta(days=self.backfill_days)
+        if checkpoint.get("backfilled_through"):
+            start = max(start, date.fromisoformat(checkpoint["backfilled_through"]) + timedelta(days=1))
+
+        while start < tracking_started:
+            end = min(start + timedelta(days=self.chunk_days), tracking_started)
+            now = datetime.utcnow()
+            start_at, end_at = datetime.combine(start, time.min), datetime.combine(end, time.min)
+
+            await LessonProgress.get_motor_collection().aggregate(
+                lesson_backfill_pipeline(start_at, end_at, now)
+            ).to_list(length=None)
+            await Achievement.get_motor_collection().aggregate(
+                badge_backfill_pipeline(start_at, end_at, now)
+            ).to_list(length=None)
+            await AnalyticsRollup.get_motor_collection().aggregate(
+                daily_backfill_pipeline(start, end, now)
+            ).to_list(length=None)
+
+            last_day = end - timedelta(days=1)
+            await self._update_checkpoint({
+                "backfilled_through": last_day.isoformat(),
+                "lease_until": datetime.utcnow() + self.lease,
+            })
+            self.chunks_backfilled += 1
+            logger.info("Analytics backfilled through %s", last_day)
+            start = end
+
+    async def snapshot_streaks(self, today: date):
+        """Write today's current streak distribution."""
+        await Progress.get_motor_collection().aggregate(
+            streak_snapshot_pipeline(today, datetime.utcnow())
+        ).to_list(length=None)
+
+    async def run(self, force: bool = False) -> bool:
+        """Run the daily rollup if due; returns whether this worker ran it."""
+        today = datetime.utcnow().date()
+        checkpoint = await self._acquire(today, force)
+        if checkpoint is None:
+            return False
+
+        try:
+            await self.snapshot_streaks(today)
+            await self.backfill(checkpoint)
+            await self._update_checkpoint({"last_run_day": today.isoformat(), "lease_until": None})
+        except Exception:
+            # Release the lease so the next check (here or in another worker) retries
+            await self._update_checkpoint({"lease_until": None})
+            raise
+
+        self.runs += 1
+        self.last_run_at = datetime.utcnow()
+        logger.info("Analytics rollup finished for %s", today)
+        return True
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("Analytics rollup failed")
+            await asyncio.sleep(self.check_interval)
+
+    async def start(self):
+        """Start checking whether the daily rollup is due."""
+        if self.check_interval > 0:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        """Stop the periodic check (an interrupted backfill resumes from its checkpoint)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Return run counters."""
+        return {
+            "runs": self.runs,
+            "chunks_backfilled": self.chunks_backfilled,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+rollup_scheduler = RollupScheduler(
+    check_interval=ANALYTICS_CHECK_SECONDS,
+    backfill_days=ANALYTICS_BACKFILL_DAYS,
+    chunk_days=ANALYTICS_BACKFILL_CHUNK_DAYS,
+    lease_seconds=ANALYTICS_LEASE_SECONDS,
+)
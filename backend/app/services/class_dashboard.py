@@ -0,0 +1,180 @@
+"""
+Class Dashboard
+Progress of a page of class members in a single aggregation.
+
+A dashboard page is one aggregate on users: match the class members, sort by
+display name, skip/limit to the page, then $lookup each member's Progress
+summary and LessonProgress rows through projected sub-pipelines served by
+their user_id indexes. Reads prefer secondaries (see app.database.routing).
+Pages are cached per worker for DASHBOARD_CACHE_TTL_SECONDS, so a teacher
+refreshing or paging back and forth costs no queries; membership changes in
+this worker drop the class's cached pages.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.database.routing import collection, DASHBOARD
+from app.models.classroom import ClassGroup
+from app.models.progress import Progress, LessonProgress
+from app.models.user import User
+
+# Dashboard settings
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+DASHBOARD_CACHE_MAX_CLASSES = int(os.getenv("DASHBOARD_CACHE_MAX_CLASSES", "1000"))
+CLASS_MAX_MEMBERS = int(os.getenv("CLASS_MAX_MEMBERS", "200"))
+DASHBOARD_MAX_PAGE_SIZE = 100
+
+# Progress fields shown per student
+DASHBOARD_PROGRESS_FIELDS = (
+    "total_lessons_completed",
+    "total_challenges_completed",
+    "total_time_spent_seconds",
+    "current_streak",
+    "longest_streak",
+    "last_activity_date",
+)
+DASHBOARD_LESSON_FIELDS = (
+    "lesson_id",
+    "status",
+    "completion_percentage",
+    "time_spent_seconds",
+    "attempts",
+    "completed_at",
+)
+
+
+def dashboard_pipeline(member_ids: List[str], skip: int, limit: int) -> list:
+    """Aggregation over users returning one page of members with their progress."""
+    return [
+        {"$match": {"_id": {"$in": [ObjectId(member_id) for member_id in member_ids]}}},
+        {"$sort": {"display_name": 1, "_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": {
+            "_id": False,
+            "user_id": {"$toString": "$_id"},
+            "display_name": True,
+            "avatar": True,
+            "scratchy_coins": True,
+        }},
+        {"$lookup": {
+            "from": Progress.Settings.name,
+            "localField": "user_id",
+            "foreignField": "user_id",
+            "pipeline": [{"$project": {"_id": False, **{field: True for field in DASHBOARD_PROGRESS_FIELDS}}}],
+            "as": "progress",
+        }},
+        {"$lookup": {
+            "from": LessonProgress.Settings.name,
+            "localField": "user_id",
+            "foreignField": "user_id",
+            "pipeline": [
+                {"$sort": {"lesson_id": 1}},
+                {"$project": {"_id": False, **{field: True for field in DASHBOARD_LESSON_FIELDS}}},
+            ],
+            "as": "lessons",
+        }},
+        {"$set": {"progress": {"$ifNull": [{"$first": "$progress"}, {}]}}},
+    ]
+
+
+def _student(doc: dict) -> dict:
+    """Shape one aggregated member, filling in counters for users without progress."""
+    progress = doc["progress"]
+    last_activity = progress.get("last_activity_date")
+    return {
+        "user_id": doc["user_id"],
+        "display_name": doc["display_name"],
+        "avatar": doc.get("avatar") or "default_avatar",
+        "scratchy_coins": doc.get("scratchy_coins", 0),
+        "progress": {
+            **{field: progress.get(field, 0) for field in DASHBOARD_PROGRESS_FIELDS if field != "last_activity_date"},
+            "last_activity_date": last_activity.isoformat() if last_activity else None,
+        },
+        "lessons": [
+            {
+                **lesson,
+                "completed_at": lesson["completed_at"].isoformat() if lesson.get("completed_at") else None,
+            }
+            for lesson in doc["lessons"]
+        ],
+    }
+
+
+async def build_dashboard(group: ClassGroup, page: int, page_size: int) -> dict:
+    """Read one dashboard page with a single aggregation."""
+    students = []
+    if group.member_ids:
+        cursor = collection(User, DASHBOARD).aggregate(
+            dashboard_pipeline(group.member_ids, (page - 1) * page_size, page_size)
+        )
+        students = [_student(doc) async for doc in cursor]
+
+    return {
+        "class_id": str(group.id),
+        "name": group.name,
+        "total_members": len(group.member_ids),
+        "page": page,
+        "page_size": page_size,
+        "students": students,
+    }
+
+
+class DashboardCache:
+    """Short-lived cache of dashboard pages, grouped by class for invalidation."""
+
+    def __init__(self, ttl_seconds: float, max_classes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_classes = max_classes
+        # class id -> (page, page_size) -> (expires_at, owner_id, dashboard)
+        self._classes: "OrderedDict[str, Dict[Tuple[int, int], Tuple[float, str, dict]]]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, class_id: str, page: int, page_size: int) -> Optional[Tuple[str, dict]]:
+        """Return (owner_id, dashboard) for a cached page, or None."""
+        pages = self._classes.get(class_id)
+        entry = pages.get((page, page_size)) if pages is not None else None
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._classes.move_to_end(class_id)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, class_id: str, page: int, page_size: int, owner_id: str, dashboard: dict):
+        if self.max_classes <= 0 or self.ttl_seconds <= 0:
+            return
+        pages = self._classes.setdefault(class_id, {})
+        pages[(page, page_size)] = (time.monotonic() + self.ttl_seconds, owner_id, dashboard)
+        self._classes.move_to_end(class_id)
+        while len(self._classes) > self.max_classes:
+            self._classes.popitem(last=False)
+
+    def invalidate(self, class_id: str):
+        """Drop every cached page of a class."""
+        self._classes.pop(class_id, None)
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "classes": len(self._classes),
+            "pages": sum(len(pages) for pages in self._classes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+dashboard_cache = DashboardCache(
+    ttl_seconds=DASHBOARD_CACHE_TTL_SECONDS,
+    max_classes=DASHBOARD_CACHE_MAX_CLASSES,
+)
@@ -0,0 +1,158 @@
+"""
+Content Cache
+Serves lessons, courses, daily challenges and badge definitions from memory.
+
+Content only changes when seed_data.py or an editor runs, so it is loaded once
+and reloaded only when the version document in the content_version collection
+changes. Anything that edits content must call bump_content_version(); every
+worker polls the version and converges within CONTENT_POLL_SECONDS. Catalog
+reads prefer secondaries (see app.database.routing).
+"""
+
+import asyncio
+import logging
+import os
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.database.routing import causal_sessions, collection, CATALOG
+from app.models.achievement import AchievementDefinition
+from app.models.course import ContentVersion, Course, Lesson
+
+logger = logging.getLogger(__name__)
+
+# Content cache settings
+CONTENT_POLL_SECONDS = float(os.getenv("CONTENT_POLL_SECONDS", "30"))
+CONTENT_VERSION_KEY = "catalog"
+CONTENT_VERSION_HEADER = "X-Content-Version"
+DAILY_CHALLENGE_COURSE = "daily_challenges"
+
+
+async def get_content_version(session=None) -> int:
+    """Read the current content version from the primary."""
+    doc = await ContentVersion.get_motor_collection().find_one(
+        {"key": CONTENT_VERSION_KEY},
+        projection={"_id": False, "version": True},
+        session=session,
+    )
+    return doc["version"] if doc else 0
+
+
+async def bump_content_version() -> int:
+    """Increment the content version so every worker reloads its cache."""
+    doc = await ContentVersion.get_motor_collection().find_one_and_update(
+        {"key": CONTENT_VERSION_KEY},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        projection={"_id": False, "version": True},
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["version"]
+
+
+async def _read_all(model, session, sort=None) -> list:
+    """Read a whole catalog collection, preferring secondaries."""
+    cursor = collection(model, CATALOG).find({}, sort=sort, session=session)
+    return [model.model_validate(doc) async for doc in cursor]
+
+
+class ContentCache:
+    """In-memory snapshot of the course catalog tagged with its content version."""
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.lessons: List[Lesson] = []
+        self.daily_challenges: List[Lesson] = []
+        self.courses: List[Course] = []
+        self.badges: List[AchievementDefinition] = []
+        self._lessons_by_id: Dict[str, Lesson] = {}
+        self.loaded_at: Optional[datetime] = None
+        self._poll_task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.reloads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    async def load(self):
+        """Load every content collection and swap the snapshot in."""
+        # The version is read from the primary first, in the same causal session
+        # as the catalog reads, so a lagging secondary can't serve content older
+        # than the version it gets tagged with. A bump during loading triggers
+        # another reload.
+        async with causal_sessions.session() as session:
+            version = await get_content_version(session)
+            all_lessons = await _read_all(Lesson, session, sort=[("order", 1)])
+            courses = await _read_all(Course, session, sort=[("order", 1)])
+            badges = await _read_all(AchievementDefinition, session)
+
+        self.lessons = [lesson for lesson in all_lessons if lesson.course_id != DAILY_CHALLENGE_COURSE]
+        self.daily_challenges = [lesson for lesson in all_lessons if lesson.course_id == DAILY_CHALLENGE_COURSE]
+        self.courses = courses
+        self.badges = badges
+        self._lessons_by_id = {lesson.lesson_id: lesson for lesson in all_lessons}
+        self.version = version
+        self.loaded_at = datetime.utcnow()
+        self.reloads += 1
+
+    async def refresh_if_changed(self) -> bool:
+        """Reload when the stored version differs from the cached one."""
+        version = await get_content_version()
+        if version == self.version:
+            return False
+        await self.load()
+        logger.info("Content cache reloaded at version %s", self.version)
+        return True
+
+    def lesson(self, lesson_id: str) -> Optional[Lesson]:
+        """Look up a lesson or daily challenge by id."""
+        return self._lessons_by_id.get(lesson_id)
+
+    def daily_challenge_for(self, day: date) -> Optional[Lesson]:
+        """Pick the daily challenge for a date, rotating by day of year."""
+        if not self.daily_challenges:
+            return None
+        return self.daily_challenges[day.timetuple().tm_yday % len(self.daily_challenges)]
+
+    async def _poll_forever(self):
+        while True:
+            await asyncio.sleep(CONTENT_POLL_SECONDS)
+            try:
+                await self.refresh_if_changed()
+            except Exception:
+                logger.exception("Content cache refresh failed")
+
+    async def start(self):
+        """Load the catalog and start polling the content version."""
+        await self.load()
+        if CONTENT_POLL_SECONDS > 0:
+            self._poll_task = asyncio.create_task(self._poll_forever())
+
+    async def stop(self):
+        """Stop polling the content version."""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+
+    def stats(self) -> dict:
+        """Return the cached version and object counts."""
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "reloads": self.reloads,
+            "lessons": len(self.lessons),
+            "daily_challenges": len(self.daily_challenges),
+            "courses": len(self.courses),
+            "badges": len(self.badges),
+        }
+
+
+content_cache = ContentCache()
@@ -0,0 +1,134 @@
+"""
+Password Hashing Executor
+Runs bcrypt hashing off the event loop in a bounded thread or process pool.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import bcrypt
+
+from app.services.metrics import PASSWORD_HASH_QUEUE_WAIT, PASSWORD_HASH_DURATION
+
+# Hashing executor settings
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread")  # thread, process
+HASH_MAX_WORKERS = int(os.getenv("HASH_MAX_WORKERS", "4"))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "64"))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "1"))
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing queue is full and the request should be shed."""
+
+
+def _bcrypt_hash(password: str) -> str:
+    """Hash a password with a fresh bcrypt salt."""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _bcrypt_check(password: str, hashed_password: str) -> bool:
+    """Check a password against a bcrypt hash."""
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+class PasswordHasher:
+    """Bounded executor for bcrypt work with queue-depth limiting and timing metrics."""
+
+    def __init__(self, max_workers: int, max_queue: int, use_processes: bool = False):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._slots = asyncio.Semaphore(max_workers)
+        self._waiting = 0
+        self._running = 0
+
+        # Metrics
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _run(self, fn: Callable, *args):
+        """Run fn in the pool, waiting for a free slot or failing fast when saturated."""
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise HashingBusyError("Password hashing queue is full")
+
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._running += 1
+        try:
+            started_at = time.perf_counter()
+            wait = started_at - queued_at
+            self.queue_wait_seconds += wait
+            self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, wait)
+            PASSWORD_HASH_QUEUE_WAIT.observe(wait)
+
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), fn, *args)
+
+            elapsed = time.perf_counter() - started_at
+            self.hash_seconds += elapsed
+            PASSWORD_HASH_DURATION.observe(elapsed)
+            self.completed += 1
+            return result
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        """Hash a password without blocking the event loop."""
+        return await self._run(_bcrypt_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password without blocking the event loop."""
+        return await self._run(_bcrypt_check, password, hashed_password)
+
+    def stats(self) -> dict:
+        """Return queue and timing metrics for the hashing pool."""
+        return {
+            "executor": "process" if self.use_processes else "thread",
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._running,
+            "queued": self._waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait_seconds_total": self.queue_wait_seconds,
+            "queue_wait_seconds_max": self.max_queue_wait_seconds,
+            "hash_seconds_total": self.hash_seconds,
+        }
+
+    def shutdown(self):
+        """Shut down the underlying pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hasher = PasswordHasher(
+    max_workers=HASH_MAX_WORKERS,
+    max_queue=HASH_MAX_QUEUE,
+    use_processes=HASH_EXECUTOR == "process",
+)
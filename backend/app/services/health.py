@@ -0,0 +1,151 @@
+"""
+Health Checks
+Liveness and readiness state computed in the background.
+
+A background task pings MongoDB every HEALTH_CHECK_INTERVAL_SECONDS and
+re-evaluates readiness: the last ping must have succeeded recently, the
+connection pool must not be saturated (every connection checked out with
+requests waiting), and the content cache and leaderboard must be loaded.
+Probes only read the stored result, so they are O(1) and never touch the
+database no matter how often the orchestrator calls them.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from app.database.connection import get_client, MONGODB_MAX_POOL_SIZE
+from app.database.monitoring import pool_monitor
+from app.services.content_cache import content_cache
+from app.services.leaderboard import leaderboard
+
+logger = logging.getLogger(__name__)
+
+# Health check settings
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "5"))
+HEALTH_PING_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PING_TIMEOUT_SECONDS", "2"))
+# A ping result older than this no longer counts (e.g. the check loop is stuck)
+HEALTH_PING_MAX_AGE_SECONDS = float(
+    os.getenv("HEALTH_PING_MAX_AGE_SECONDS", str(3 * HEALTH_CHECK_INTERVAL_SECONDS))
+)
+HEALTH_POOL_SATURATION = float(os.getenv("HEALTH_POOL_SATURATION", "1.0"))
+
+
+class HealthMonitor:
+    """Keeps the latest readiness verdict for the probe endpoints."""
+
+    def __init__(self, interval: float, ping_timeout: float, max_age: float, pool_saturation: float):
+        self.interval = interval
+        self.ping_timeout = ping_timeout
+        self.max_age = max_age
+        self.pool_saturation = pool_saturation
+        self.started_at = datetime.utcnow()
+        self.draining = False
+        self.ready = False
+        self.checks: dict = {"status": "starting"}
+
+        self._last_ping_ok: Optional[float] = None
+        self._last_ping_ms: Optional[float] = None
+        self._last_ping_error: Optional[str] = None
+        self._evaluated_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def ping(self):
+        """Ping MongoDB once and remember the outcome."""
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(get_client().admin.command("ping"), self.ping_timeout)
+        except Exception as error:
+            self._last_ping_error = f"{type(error).__name__}: {error}"[:200]
+            logger.warning("MongoDB health ping failed: %s", self._last_ping_error)
+            return
+        self._last_ping_ok = time.monotonic()
+        self._last_ping_ms = (self._last_ping_ok - started) * 1000
+        self._last_ping_error = None
+
+    def evaluate(self):
+        """Recompute readiness from the last ping, pool usage and cache state."""
+        now = time.monotonic()
+        ping_age = now - self._last_ping_ok if self._last_ping_ok is not None else None
+        database_ok = self._last_ping_error is None and ping_age is not None and ping_age <= self.max_age
+
+        pool = pool_monitor.stats()
+        pool_saturated = pool["waiting"] > 0 and pool["checked_out"] >= MONGODB_MAX_POOL_SIZE * self.pool_saturation
+
+        caches_warm = content_cache.loaded and leaderboard.loaded
+
+        self.ready = database_ok and not pool_saturated and caches_warm and not self.draining
+        self._evaluated_at = now
+        self.checks = {
+            "status": "ready" if self.ready else "draining" if self.draining else "not_ready",
+            "checked_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "database": {
+                "ok": database_ok,
+                "ping_ms": round(self._last_ping_ms, 2) if self._last_ping_ms is not None else None,
+                "ping_age_seconds": round(ping_age, 1) if ping_age is not None else None,
+                "error": self._last_ping_error,
+            },
+            "pool": {
+                "ok": not pool_saturated,
+                "checked_out": pool["checked_out"],
+                "waiting": pool["waiting"],
+                "max_size": MONGODB_MAX_POOL_SIZE,
+            },
+            "caches": {
+                "ok": caches_warm,
+                "content_version": content_cache.version,
+                "leaderboard_loaded": leaderboard.loaded,
+            },
+        }
+
+    async def _check_forever(self):
+        while True:
+            try:
+                await self.ping()
+                self.evaluate()
+            except Exception:
+                logger.exception("Health check failed")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        """Run a first check and start the background loop."""
+        self.draining = False
+        await self.ping()
+        self.evaluate()
+        self._task = asyncio.create_task(self._check_forever())
+
+    async def stop(self):
+        """Report not ready from now on and stop the background loop."""
+        self.draining = True
+        self.evaluate()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def readiness(self) -> Tuple[bool, dict]:
+        """The stored verdict, unless the check loop has stopped refreshing it."""
+        if self._evaluated_at is None or time.monotonic() - self._evaluated_at > self.max_age:
+            return False, {**self.checks, "status": "stale"}
+        return self.ready, self.checks
+
+    def liveness(self) -> dict:
+        """The process is up and serving requests."""
+        return {
+            "status": "alive",
+            "uptime_seconds": int((datetime.utcnow() - self.started_at).total_seconds()),
+        }
+
+
+health_monitor = HealthMonitor(
+    interval=HEALTH_CHECK_INTERVAL_SECONDS,
+    ping_timeout=HEALTH_PING_TIMEOUT_SECONDS,
+    max_age=HEALTH_PING_MAX_AGE_SECONDS,
+    pool_saturation=HEALTH_POOL_SATURATION,
+)
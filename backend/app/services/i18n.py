@@ -0,0 +1,60 @@
+"""
+Response Language Selection
+Resolves the language a client wants and projects bilingual payloads onto it.
+
+Content is stored bilingually as `field` (English) and `field_ar` (Arabic).
+A projected response keeps only `field`, filled in the requested language,
+plus a `lang` marker. The full bilingual shape is available with ?lang=both.
+"""
+
+from typing import Iterable, Optional
+
+from fastapi import Request
+
+SUPPORTED_LANGUAGES = ("en", "ar")
+BILINGUAL = "both"
+DEFAULT_LANGUAGE = "en"
+ARABIC_SUFFIX = "_ar"
+LANGUAGE_PATTERN = "^(en|ar|both)$"
+
+
+def _parse_accept_language(header: str) -> Optional[str]:
+    """Return the supported language with the highest q-value in an Accept-Language header."""
+    best, best_q = None, 0.0
+    for part in header.split(","):
+        tag, _, params = part.strip().partition(";")
+        primary = tag.strip().lower().split("-")[0]
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if primary in SUPPORTED_LANGUAGES and q > best_q:
+            best, best_q = primary, q
+    return best
+
+
+def resolve_language(request: Request, lang: Optional[str]) -> str:
+    """Pick the response language: ?lang= first, then Accept-Language, else bilingual."""
+    if lang:
+        return lang
+    header = request.headers.get("accept-language")
+    if not header:
+        return BILINGUAL
+    return _parse_accept_language(header) or DEFAULT_LANGUAGE
+
+
+def project_language(payload: dict, lang: str, fields: Iterable[str]) -> dict:
+    """Collapse each bilingual field pair in a payload into the requested language."""
+    if lang == BILINGUAL:
+        return payload
+
+    projected = dict(payload)
+    for field in fields:
+        arabic = projected.pop(field + ARABIC_SUFFIX, None)
+        if lang == "ar":
+            projected[field] = arabic
+    projected["lang"] = lang
+    return projected
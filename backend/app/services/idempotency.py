@@ -0,0 +1,178 @@
+"""
+Idempotency Keys
+Makes mutating routes safe to retry when the client sends an Idempotency-Key.
+
+The first request with a key claims it in the idempotency_records collection
+(unique per scope, expired by a TTL index), runs the handler and stores the
+response. Repeats get the stored response without running the handler, so
+coins and counters are never applied twice. Recently completed keys are also
+kept in memory, and concurrent duplicates in the same worker wait for the
+first request instead of racing it.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
+
+from app.models.sync import IdempotencyRecord, IDEMPOTENCY_TTL_HOURS
+
+# In-process fast path settings
+IDEMPOTENCY_LOCAL_ENTRIES = int(os.getenv("IDEMPOTENCY_LOCAL_ENTRIES", "10000"))
+IDEMPOTENCY_LOCAL_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_LOCAL_TTL_SECONDS", "600"))
+
+
+def fingerprint(*parts) -> str:
+    """Hash the parameters that must match when a key is reused."""
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Runs handlers at most once per (scope, key) and replays their responses."""
+
+    def __init__(self, local_entries: int, local_ttl_seconds: float):
+        self.local_entries = local_entries
+        self.local_ttl_seconds = min(local_ttl_seconds, IDEMPOTENCY_TTL_HOURS * 3600)
+        self._recent: "OrderedDict[Tuple[str, str], Tuple[float, str, dict]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], Tuple[str, asyncio.Future]] = {}
+
+        # Metrics
+        self.local_hits = 0
+        self.stored_hits = 0
+        self.executed = 0
+
+    def _remember(self, entry_key: Tuple[str, str], request_fingerprint: str, response: dict):
+        self._recent[entry_key] = (time.monotonic() + self.local_ttl_seconds, request_fingerprint, response)
+        self._recent.move_to_end(entry_key)
+        while len(self._recent) > self.local_entries:
+            self._recent.popitem(last=False)
+
+    def _recall(self, entry_key: Tuple[str, str]) -> Optional[Tuple[str, dict]]:
+        entry = self._recent.get(entry_key)
+        if entry is None:
+            return None
+        expires_at, request_fingerprint, response = entry
+        if expires_at <= time.monotonic():
+            del self._recent[entry_key]
+            return None
+        return request_fingerprint, response
+
+    @staticmethod
+    def _check_fingerprint(expected: str, actual: str):
+        if expected != actual:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+
+    async def run(
+        self,
+        key: Optional[str],
+        scope: str,
+        request_fingerprint: str,
+        handler: Callable[[], Awaitable[dict]],
+    ) -> dict:
+        """Run handler once for this key and scope, replaying the stored response for repeats."""
+        if not key:
+            return await handler()
+
+        entry_key = (scope, key)
+
+        # Fast path: a recent response from this worker
+        recalled = self._recall(entry_key)
+        if recalled is not None:
+            self._check_fingerprint(recalled[0], request_fingerprint)
+            self.local_hits += 1
+            return recalled[1]
+
+        # A duplicate is already running in this worker: share its outcome
+        in_flight = self._in_flight.get(entry_key)
+        if in_flight is not None:
+            self._check_fingerprint(in_flight[0], request_fingerprint)
+            return await asyncio.shield(in_flight[1])
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[entry_key] = (request_fingerprint, future)
+        try:
+            response = await self._claim_and_run(entry_key, request_fingerprint, handler)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[entry_key]
+
+    async def _claim_and_run(
+        self,
+        entry_key: Tuple[str, str],
+        request_fingerprint: str,
+        handler: Callable[[], Awaitable[dict]],
+    ) -> dict:
+        scope, key = entry_key
+        collection = IdempotencyRecord.get_motor_collection()
+        try:
+            await collection.insert_one({
+                "scope": scope,
+                "key": key,
+                "fingerprint": request_fingerprint,
+                "status": "in_progress",
+                "response": None,
+                "created_at": datetime.utcnow(),
+            })
+        except DuplicateKeyError:
+            stored = await collection.find_one(
+                {"scope": scope, "key": key},
+                projection={"_id": False, "fingerprint": True, "status": True, "response": True},
+            )
+            if stored is None or stored["status"] != "completed":
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed"
+                )
+            self._check_fingerprint(stored["fingerprint"], request_fingerprint)
+            self._remember(entry_key, stored["fingerprint"], stored["response"])
+            self.stored_hits += 1
+            return stored["response"]
+
+        try:
+            response = await handler()
+        except BaseException:
+            # Release the claim so a retry can run the handler again
+            await collection.delete_one({"scope": scope, "key": key, "status": "in_progress"})
+            raise
+
+        await collection.update_one(
+            {"scope": scope, "key": key},
+            {"$set": {"status": "completed", "response": response}},
+        )
+        self._remember(entry_key, request_fingerprint, response)
+        self.executed += 1
+        return response
+
+    def stats(self) -> dict:
+        """Return replay counters."""
+        return {
+            "local_entries": len(self._recent),
+            "in_flight": len(self._in_flight),
+            "local_hits": self.local_hits,
+            "stored_hits": self.stored_hits,
+            "executed": self.executed,
+        }
+
+
+idempotency = IdempotencyStore(
+    local_entries=IDEMPOTENCY_LOCAL_ENTRIES,
+    local_ttl_seconds=IDEMPOTENCY_LOCAL_TTL_SECONDS,
+)
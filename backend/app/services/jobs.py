@@ -0,0 +1,337 @@
+"""
+Background Job Queue
+In-process asyncio work queue for bookkeeping that doesn't need to finish
+before a response is sent (achievements, analytics, ...).
+
+Jobs are grouped by (kind, user_id): jobs enqueued while an earlier batch for
+the same user is still pending are merged and handed to the handler together,
+and a user's batches never run concurrently. A fixed number of worker tasks
+bounds concurrency, failed batches are retried with exponential backoff, and
+the queue is drained on shutdown.
+
+The storage backend is pluggable. The memory backend keeps nothing; the
+outbox backend writes each job to the job_outbox collection under a lease,
+deletes it once handled, and every JOB_SWEEP_SECONDS renews the leases of
+the jobs it still holds and reclaims jobs whose lease expired (e.g. because
+their process crashed), so an abandoned job is picked up within about one
+lease period by whichever process sweeps first. A reclaimed job may already
+have run in full or in part, so handlers must be safe to run again.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from pymongo import ReturnDocument
+
+from app.models.jobs import OutboxJob
+
+logger = logging.getLogger(__name__)
+
+# Job queue settings
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")  # memory, mongo
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "0.5"))
+JOB_DRAIN_TIMEOUT_SECONDS = float(os.getenv("JOB_DRAIN_TIMEOUT_SECONDS", "10"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_SWEEP_SECONDS = float(os.getenv("JOB_SWEEP_SECONDS", "60"))
+
+JobKey = Tuple[str, str]
+JobHandler = Callable[[str, List[dict]], Awaitable[None]]
+
+
+class Job:
+    """A unit of background work for one user."""
+
+    __slots__ = ("kind", "user_id", "payload", "attempts", "id")
+
+    def __init__(self, kind: str, user_id: str, payload: dict, attempts: int = 0, id=None):
+        self.kind = kind
+        self.user_id = user_id
+        self.payload = payload
+        self.attempts = attempts
+        self.id = id
+
+
+class MemoryBackend:
+    """Keeps jobs only in the queue; pending work is lost if the process dies."""
+
+    async def save(self, job: Job):
+        pass
+
+    async def done(self, jobs: List[Job]):
+        pass
+
+    async def retry(self, jobs: List[Job]):
+        pass
+
+    async def renew(self, jobs: List[Job]):
+        pass
+
+    async def recover(self) -> List[Job]:
+        return []
+
+
+class MongoOutboxBackend:
+    """Persists jobs in the job_outbox collection with a per-process lease."""
+
+    def __init__(self, lease_seconds: float):
+        self.lease = timedelta(seconds=lease_seconds)
+        self.owner = uuid.uuid4().hex
+
+    async def save(self, job: Job):
+        now = datetime.utcnow()
+        result = await OutboxJob.get_motor_collection().insert_one({
+            "kind": job.kind,
+            "user_id": job.user_id,
+            "payload": job.payload,
+            "attempts": job.attempts,
+            "owner": self.owner,
+            "lease_until": now + self.lease,
+            "created_at": now,
+        })
+        job.id = result.inserted_id
+
+    async def done(self, jobs: List[Job]):
+        ids = [job.id for job in jobs if job.id is not None]
+        if ids:
+            await OutboxJob.get_motor_collection().delete_many({"_id": {"$in": ids}})
+
+    async def retry(self, jobs: List[Job]):
+        ids = [job.id for job in jobs if job.id is not None]
+        if ids:
+            await OutboxJob.get_motor_collection().update_many(
+                {"_id": {"$in": ids}},
+                {"$inc": {"attempts": 1}, "$set": {"lease_until": datetime.utcnow() + self.lease}},
+            )
+
+    async def renew(self, jobs: List[Job]):
+        """Extend the leases of jobs this process still holds."""
+        ids = [job.id for job in jobs if job.id is not None]
+        if ids:
+            await OutboxJob.get_motor_collection().update_many(
+                {"_id": {"$in": ids}, "owner": self.owner},
+                {"$set": {"lease_until": datetime.utcnow() + self.lease}},
+            )
+
+    async def recover(self) -> List[Job]:
+        """Claim every job whose lease has expired."""
+        jobs = []
+        collection = OutboxJob.get_motor_collection()
+        while True:
+            now = datetime.utcnow()
+            doc = await collection.find_one_and_update(
+                {"lease_until": {"$lt": now}},
+                {"$set": {"owner": self.owner, "lease_until": now + self.lease}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                return jobs
+            jobs.append(Job(doc["kind"], doc["user_id"], doc["payload"], doc.get("attempts", 0), doc["_id"]))
+
+
+class JobQueue:
+    """Bounded-concurrency queue that batches jobs per (kind, user_id)."""
+
+    def __init__(self, workers: int, backend, max_attempts: int, retry_base_seconds: float, sweep_seconds: float):
+        self.workers = workers
+        self.backend = backend
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.sweep_seconds = sweep_seconds
+        self._handlers: Dict[str, JobHandler] = {}
+        self._pending: "OrderedDict[JobKey, List[Job]]" = OrderedDict()
+        self._scheduled: Set[JobKey] = set()  # keys waiting in _ready or running
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+        self._held: Set[Job] = set()  # saved or recovered jobs not yet finished
+        self._sweep_task: Optional[asyncio.Task] = None
+        self._accepting = False
+
+        # Metrics
+        self.enqueued = 0
+        self.batches = 0
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.recovered = 0
+        self.backend_errors = 0
+
+    def handler(self, kind: str):
+        """Register the coroutine that processes a batch of payloads of a job kind."""
+        def register(fn: JobHandler) -> JobHandler:
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    def _schedule(self, job: Job):
+        key = (job.kind, job.user_id)
+        self._pending.setdefault(key, []).append(job)
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+
+    async def enqueue(self, kind: str, user_id, payload: dict):
+        """Queue a job; runs inline if the queue isn't running (e.g. in scripts)."""
+        job = Job(kind, str(user_id), payload)
+        self.enqueued += 1
+        if not self._accepting:
+            await self._handlers[kind](job.user_id, [payload])
+            self.processed += 1
+            return
+        await self.backend.save(job)
+        self._held.add(job)
+        self._schedule(job)
+
+    async def _work(self):
+        while True:
+            key = await self._ready.get()
+            try:
+                jobs = self._pending.pop(key, [])
+                if jobs:
+                    await self._run(key, jobs)
+            except Exception:
+                # Never let one batch take a worker down
+                logger.exception("Job batch %s failed unexpectedly", key)
+            finally:
+                if key in self._pending:
+                    # More jobs for this user arrived while the batch ran
+                    self._ready.put_nowait(key)
+                else:
+                    self._scheduled.discard(key)
+                self._ready.task_done()
+
+    async def _run(self, key: JobKey, jobs: List[Job]):
+        kind, user_id = key
+        self.batches += 1
+        try:
+            await self._handlers[kind](user_id, [job.payload for job in jobs])
+        except Exception:
+            attempts = max(job.attempts for job in jobs) + 1
+            if attempts >= self.max_attempts:
+                self.failed += len(jobs)
+                logger.exception("Job %s for user %s failed after %s attempts", kind, user_id, attempts)
+                await self._finish(jobs)
+                return
+
+            logger.warning("Job %s for user %s failed, retrying (attempt %s)", kind, user_id, attempts)
+            self.retried += len(jobs)
+            for job in jobs:
+                job.attempts = attempts
+            try:
+                await self.backend.retry(jobs)
+            except Exception:
+                # The retry below still runs; only the stored attempt count is behind
+                self.backend_errors += 1
+                logger.exception("Could not record retry of job %s for user %s", kind, user_id)
+            task = asyncio.create_task(self._retry_later(jobs, self.retry_base_seconds * 2 ** (attempts - 1)))
+            self._retries.add(task)
+            task.add_done_callback(self._retries.discard)
+            return
+
+        self.processed += len(jobs)
+        await self._finish(jobs)
+
+    async def _finish(self, jobs: List[Job]):
+        """Remove handled jobs from the backend; if that fails they are reclaimed and run again later."""
+        self._held.difference_update(jobs)
+        try:
+            await self.backend.done(jobs)
+        except Exception:
+            self.backend_errors += 1
+            logger.exception("Could not remove %s finished jobs from the job backend", len(jobs))
+
+    async def _retry_later(self, jobs: List[Job], delay: float):
+        await asyncio.sleep(delay)
+        for job in jobs:
+            self._schedule(job)
+
+    async def sweep(self):
+        """Renew the leases of held jobs and queue jobs whose lease expired elsewhere."""
+        await self.backend.renew(list(self._held))
+        recovered = await self.backend.recover()
+        if recovered:
+            logger.info("Recovered %s jobs with expired leases", len(recovered))
+        for job in recovered:
+            self.recovered += 1
+            self._held.add(job)
+            self._schedule(job)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_seconds)
+            try:
+                await self.sweep()
+            except Exception:
+                self.backend_errors += 1
+                logger.exception("Job lease sweep failed")
+
+    async def start(self):
+        """Start the worker tasks, re-queue expired jobs and start the periodic lease sweep."""
+        self._ready = asyncio.Queue()
+        self._accepting = True
+        await self.sweep()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if self.sweep_seconds > 0:
+            self._sweep_task = asyncio.create_task(self._sweep_forever())
+
+    async def drain(self, timeout: float = JOB_DRAIN_TIMEOUT_SECONDS):
+        """Finish queued work (bounded by timeout) and stop the workers."""
+        if self._ready is None:
+            return
+        self._accepting = False
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+        try:
+            await asyncio.wait_for(self._wait_idle(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Job queue drain timed out with %s batches pending", len(self._pending))
+
+        for task in [*self._tasks, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        self._tasks = []
+        self._ready = None
+
+    async def _wait_idle(self):
+        while True:
+            await self._ready.join()
+            if not self._retries:
+                return
+            await asyncio.gather(*self._retries, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Return queue depth and throughput counters."""
+        return {
+            "backend": type(self.backend).__name__,
+            "workers": self.workers,
+            "pending_batches": len(self._pending),
+            "pending_jobs": sum(len(jobs) for jobs in self._pending.values()),
+            "enqueued": self.enqueued,
+            "batches": self.batches,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "recovered": self.recovered,
+            "backend_errors": self.backend_errors,
+        }
+
+
+job_queue = JobQueue(
+    workers=JOB_WORKERS,
+    backend=MongoOutboxBackend(JOB_LEASE_SECONDS) if JOB_BACKEND == "mongo" else MemoryBackend(),
+    max_attempts=JOB_MAX_ATTEMPTS,
+    retry_base_seconds=JOB_RETRY_BASE_SECONDS,
+    sweep_seconds=JOB_SWEEP_SECONDS,
+)
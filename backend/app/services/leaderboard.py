@@ -0,0 +1,204 @@
+"""
+Leaderboard Service
+Keeps a sorted in-memory ranking of users by Scratchy Coins.
+
+The ranking is loaded once at startup with a projected scan, kept current by
+the coin-changing routes in this worker and periodically reloaded so that
+changes made by other workers converge; reloads prefer secondaries (see
+app.database.routing). Top-N, cursor pagination and
+"rank of user X" lookups are O(log n) against the sorted list.
+"""
+
+import asyncio
+import base64
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+from app.database.routing import collection, LEADERBOARD
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard settings
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "60"))
+LEADERBOARD_MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(coins: int, user_id: str) -> str:
+    """Encode the position after a leaderboard entry as an opaque cursor."""
+    return base64.urlsafe_b64encode(f"{coins}:{user_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """Decode a cursor produced by encode_cursor."""
+    coins, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+    return int(coins), user_id
+
+
+class Leaderboard:
+    """Sorted ranking of users, highest coins first, ties broken by user id."""
+
+    def __init__(self):
+        self._ranking: SortedList = SortedList()  # (-coins, user_id)
+        self._users: Dict[str, dict] = {}  # user_id -> display fields and coins
+        self._pending: Optional[Dict[str, dict]] = None  # updates made while reloading
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.loaded = False
+        # Bumped on every change, so readers can tell when to look again
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._ranking)
+
+    async def load(self):
+        """Rebuild the ranking from MongoDB without interrupting readers."""
+        self._pending = {}
+        try:
+            ranking = SortedList()
+            users = {}
+            cursor = collection(User, LEADERBOARD).find(
+                {},
+                projection={"display_name": True, "avatar": True, "scratchy_coins": True},
+            )
+            async for doc in cursor:
+                user_id = str(doc["_id"])
+                coins = doc.get("scratchy_coins", 0)
+                users[user_id] = {
+                    "display_name": doc.get("display_name", ""),
+                    "avatar": doc.get("avatar") or "default_avatar",
+                    "scratchy_coins": coins,
+                }
+                ranking.add((-coins, user_id))
+
+            pending, self._pending = self._pending, None
+            self._ranking, self._users = ranking, users
+            for user_id, fields in pending.items():
+                self.update(user_id, **fields)
+            self.loaded = True
+            self.version += 1
+        finally:
+            self._pending = None
+
+    def update(
+        self,
+        user_id: str,
+        scratchy_coins: Optional[int] = None,
+        display_name: Optional[str] = None,
+        avatar: Optional[str] = None,
+    ):
+        """Apply a coin or profile change for a user."""
+        changes = {
+            key: value
+            for key, value in (
+                ("scratchy_coins", scratchy_coins),
+                ("display_name", display_name),
+                ("avatar", avatar),
+            )
+            if value is not None
+        }
+        if self._pending is not None:
+            self._pending.setdefault(user_id, {}).update(changes)
+
+        entry = self._users.get(user_id)
+        if entry is None:
+            # Users we have never seen need a name to be shown; otherwise wait for the reload
+            if display_name is None or scratchy_coins is None:
+                return
+            entry = {
+                "display_name": display_name,
+                "avatar": avatar or "default_avatar",
+                "scratchy_coins": scratchy_coins,
+            }
+            self._users[user_id] = entry
+            self._ranking.add((-scratchy_coins, user_id))
+            self.version += 1
+            return
+
+        if scratchy_coins is not None and scratchy_coins != entry["scratchy_coins"]:
+            self._ranking.discard((-entry["scratchy_coins"], user_id))
+            self._ranking.add((-scratchy_coins, user_id))
+        if any(entry.get(key) != value for key, value in changes.items()):
+            entry.update(changes)
+            self.version += 1
+
+    def remove(self, user_id: str):
+        """Drop a user from the ranking."""
+        entry = self._users.pop(user_id, None)
+        if entry is not None:
+            self._ranking.discard((-entry["scratchy_coins"], user_id))
+            self.version += 1
+
+    def _entries(self, start: int, stop: int) -> List[dict]:
+        return [
+            {"rank": rank, "user_id": user_id, **self._users[user_id]}
+            for rank, (_, user_id) in enumerate(self._ranking[start:stop], start + 1)
+        ]
+
+    def top(self, limit: int) -> List[dict]:
+        """Return the top entries."""
+        return self._entries(0, limit)
+
+    def page(self, cursor: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+        """Return the entries after a cursor and the cursor for the next page."""
+        start = 0
+        if cursor:
+            coins, user_id = decode_cursor(cursor)
+            start = self._ranking.bisect_right((-coins, user_id))
+
+        entries = self._entries(start, start + limit)
+        next_cursor = None
+        if entries and start + len(entries) < len(self._ranking):
+            last = entries[-1]
+            next_cursor = encode_cursor(last["scratchy_coins"], last["user_id"])
+        return entries, next_cursor
+
+    def rank_of(self, user_id: str, neighbours: int = 0) -> Optional[dict]:
+        """Return a user's rank with the entries immediately above and below."""
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+
+        index = self._ranking.index((-entry["scratchy_coins"], user_id))
+        return {
+            "rank": index + 1,
+            "total": len(self._ranking),
+            "entries": self._entries(max(0, index - neighbours), index + neighbours + 1),
+        }
+
+    async def _refresh_forever(self):
+        while True:
+            await asyncio.sleep(LEADERBOARD_REFRESH_SECONDS)
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("Leaderboard refresh failed")
+
+    async def start(self):
+        """Load the ranking and start the periodic reload."""
+        await self.load()
+        if LEADERBOARD_REFRESH_SECONDS > 0:
+            self._refresh_task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self):
+        """Stop the periodic reload."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def stats(self) -> dict:
+        """Return ranking size and load state."""
+        return {
+            "loaded": self.loaded,
+            "users": len(self._ranking),
+            "version": self.version,
+        }
+
+
+leaderboard = Leaderboard()
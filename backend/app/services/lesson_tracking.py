@@ -0,0 +1,334 @@
+"""
+Lesson Tracking
+Per-lesson progress (LessonProgress) with buffered time-spent heartbeats.
+
+Starting and completing a lesson are single upserts on the user's
+LessonProgress row. Heartbeats, which clients send every few seconds while
+a lesson is open, are not written one by one: HeartbeatBuffer coalesces them
+in memory per (user, lesson) and every HEARTBEAT_FLUSH_SECONDS writes
+everything pending with one unordered bulk_write per collection: $inc/$max
+upserts on lesson_progress, the time added to each user's
+Progress.total_time_spent_seconds, and the analytics time rollups. The
+buffer flushes early when it holds HEARTBEAT_MAX_PENDING entries and once
+more on shutdown, so a worker loses at most one interval of time tracking
+if it dies. Each (user, lesson) is credited at most the wall-clock time its
+heartbeats span, however often they are sent.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.models.course import Lesson
+from app.models.progress import Progress, LessonProgress
+from app.services.analytics import activity_rows, apply_rows, merge_rows
+from app.services.rewards import progress_on_insert
+
+logger = logging.getLogger(__name__)
+
+# Heartbeat settings
+HEARTBEAT_FLUSH_SECONDS = float(os.getenv("HEARTBEAT_FLUSH_SECONDS", "30"))
+HEARTBEAT_MAX_PENDING = int(os.getenv("HEARTBEAT_MAX_PENDING", "10000"))
+# Longest interval a single heartbeat may report
+HEARTBEAT_MAX_SECONDS = 120
+
+
+async def start_lesson(user_id: str, lesson: Lesson, session=None):
+    """Create the user's row for a lesson (or count another attempt) and mark it accessed."""
+    now = datetime.utcnow()
+    await LessonProgress.get_motor_collection().update_one(
+        {"user_id": user_id, "lesson_id": lesson.lesson_id},
+        {
+            "$inc": {"attempts": 1},
+            "$set": {"last_accessed": now},
+            "$setOnInsert": {
+                "course_id": lesson.course_id,
+                "status": "in_progress",
+                "completion_percentage": 0,
+                "time_spent_seconds": 0,
+                "hints_used": 0,
+                "coins_earned": 0,
+                "started_at": now,
+                "completed_at": None,
+            },
+        },
+        upsert=True,
+        session=session,
+    )
+
+
+async def complete_lesson_progress(user_id: str, lesson: Lesson, coins_earned: int, session=None) -> int:
+    """Mark the user's row for a lesson completed and return the time recorded on it."""
+    now = datetime.utcnow()
+    doc = await LessonProgress.get_motor_collection().find_one_and_update(
+        {"user_id": user_id, "lesson_id": lesson.lesson_id},
+        {
+            "$set": {
+                "course_id": lesson.course_id,
+                "status": "completed",
+                "completion_percentage": 100,
+                "completed_at": now,
+                "last_accessed": now,
+            },
+            "$inc": {"coins_earned": coins_earned},
+            "$setOnInsert": {"started_at": now, "attempts": 1},
+        },
+        upsert=True,
+        projection={"_id": False, "time_spent_seconds": True},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    return doc.get("time_spent_seconds", 0)
+
+
+class PendingHeartbeat:
+    """Heartbeats for one (user, lesson) since the last flush."""
+
+    __slots__ = ("course_id", "seconds", "completion_percentage", "hints_used", "first_at", "last_at")
+
+    def __init__(self, course_id: str, first_at: datetime, now: datetime):
+        self.course_id = course_id
+        self.seconds = 0
+        self.completion_percentage = 0
+        self.hints_used = 0
+        # Start of the time these heartbeats may claim
+        self.first_at = first_at
+        self.last_at = now
+
+
+class HeartbeatBuffer:
+    """Coalesces lesson heartbeats in memory and writes them in periodic bulk flushes."""
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[str, str], PendingHeartbeat] = {}
+        # End of the time already credited per (user, lesson), for the last HEARTBEAT_MAX_SECONDS
+        self._credited_until: Dict[Tuple[str, str], datetime] = {}
+        # Written to lesson_progress but not yet to progress / the rollups
+        self._unwritten_time: Dict[str, int] = {}
+        self._unwritten_rows: List[list] = []
+        self._flush_soon = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.heartbeats = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    def add(self, user_id: str, lesson: Lesson, seconds: int, completion_percentage: Optional[int], hints_used: int):
+        """Record a heartbeat; O(1), no I/O."""
+        now = datetime.utcnow()
+        key = (user_id, lesson.lesson_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            first_at = now - timedelta(seconds=seconds)
+            credited_until = self._credited_until.get(key)
+            if credited_until is not None:
+                first_at = max(first_at, credited_until)
+            pending = self._pending[key] = PendingHeartbeat(lesson.course_id, first_at, now)
+            if len(self._pending) >= self.max_pending:
+                self._flush_soon.set()
+        # Never more time than has passed on the clock, however often heartbeats arrive
+        elapsed = int((now - pending.first_at).total_seconds())
+        pending.seconds = min(pending.seconds + seconds, elapsed)
+        pending.hints_used += hints_used
+        if completion_percentage is not None:
+            pending.completion_percentage = max(pending.completion_percentage, completion_percentage)
+        pending.last_at = now
+        self.heartbeats += 1
+
+    def pending_seconds(self, user_id: str, lesson_id: str) -> int:
+        """Time buffered for a user's lesson but not yet flushed."""
+        pending = self._pending.get((user_id, lesson_id))
+        return pending.seconds if pending is not None else 0
+
+    @staticmethod
+    def _lesson_write(key: Tuple[str, str], pending: PendingHeartbeat) -> UpdateOne:
+        user_id, lesson_id = key
+        return UpdateOne(
+            {"user_id": user_id, "lesson_id": lesson_id},
+            {
+                "$inc": {"time_spent_seconds": pending.seconds, "hints_used": pending.hints_used},
+                "$max": {"completion_percentage": pending.completion_percentage},
+                "$set": {"last_accessed": pending.last_at},
+                "$setOnInsert": {
+                    "course_id": pending.course_id,
+                    "status": "in_progress",
+                    "attempts": 1,
+                    "coins_earned": 0,
+                    "started_at": pending.first_at,
+                    "completed_at": None,
+                },
+            },
+            upsert=True,
+        )
+
+    async def _write_lessons(self, batch: Dict[Tuple[str, str], PendingHeartbeat]) -> Dict[Tuple[str, str], PendingHeartbeat]:
+        """Write a batch to lesson_progress and return the entries that were written."""
+        keys = list(batch)
+        try:
+            await LessonProgress.get_motor_collection().bulk_write(
+                [self._lesson_write(key, batch[key]) for key in keys], ordered=False
+            )
+        except BulkWriteError as error:
+            # Unordered: everything but the reported writes was applied
+            failed = {keys[write_error["index"]] for write_error in error.details.get("writeErrors", [])}
+            self._restore({key: batch[key] for key in failed})
+            self.failures += 1
+            logger.warning("%s of %s heartbeat rows failed to write", len(failed), len(keys))
+            return {key: pending for key, pending in batch.items() if key not in failed}
+        except Exception:
+            self._restore(batch)
+            raise
+        return batch
+
+    async def _write_time(self):
+        """Add the pending time to each user's Progress.total_time_spent_seconds."""
+        time_by_user, self._unwritten_time = self._unwritten_time, {}
+        users = [user_id for user_id, seconds in time_by_user.items() if seconds]
+        if not users:
+            return
+        now = datetime.utcnow()
+        on_insert = progress_on_insert(now, "total_time_spent_seconds", "updated_at")
+        try:
+            await Progress.get_motor_collection().bulk_write([
+                UpdateOne(
+                    {"user_id": user_id},
+                    {
+                        "$inc": {"total_time_spent_seconds": time_by_user[user_id]},
+                        "$set": {"updated_at": now},
+                        "$setOnInsert": on_insert,
+                    },
+                    upsert=True,
+                )
+                for user_id in users
+            ], ordered=False)
+        except BulkWriteError as error:
+            failed = [users[write_error["index"]] for write_error in error.details.get("writeErrors", [])]
+            self._keep_time({user_id: time_by_user[user_id] for user_id in failed})
+            raise
+        except Exception:
+            self._keep_time(time_by_user)
+            raise
+
+    def _keep_time(self, time_by_user: Dict[str, int]):
+        for user_id, seconds in time_by_user.items():
+            self._unwritten_time[user_id] = self._unwritten_time.get(user_id, 0) + seconds
+
+    async def _write_rollups(self):
+        rows, self._unwritten_rows = self._unwritten_rows, []
+        try:
+            await apply_rows(rows)
+        except Exception:
+            # Kept merged, so retries don't grow the list
+            self._unwritten_rows = [
+                [*rollup, counters] for rollup, counters in merge_rows(rows + self._unwritten_rows).items()
+            ]
+            raise
+
+    async def flush(self):
+        """
+        Write every pending heartbeat.
+
+        The three writes are staged: entries reach progress and the rollups only
+        once their lesson_progress write succeeded, and whatever fails is kept
+        for the next flush without repeating the writes that went through.
+        """
+        self._flush_soon.clear()
+        batch, self._pending = self._pending, {}
+        try:
+            if batch:
+                written = await self._write_lessons(batch)
+                self._credit(written)
+                for (user_id, lesson_id), pending in written.items():
+                    self._unwritten_time[user_id] = self._unwritten_time.get(user_id, 0) + pending.seconds
+                    self._unwritten_rows += activity_rows(
+                        pending.last_at.date(), lesson_id=lesson_id, time_spent_seconds=pending.seconds
+                    )
+                self.rows_written += len(written)
+
+            await self._write_time()
+            if self._unwritten_rows:
+                await self._write_rollups()
+        except Exception:
+            self.failures += 1
+            raise
+        if batch:
+            self.flushes += 1
+
+    def _credit(self, written: Dict[Tuple[str, str], PendingHeartbeat]):
+        """Remember how far time was credited; forget keys too old to matter."""
+        horizon = datetime.utcnow() - timedelta(seconds=HEARTBEAT_MAX_SECONDS)
+        self._credited_until = {
+            key: until for key, until in self._credited_until.items() if until > horizon
+        }
+        for key, pending in written.items():
+            self._credited_until[key] = pending.last_at
+
+    def _restore(self, batch: Dict[Tuple[str, str], PendingHeartbeat]):
+        """Put unwritten entries back, merged with heartbeats that arrived meanwhile."""
+        for key, pending in batch.items():
+            current = self._pending.get(key)
+            if current is not None:
+                pending.seconds += current.seconds
+                pending.hints_used += current.hints_used
+                pending.completion_percentage = max(pending.completion_percentage, current.completion_percentage)
+                pending.last_at = current.last_at
+                pending.seconds = min(pending.seconds, int((pending.last_at - pending.first_at).total_seconds()))
+            self._pending[key] = pending
+
+    async def _flush_forever(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_soon.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Heartbeat flush failed")
+
+    async def start(self):
+        """Start the periodic flush."""
+        self._flush_soon = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._flush_forever())
+
+    async def stop(self):
+        """Stop the periodic flush, letting a flush in progress finish, and write what is left."""
+        if self._task is not None:
+            # Not cancelled: a cancelled bulk_write would lose its batch
+            self._stopping = True
+            self._flush_soon.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final heartbeat flush failed; %s entries lost", len(self._pending))
+
+    def stats(self) -> dict:
+        """Return buffer size and flush counters."""
+        return {
+            "pending": len(self._pending),
+            "unwritten_users": len(self._unwritten_time),
+            "unwritten_rollups": len(self._unwritten_rows),
+            "heartbeats": self.heartbeats,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+        }
+
+
+heartbeat_buffer = HeartbeatBuffer(
+    flush_interval=HEARTBEAT_FLUSH_SECONDS,
+    max_pending=HEARTBEAT_MAX_PENDING,
+)
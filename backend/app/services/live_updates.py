@@ -0,0 +1,252 @@
+"""
+Live Updates
+Pushes leaderboard and coin changes to connected clients over Server-Sent Events.
+
+One broadcaster per worker watches the in-memory leaderboard (see
+app.services.leaderboard), which every coin change in this worker updates
+and the periodic reload brings in line with other workers. Every
+LIVE_BROADCAST_SECONDS it compares the leaderboard version with the last one
+it saw; when it moved, it diffs the top LIVE_TOP_N against what it last
+broadcast and encodes the delta (changed entries and entries that dropped
+out) once, sharing that one message with every subscriber. Each subscribed
+user additionally gets their own coins and rank when those changed.
+
+Subscribers have bounded queues. A client that falls LIVE_QUEUE_SIZE events
+behind has its backlog dropped and gets one fresh snapshot instead, so a
+slow connection never holds memory for, or delays, anyone else.
+
+Streams end after LIVE_STREAM_MAX_SECONDS (or on shutdown) with a final
+`reconnect` event, which keeps connections spread across workers and lets
+deploys drain. The stream token is only checked when a stream opens and
+expires long before the stream does, so the client must fetch a new token
+and open a new stream rather than let EventSource retry the old URL.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from app.services.leaderboard import leaderboard
+
+logger = logging.getLogger(__name__)
+
+# Live update settings
+LIVE_TOP_N = int(os.getenv("LIVE_TOP_N", "10"))
+LIVE_BROADCAST_SECONDS = float(os.getenv("LIVE_BROADCAST_SECONDS", "1"))
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "32"))
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "5000"))
+LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))
+LIVE_STREAM_MAX_SECONDS = float(os.getenv("LIVE_STREAM_MAX_SECONDS", "300"))
+LIVE_STREAM_TOKEN_SECONDS = float(os.getenv("LIVE_STREAM_TOKEN_SECONDS", "60"))
+
+# Queue markers
+_RESYNC = object()
+_CLOSE = object()
+
+KEEPALIVE = ": keepalive\n\n"
+
+
+def format_event(event: str, data) -> str:
+    """Encode one SSE message."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+# Last message of every stream: fetch a new stream token and reconnect
+RECONNECT = format_event("reconnect", {"detail": "Stream ended, fetch a new stream token to reconnect"})
+
+
+class Subscriber:
+    """One open stream: the user it belongs to and its bounded outgoing queue."""
+
+    __slots__ = ("user_id", "queue")
+
+    def __init__(self, user_id: str, max_queue: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+
+    def send(self, message) -> bool:
+        """Queue a message; when full, replace the backlog with a resync. False if it overflowed."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC if message is not _CLOSE else _CLOSE)
+            return False
+
+
+class LiveUpdates:
+    """Per-worker broadcaster diffing the leaderboard and fanning out deltas."""
+
+    def __init__(self, top_n: int, interval: float, max_queue: int, max_subscribers: int):
+        self.top_n = top_n
+        self.interval = interval
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._count = 0
+        self._top: Dict[str, dict] = {}  # user_id -> entry as last broadcast
+        self._me: Dict[str, Tuple[Optional[int], Optional[int]]] = {}  # user_id -> (coins, rank) last sent
+        self._seen_version = -1
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.broadcasts = 0
+        self.messages = 0
+        self.resyncs = 0
+
+    def has_capacity(self) -> bool:
+        """Whether another stream can subscribe on this worker."""
+        return self._count < self.max_subscribers
+
+    def subscribe(self, user_id: str) -> Optional[Subscriber]:
+        """Register a stream, or return None when the worker is at LIVE_MAX_SUBSCRIBERS."""
+        if self._count >= self.max_subscribers:
+            return None
+        # Catch up first, so the snapshot matches what the next delta is computed against
+        self.broadcast()
+        subscriber = Subscriber(user_id, self.max_queue)
+        self._subscribers.setdefault(user_id, set()).add(subscriber)
+        self._count += 1
+        self._me.setdefault(user_id, self._position(user_id))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        streams = self._subscribers.get(subscriber.user_id)
+        if streams is None or subscriber not in streams:
+            return
+        streams.discard(subscriber)
+        self._count -= 1
+        if not streams:
+            del self._subscribers[subscriber.user_id]
+            self._me.pop(subscriber.user_id, None)
+
+    def _position(self, user_id: str) -> Tuple[Optional[int], Optional[int]]:
+        rank = leaderboard.rank_of(user_id)
+        if rank is None:
+            return None, None
+        return rank["entries"][0]["scratchy_coins"], rank["rank"]
+
+    def snapshot(self, user_id: str) -> str:
+        """The full top-N and the user's own coins and rank."""
+        coins, rank = self._position(user_id)
+        return format_event("snapshot", {
+            "leaderboard": list(self._top.values()),
+            "me": {"scratchy_coins": coins, "rank": rank},
+        })
+
+    def _send(self, subscriber: Subscriber, message: str):
+        self.messages += 1
+        if not subscriber.send(message):
+            self.resyncs += 1
+
+    def broadcast(self):
+        """Send what changed since the last broadcast; O(1) when the leaderboard did not move."""
+        if leaderboard.version == self._seen_version:
+            return
+        self._seen_version = leaderboard.version
+
+        top = {entry["user_id"]: entry for entry in leaderboard.top(self.top_n)}
+        changed = [entry for user_id, entry in top.items() if self._top.get(user_id) != entry]
+        removed = [user_id for user_id in self._top if user_id not in top]
+        self._top = top
+        if not self._subscribers:
+            return
+
+        self.broadcasts += 1
+        if changed or removed:
+            # Encoded once, shared by every stream
+            message = format_event("leaderboard", {"changed": changed, "removed": removed})
+            for streams in self._subscribers.values():
+                for subscriber in streams:
+                    self._send(subscriber, message)
+
+        for user_id, streams in self._subscribers.items():
+            position = self._position(user_id)
+            if position == self._me.get(user_id):
+                continue
+            self._me[user_id] = position
+            message = format_event("me", {"scratchy_coins": position[0], "rank": position[1]})
+            for subscriber in streams:
+                self._send(subscriber, message)
+
+    async def stream(self, user_id: str) -> AsyncIterator[str]:
+        """
+        SSE body for one user: a snapshot, then deltas and keepalives.
+
+        Subscribes on the first iteration, so a response that is never started
+        (client gone before the body) never holds a subscription.
+        """
+        subscriber = self.subscribe(user_id)
+        if subscriber is None:
+            yield format_event("error", {"detail": "Too many open streams, try again later"})
+            yield RECONNECT
+            return
+        deadline = time.monotonic() + LIVE_STREAM_MAX_SECONDS
+        try:
+            yield self.snapshot(user_id)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield RECONNECT
+                    return
+                try:
+                    message = await asyncio.wait_for(
+                        subscriber.queue.get(), min(LIVE_KEEPALIVE_SECONDS, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+                    continue
+                if message is _CLOSE:
+                    yield RECONNECT
+                    return
+                yield self.snapshot(subscriber.user_id) if message is _RESYNC else message
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def _broadcast_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.broadcast()
+            except Exception:
+                logger.exception("Live update broadcast failed")
+
+    async def start(self):
+        """Start the broadcaster."""
+        self._task = asyncio.create_task(self._broadcast_forever())
+
+    async def stop(self):
+        """Stop the broadcaster and end every open stream."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for streams in self._subscribers.values():
+            for subscriber in streams:
+                subscriber.send(_CLOSE)
+
+    def stats(self) -> dict:
+        """Return subscriber counts and broadcast counters."""
+        return {
+            "subscribers": self._count,
+            "users": len(self._subscribers),
+            "broadcasts": self.broadcasts,
+            "messages": self.messages,
+            "resyncs": self.resyncs,
+        }
+
+
+live_updates = LiveUpdates(
+    top_n=LIVE_TOP_N,
+    interval=LIVE_BROADCAST_SECONDS,
+    max_queue=LIVE_QUEUE_SIZE,
+    max_subscribers=LIVE_MAX_SUBSCRIBERS,
+)
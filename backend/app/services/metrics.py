@@ -0,0 +1,342 @@
+"""
+Prometheus Metrics
+Minimal counters, histograms and callback gauges rendered in the Prometheus
+text exposition format on /metrics.
+
+Request metrics are recorded by MetricsMiddleware, a pure ASGI middleware
+keyed by method, route template and status, so cardinality stays bounded by
+the number of routes. Recording a request is a bisect into the bucket bounds
+and a few integer increments on the event loop thread, with no locks or
+allocations beyond the label tuple. Values owned by other services (cache hit
+ratios, pool usage, queue depth) are read from their stats() only when
+/metrics is scraped.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+Sample = Tuple[Labels, float]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    """Value that goes up and down."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, *labels: str):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (+Inf last), sum]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Counter or gauge whose samples are read from a function at scrape time."""
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: Sequence[str], collect: Callable[[], Iterable[Sample]]):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.collect()
+        ]
+
+
+class Registry:
+    """Ordered set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, kind: str, labelnames: Sequence[str] = ()):
+        """Decorator registering a function that yields (labels, value) samples."""
+        def register(collect: Callable[[], Iterable[Sample]]):
+            self.register(CallbackMetric(name, help, kind, labelnames, collect))
+            return collect
+        return register
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.render()
+            except Exception:
+                # A failing collector must not break the whole scrape
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+)
+REQUESTS_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being handled.")
+
+# Domain events
+COINS_AWARDED = registry.counter("scratchy_coins_awarded_total", "Scratchy Coins awarded to users.")
+LESSONS_COMPLETED = registry.counter("lessons_completed_total", "Lesson completions recorded.")
+LOGINS = registry.counter("logins_total", "Login attempts by result.", ("result",))
+
+# Password hashing: waiting for a pool slot and the bcrypt work itself
+PASSWORD_HASH_QUEUE_WAIT = registry.histogram(
+    "password_hash_queue_wait_seconds", "Time password hashing tasks waited for a pool slot."
+)
+PASSWORD_HASH_DURATION = registry.histogram(
+    "password_hash_duration_seconds", "Time spent hashing or verifying a password in the pool."
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "(unmatched)"),
+                str(status),
+            )
+
+
+# Gauges read from other services at scrape time. Imports are local so that
+# services can import this module for their counters.
+
+@registry.callback("cache_hit_ratio", "Hit ratio of in-process caches.", "gauge", ("cache",))
+def _cache_hit_ratio():
+    from app.services.user_cache import user_cache
+    from app.services.response_cache import catalog_responses
+    from app.services.class_dashboard import dashboard_cache
+    yield ("user",), user_cache.stats()["hit_ratio"]
+    yield ("catalog_response",), catalog_responses.stats()["hit_ratio"]
+    yield ("class_dashboard",), dashboard_cache.stats()["hit_ratio"]
+
+
+@registry.callback("cache_entries", "Entries held by in-process caches.", "gauge", ("cache",))
+def _cache_entries():
+    from app.services.user_cache import user_cache
+    from app.services.response_cache import catalog_responses
+    from app.services.idempotency import idempotency
+    from app.services.leaderboard import leaderboard
+    from app.services.token_revocation import token_revocations
+    yield ("user",), user_cache.stats()["size"]
+    yield ("catalog_response",), catalog_responses.stats()["size"]
+    yield ("idempotency",), idempotency.stats()["local_entries"]
+    yield ("leaderboard",), leaderboard.stats()["users"]
+    yield ("token_revocations",), token_revocations.stats()["users"]
+
+
+@registry.callback("content_version", "Content version served from the content cache.", "gauge")
+def _content_version():
+    from app.services.content_cache import content_cache
+    yield (), content_cache.version or 0
+
+
+@registry.callback("mongodb_pool_connections", "MongoDB pool connections by state.", "gauge", ("state",))
+def _pool_connections():
+    from app.database.monitoring import pool_monitor
+    stats = pool_monitor.stats()
+    for state in ("open", "checked_out", "waiting"):
+        yield (state,), stats[state]
+
+
+@registry.callback("mongodb_pool_max_size", "Configured maximum MongoDB pool size.", "gauge")
+def _pool_max_size():
+    from app.database.connection import MONGODB_MAX_POOL_SIZE
+    yield (), MONGODB_MAX_POOL_SIZE
+
+
+@registry.callback("mongodb_pool_checkout_failures_total", "Failed MongoDB connection checkouts.", "counter")
+def _pool_checkout_failures():
+    from app.database.monitoring import pool_monitor
+    yield (), pool_monitor.stats()["checkout_failures"]
+
+
+@registry.callback("mongodb_commands_total", "MongoDB commands by collection and command.", "counter", ("collection", "command"))
+def _mongodb_commands():
+    from app.database.monitoring import command_monitor
+    for (collection, command_name), (count, _, _, _) in command_monitor.snapshot().items():
+        yield (collection, command_name), count
+
+
+@registry.callback("mongodb_command_seconds_total", "Time spent in MongoDB commands.", "counter", ("collection", "command"))
+def _mongodb_command_seconds():
+    from app.database.monitoring import command_monitor
+    for (collection, command_name), (_, total_ms, _, _) in command_monitor.snapshot().items():
+        yield (collection, command_name), total_ms / 1000
+
+
+@registry.callback("job_queue_pending_jobs", "Background jobs waiting to run.", "gauge")
+def _job_queue_pending():
+    from app.services.jobs import job_queue
+    yield (), job_queue.stats()["pending_jobs"]
+
+
+@registry.callback("job_queue_jobs_total", "Background jobs by outcome.", "counter", ("outcome",))
+def _job_queue_jobs():
+    from app.services.jobs import job_queue
+    stats = job_queue.stats()
+    for outcome in ("processed", "retried", "failed"):
+        yield (outcome,), stats[outcome]
+
+
+@registry.callback("live_stream_subscribers", "Open live update streams.", "gauge")
+def _live_subscribers():
+    from app.services.live_updates import live_updates
+    yield (), live_updates.stats()["subscribers"]
+
+
+@registry.callback("live_stream_resyncs_total", "Slow live update streams reset to a snapshot.", "counter")
+def _live_resyncs():
+    from app.services.live_updates import live_updates
+    yield (), live_updates.stats()["resyncs"]
+
+
+@registry.callback("lesson_heartbeats_pending", "Lesson heartbeats buffered for the next flush.", "gauge")
+def _heartbeats_pending():
+    from app.services.lesson_tracking import heartbeat_buffer
+    yield (), heartbeat_buffer.stats()["pending"]
+
+
+@registry.callback("lesson_heartbeat_flushes_total", "Lesson heartbeat flushes by outcome.", "counter", ("outcome",))
+def _heartbeat_flushes():
+    from app.services.lesson_tracking import heartbeat_buffer
+    stats = heartbeat_buffer.stats()
+    yield ("written",), stats["flushes"]
+    yield ("failed",), stats["failures"]
+
+
+@registry.callback("password_hash_tasks", "Password hashing tasks by state.", "gauge", ("state",))
+def _password_hash_tasks():
+    from app.services.hashing import hasher
+    stats = hasher.stats()
+    yield ("in_flight",), stats["in_flight"]
+    yield ("queued",), stats["queued"]
+
+
+@registry.callback("password_hash_rejected_total", "Password hashing requests rejected as busy.", "counter")
+def _password_hash_rejected():
+    from app.services.hashing import hasher
+    yield (), hasher.stats()["rejected"]
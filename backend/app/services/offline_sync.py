@@ -0,0 +1,361 @@
+"""
+Offline Sync
+Applies a batch of queued PWA progress events with one write per collection.
+
+Events are first claimed by inserting their idempotency keys into the
+processed_events collection (unique per user), so replays of the same batch
+are reported as duplicates and never applied twice. The claimed events are
+then folded in client-timestamp order into a single Progress update, one
+bulk write of LessonProgress rows and, last, a single coin increment.
+
+On a replica set those three writes run in one transaction, so a batch is
+applied completely or not at all and a failure releases its claims for the
+client to retry. A standalone server has no transactions: there claims are
+only released while nothing has been written.
+
+Daily challenge days are claimed by the Progress update itself: its filter
+requires every day to still be unset in the calendar, exactly like an
+online completion (see rewards.record_daily_challenge), so a day completed
+online and offline at the same time is only paid once.
+"""
+
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.database.routing import causal_sessions, supports_transactions
+from app.models.progress import Progress, LessonProgress
+from app.models.sync import ProcessedEvent
+from app.services.activity_calendar import (
+    CALENDAR_FIELD,
+    contains as calendar_contains,
+    mark_days,
+    not_completed_filter,
+)
+from app.services.content_cache import content_cache
+from app.services.metrics import LESSONS_COMPLETED
+from app.services.rewards import award_coins, advance_streak, PROGRESS_SUMMARY_FIELDS
+from app.services.achievements import counter_changes, queue_progress_effects
+from app.services.analytics import activity_rows
+
+DUPLICATE_KEY_ERROR = 11000
+DEFAULT_LESSON_COINS = 10
+# Transaction retries when a concurrent first write creates the progress document
+TRANSACTION_ATTEMPTS = 3
+
+# Sync settings
+# Oldest daily challenge an offline batch may still claim, in days before today
+SYNC_CHALLENGE_MAX_AGE_DAYS = int(os.getenv("SYNC_CHALLENGE_MAX_AGE_DAYS", "1"))
+
+# Event types accepted by the sync endpoint
+LESSON_COMPLETE = "lesson_complete"
+DAILY_CHALLENGE_COMPLETE = "daily_challenge_complete"
+ADD_COINS = "add_coins"
+EVENT_TYPES = (LESSON_COMPLETE, DAILY_CHALLENGE_COMPLETE, ADD_COINS)
+
+
+def _to_utc(timestamp: datetime, now: datetime) -> datetime:
+    """Convert a client timestamp to naive UTC, clamping clock skew into the future."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(timestamp, now)
+
+
+async def _claim_events(user_id: str, events: list, now: datetime, session=None) -> List[bool]:
+    """Insert idempotency keys and return, per event, whether this batch owns it."""
+    claimed = [True] * len(events)
+    if not events:
+        return claimed
+
+    docs = [
+        {
+            "user_id": user_id,
+            "idempotency_key": event.idempotency_key,
+            "event_type": event.type,
+            "client_timestamp": _to_utc(event.client_timestamp, now),
+            "applied_at": now,
+        }
+        for event in events
+    ]
+    try:
+        await ProcessedEvent.get_motor_collection().insert_many(docs, ordered=False, session=session)
+    except BulkWriteError as error:
+        for write_error in error.details.get("writeErrors", []):
+            if write_error["code"] != DUPLICATE_KEY_ERROR:
+                raise
+            claimed[write_error["index"]] = False
+    return claimed
+
+
+async def _release_events(user_id: str, keys: List[str]):
+    """Forget claimed keys after a failed apply so the client can retry them."""
+    if keys:
+        await ProcessedEvent.get_motor_collection().delete_many(
+            {"user_id": user_id, "idempotency_key": {"$in": keys}}
+        )
+
+
+def _progress_update(
+    now: datetime,
+    lessons_completed: int,
+    streak: Optional[tuple],
+    days: List[date],
+) -> dict:
+    """The batch's single Progress update; streak is (current, longest, last_activity) when lessons advanced it."""
+    update = {
+        "$set": {"updated_at": now},
+        "$setOnInsert": {
+            "total_courses_completed": 0,
+            "total_time_spent_seconds": 0,
+            "created_at": now,
+        },
+        "$inc": {
+            "total_lessons_completed": lessons_completed,
+            "total_challenges_completed": len(days),
+        },
+    }
+    if streak is not None:
+        current_streak, longest_streak, last_activity = streak
+        update["$set"].update(
+            current_streak=current_streak,
+            longest_streak=longest_streak,
+            last_activity_date=last_activity,
+        )
+    else:
+        update["$setOnInsert"].update(current_streak=0, longest_streak=0, last_activity_date=None)
+    if days:
+        update["$bit"] = mark_days(days)
+    else:
+        update["$setOnInsert"][CALENDAR_FIELD] = {}
+    return update
+
+
+async def _completed_days(user_id: str, days: List[date], session=None) -> List[date]:
+    """Which of the days are already set in the user's calendar."""
+    progress = await Progress.get_motor_collection().find_one(
+        {"user_id": user_id},
+        projection={f"{CALENDAR_FIELD}.{year}": True for year in {str(day.year) for day in days}},
+        session=session,
+    ) or {}
+    calendar = progress.get(CALENDAR_FIELD, {})
+    return [day for day in days if calendar_contains(calendar, day)]
+
+
+async def _in_transaction(session, apply) -> dict:
+    """Run apply in a transaction, from a fresh snapshot again when a concurrent insert raced it."""
+    for attempt in range(TRANSACTION_ATTEMPTS):
+        try:
+            return await session.with_transaction(apply)
+        except DuplicateKeyError:
+            if attempt == TRANSACTION_ATTEMPTS - 1:
+                raise
+
+
+async def apply_events(user_id, events: list) -> dict:
+    """
+    Apply a batch of sync events for a user.
+
+    Returns per-event results plus the user's coin total and progress summary
+    after the batch. Streaks are recomputed from the client timestamps, so a
+    week of offline lessons still counts as a week-long streak.
+    """
+    now = datetime.utcnow()
+    user_key = str(user_id)
+    # One causal session so the user's next reads observe the whole batch
+    async with causal_sessions.session(user_key) as session:
+        claimed = await _claim_events(user_key, events, now, session)
+
+        ordered = sorted(
+            (index for index, owned in enumerate(claimed) if owned),
+            key=lambda index: _to_utc(events[index].client_timestamp, now),
+        )
+        claimed_keys = [events[index].idempotency_key for index in ordered]
+
+        oldest_challenge_day = now.date() - timedelta(days=SYNC_CHALLENGE_MAX_AGE_DAYS)
+        # Only the calendar years the batch's challenge events fall in
+        challenge_years = {
+            str(_to_utc(events[index].client_timestamp, now).year)
+            for index in ordered
+            if events[index].type == DAILY_CHALLENGE_COMPLETE
+        }
+
+        in_transaction = supports_transactions()
+        # Without a transaction, claims are released on failure only while nothing has been written
+        written = False
+
+        async def apply(session) -> dict:
+            nonlocal written
+            # Rebuilt on every attempt: a retried transaction starts over
+            results = [
+                {"idempotency_key": event.idempotency_key, "status": "applied" if owned else "duplicate"}
+                for event, owned in zip(events, claimed)
+            ]
+            progress = await Progress.get_motor_collection().find_one(
+                {"user_id": user_key},
+                projection={
+                    "current_streak": True,
+                    "longest_streak": True,
+                    "last_activity_date": True,
+                    **{f"{CALENDAR_FIELD}.{year}": True for year in challenge_years},
+                },
+                session=session,
+            ) or {}
+
+            current_streak = streak_before = progress.get("current_streak", 0)
+            longest_streak = progress.get("longest_streak", 0)
+            last_activity: Optional[datetime] = progress.get("last_activity_date")
+            calendar = progress.get(CALENDAR_FIELD, {})
+
+            coins = 0
+            lessons_completed = 0
+            # day -> index of the event claiming it
+            new_days: Dict[date, int] = {}
+            rollup_rows: List[list] = []
+            lesson_writes = []
+
+            for index in ordered:
+                event = events[index]
+                timestamp = _to_utc(event.client_timestamp, now)
+
+                if event.type == LESSON_COMPLETE:
+                    lesson = content_cache.lesson(event.lesson_id) if event.lesson_id else None
+                    if lesson is None:
+                        results[index].update(status="rejected", reason="Unknown lesson")
+                        continue
+                    # The lesson decides the payout, not the client
+                    earned = lesson.coins_reward or DEFAULT_LESSON_COINS
+                    coins += earned
+                    rollup_rows += activity_rows(timestamp.date(), lesson_id=lesson.lesson_id, lessons=1, coins=earned)
+                    lessons_completed += 1
+
+                    current_streak, longest_streak = advance_streak(
+                        current_streak,
+                        longest_streak,
+                        last_activity.date() if last_activity else None,
+                        timestamp.date(),
+                    )
+                    last_activity = max(last_activity, timestamp) if last_activity else timestamp
+
+                    lesson_writes.append(UpdateOne(
+                        {"user_id": user_key, "lesson_id": lesson.lesson_id},
+                        {
+                            "$set": {
+                                "course_id": lesson.course_id,
+                                "status": "completed",
+                                "completion_percentage": 100,
+                                "completed_at": timestamp,
+                                "last_accessed": timestamp,
+                            },
+                            "$inc": {"attempts": 1, "coins_earned": earned},
+                            "$setOnInsert": {"started_at": timestamp},
+                        },
+                        upsert=True,
+                    ))
+
+                elif event.type == DAILY_CHALLENGE_COMPLETE:
+                    day = timestamp.date()
+                    if day < oldest_challenge_day:
+                        results[index].update(status="rejected", reason="Challenge is too old to sync")
+                        continue
+                    challenge = content_cache.daily_challenge_for(day)
+                    if challenge is None:
+                        results[index].update(status="rejected", reason="No daily challenges available")
+                        continue
+                    if day in new_days or calendar_contains(calendar, day):
+                        results[index].update(status="rejected", reason="Already completed that day's challenge")
+                        continue
+                    new_days[day] = index
+
+                elif event.type == ADD_COINS:
+                    if event.coins <= 0:
+                        results[index].update(status="rejected", reason="Amount must be positive")
+                        continue
+                    coins += event.coins
+                    rollup_rows += activity_rows(timestamp.date(), coins=event.coins)
+
+            streak = (current_streak, longest_streak, last_activity) if lessons_completed else None
+            while True:
+                days = sorted(new_days)
+                query = {"user_id": user_key}
+                if days:
+                    # Matches only while every claimed day is still open
+                    query["$and"] = [not_completed_filter(day) for day in days]
+                try:
+                    summary = await Progress.get_motor_collection().find_one_and_update(
+                        query,
+                        _progress_update(now, lessons_completed, streak, days),
+                        upsert=True,
+                        projection=PROGRESS_SUMMARY_FIELDS,
+                        return_document=ReturnDocument.AFTER,
+                        session=session,
+                    )
+                    break
+                except DuplicateKeyError:
+                    if in_transaction:
+                        # The transaction is aborted; _in_transaction retries from a fresh snapshot
+                        raise
+                    # A day was completed meanwhile (online or by another batch); drop it and retry
+                    taken = await _completed_days(user_key, days, session) if days else []
+                    if not taken:
+                        raise
+                    for day in taken:
+                        results[new_days.pop(day)].update(
+                            status="rejected", reason="Already completed that day's challenge"
+                        )
+            written = True
+
+            for day in sorted(new_days):
+                reward = content_cache.daily_challenge_for(day).coins_reward
+                coins += reward
+                rollup_rows += activity_rows(day, challenges=1, coins=reward)
+
+            if lesson_writes:
+                await LessonProgress.get_motor_collection().bulk_write(lesson_writes, ordered=False, session=session)
+
+            # Last, so without a transaction a failed write above is never retried into a second payout
+            total_coins = await award_coins(user_id, coins, session) if coins else None
+
+            return {
+                "results": results,
+                "coins_earned": coins,
+                "total_coins": total_coins,
+                "progress": summary,
+                "lessons_completed": lessons_completed,
+                "challenges_completed": len(new_days),
+                "streak_before": streak_before,
+                "rollup_rows": rollup_rows,
+            }
+
+        try:
+            outcome = await (_in_transaction(session, apply) if in_transaction else apply(session))
+        except Exception:
+            # A failed transaction wrote nothing, so the client can safely retry every event
+            if in_transaction or not written:
+                await _release_events(user_key, claimed_keys)
+            raise
+
+    if outcome["lessons_completed"]:
+        LESSONS_COMPLETED.inc(outcome["lessons_completed"])
+    await queue_progress_effects(
+        user_id,
+        counter_changes(
+            outcome["progress"],
+            outcome["total_coins"],
+            coins=outcome["coins_earned"],
+            lessons=outcome["lessons_completed"],
+            challenges=outcome["challenges_completed"],
+            streak_before=outcome["streak_before"],
+        ),
+        outcome["rollup_rows"],
+        context="Offline sync",
+    )
+
+    return {
+        "results": outcome["results"],
+        "coins_earned": outcome["coins_earned"],
+        "total_coins": outcome["total_coins"],
+        "progress": outcome["progress"],
+    }
@@ -0,0 +1,113 @@
+"""
+Catalog Response Cache
+Pre-encoded JSON bodies with strong ETags for endpoints whose output only
+depends on the content version (lessons, badges, daily challenge).
+
+Bodies are built and encoded once per content version and variant key, then
+served as raw bytes so the cached path skips Pydantic validation and JSON
+encoding entirely. Requests carrying a matching If-None-Match get a 304.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+
+from app.services.content_cache import content_cache, CONTENT_VERSION_HEADER
+
+# Response cache settings
+CATALOG_MAX_AGE_SECONDS = int(os.getenv("CATALOG_MAX_AGE_SECONDS", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+
+class CachedBody:
+    """Encoded response body and its strong ETag."""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Per content version cache of encoded catalog responses."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._version: Optional[int] = None
+        self._entries: Dict[Hashable, CachedBody] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> CachedBody:
+        """Return the cached body for a key, building it on first use in this content version."""
+        if self._version != content_cache.version:
+            self._entries.clear()
+            self._version = content_cache.version
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = CachedBody(body)
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+        self._entries[key] = entry
+        return entry
+
+    def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        build: Callable[[], Any],
+        max_age: int = CATALOG_MAX_AGE_SECONDS,
+    ) -> Response:
+        """Serve a cached body, or a 304 when the client already has it."""
+        entry = self.get(key, build)
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": f"public, max-age={max_age}",
+            CONTENT_VERSION_HEADER: str(self._version),
+            # Bodies can be projected to the Accept-Language of the request
+            "Vary": "Accept-Language",
+        }
+
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        """Return hit/miss/304 counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+catalog_responses = ResponseCache()
@@ -0,0 +1,205 @@
+"""
+Rewards and Progress Updates
+Atomic server-side updates for coins, lesson completions and daily challenges.
+
+Every helper issues a single find_one_and_update that only touches the fields
+it changes and returns the post-update values, so concurrent requests for the
+same user can never overwrite each other's increments. Each accepts an
+optional session so routes can run them in a causal session (see
+app.database.routing).
+"""
+
+from datetime import datetime, date
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.models.user import User
+from app.models.progress import Progress
+from app.services.activity_calendar import mark_days, not_completed_filter
+from app.services.leaderboard import leaderboard
+from app.services.metrics import COINS_AWARDED, LESSONS_COMPLETED
+
+PROGRESS_SUMMARY_FIELDS = {
+    "_id": False,
+    "total_lessons_completed": True,
+    "total_challenges_completed": True,
+    "current_streak": True,
+    "longest_streak": True,
+}
+
+
+def _progress_defaults(now: datetime) -> dict:
+    """Field values for a Progress document created by an upsert."""
+    return {
+        "total_lessons_completed": 0,
+        "total_courses_completed": 0,
+        "total_challenges_completed": 0,
+        "total_time_spent_seconds": 0,
+        "current_streak": 0,
+        "longest_streak": 0,
+        "last_activity_date": None,
+        "challenge_calendar": {},
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def progress_on_insert(now: datetime, *updated: str) -> dict:
+    """$setOnInsert for a Progress upsert, leaving out the fields the update itself sets."""
+    return {field: value for field, value in _progress_defaults(now).items() if field not in updated}
+
+
+def advance_streak(
+    current_streak: int,
+    longest_streak: int,
+    last_day: Optional[date],
+    day: date,
+) -> Tuple[int, int]:
+    """
+    Apply one day of activity to a streak and return (current, longest).
+
+    Mirrors the server-side pipeline in record_lesson_completion for callers
+    that fold several events in Python, such as the offline sync endpoint.
+    """
+    if last_day is None:
+        current_streak = 1
+    else:
+        days_diff = (day - last_day).days
+        if days_diff == 1:
+            current_streak += 1
+        elif days_diff > 1:
+            current_streak = 1
+    return current_streak, max(longest_streak, current_streak)
+
+
+async def award_coins(user_id, amount: int, session=None) -> Optional[int]:
+    """Add coins to a user and return the new balance, or None if the user is gone."""
+    return await _add_coins(user_id, amount, {"_id": user_id}, {}, session)
+
+
+async def award_badge_coins(user_id, achievement_id: str, amount: int, session=None) -> Optional[int]:
+    """
+    Pay a badge's coin reward once and return the new balance, or None if it was already paid.
+
+    The badge is added to rewarded_badges by the same update that adds the
+    coins, so a retried evaluation neither skips nor repeats the payment.
+    """
+    return await _add_coins(
+        user_id,
+        amount,
+        {"_id": user_id, "rewarded_badges": {"$ne": achievement_id}},
+        {"$addToSet": {"rewarded_badges": achievement_id}},
+        session,
+    )
+
+
+async def _add_coins(user_id, amount: int, query: dict, extra_update: dict, session=None) -> Optional[int]:
+    doc = await User.get_motor_collection().find_one_and_update(
+        query,
+        {
+            "$inc": {"scratchy_coins": amount},
+            "$set": {"updated_at": datetime.utcnow()},
+            **extra_update,
+        },
+        projection={"_id": False, "scratchy_coins": True, "display_name": True, "avatar": True},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if doc is None:
+        return None
+
+    COINS_AWARDED.inc(amount)
+    leaderboard.update(
+        str(user_id),
+        scratchy_coins=doc["scratchy_coins"],
+        display_name=doc.get("display_name"),
+        avatar=doc.get("avatar"),
+    )
+    return doc["scratchy_coins"]
+
+
+async def record_lesson_completion(user_id: str, session=None) -> dict:
+    """
+    Count a completed lesson and advance the daily streak in one update.
+
+    The streak is computed server-side from last_activity_date: a gap of one
+    day extends it, a longer gap resets it to 1 and a same-day completion
+    leaves it unchanged.
+    """
+    now = datetime.utcnow()
+    defaults = _progress_defaults(now)
+    days_since_last = {
+        "$dateDiff": {"startDate": "$last_activity_date", "endDate": now, "unit": "day"}
+    }
+
+    pipeline = [
+        {"$set": {
+            **{
+                field: {"$ifNull": [f"${field}", value]}
+                for field, value in defaults.items()
+                if field not in ("last_activity_date", "updated_at")
+            },
+            "total_lessons_completed": {
+                "$add": [{"$ifNull": ["$total_lessons_completed", 0]}, 1]
+            },
+            "current_streak": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": [{"$ifNull": ["$last_activity_date", None]}, None]}, "then": 1},
+                    {
+                        "case": {"$eq": [days_since_last, 1]},
+                        "then": {"$add": [{"$ifNull": ["$current_streak", 0]}, 1]},
+                    },
+                    {"case": {"$gt": [days_since_last, 1]}, "then": 1},
+                ],
+                "default": {"$ifNull": ["$current_streak", 1]},
+            }},
+        }},
+        {"$set": {
+            "longest_streak": {"$max": ["$longest_streak", "$current_streak"]},
+            "last_activity_date": now,
+            "updated_at": now,
+        }},
+    ]
+
+    progress = await Progress.get_motor_collection().find_one_and_update(
+        {"user_id": user_id},
+        pipeline,
+        upsert=True,
+        projection=PROGRESS_SUMMARY_FIELDS,
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    LESSONS_COMPLETED.inc()
+    return progress
+
+
+async def record_daily_challenge(user_id: str, day: date, session=None) -> Optional[dict]:
+    """
+    Mark a day's challenge as completed, or return None if it already was.
+
+    The filter only matches when the day's bit is not yet set in the
+    challenge calendar. If the user's Progress exists but already has the
+    day, the upsert collides with the unique user_id index, which is how
+    "already completed" is detected.
+    """
+    now = datetime.utcnow()
+    on_insert = progress_on_insert(now, "total_challenges_completed", "challenge_calendar", "updated_at")
+
+    try:
+        return await Progress.get_motor_collection().find_one_and_update(
+            {"user_id": user_id, **not_completed_filter(day)},
+            {
+                "$bit": mark_days([day]),
+                "$inc": {"total_challenges_completed": 1},
+                "$set": {"updated_at": now},
+                "$setOnInsert": on_insert,
+            },
+            upsert=True,
+            projection=PROGRESS_SUMMARY_FIELDS,
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+    except DuplicateKeyError:
+        return None
@@ -0,0 +1,115 @@
+"""
+Token Revocation
+In-process list of revoked token versions so access tokens can be checked
+without reading the user.
+
+Every access token carries the user's token_version ("tv" claim). Logging out
+everywhere increments the version in MongoDB and stamps tokens_revoked_at;
+tokens with an older version are then rejected. Each worker keeps the current
+version of every user who revoked within the token lifetime (older
+revocations only concern tokens that have expired anyway) and polls for new
+ones every REVOCATION_POLL_SECONDS, so a revocation made in another worker
+takes effect within one poll interval. The worker that handles the logout
+applies it immediately.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Revocation settings
+REVOCATION_POLL_SECONDS = float(os.getenv("REVOCATION_POLL_SECONDS", "10"))
+# Must cover the access token lifetime (ACCESS_TOKEN_EXPIRE_HOURS)
+REVOCATION_WINDOW_HOURS = float(os.getenv("REVOCATION_WINDOW_HOURS", str(24 * 7)))
+# Re-read slightly overlapping windows to tolerate clock skew between workers
+REVOCATION_POLL_OVERLAP = timedelta(seconds=30)
+
+
+class TokenRevocations:
+    """Current token version of every user who revoked their tokens recently."""
+
+    def __init__(self, window: timedelta):
+        self.window = window
+        # user id -> (token_version, revoked_at)
+        self._versions: Dict[str, Tuple[int, datetime]] = {}
+        self._polled_at: Optional[datetime] = None
+        self._poll_task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.polls = 0
+        self.rejected = 0
+
+    def is_revoked(self, user_id: str, token_version: int) -> bool:
+        """Whether a token with this version was revoked. O(1), no I/O."""
+        entry = self._versions.get(user_id)
+        if entry is not None and token_version < entry[0]:
+            self.rejected += 1
+            return True
+        return False
+
+    def record(self, user_id: str, token_version: int, revoked_at: datetime):
+        """Remember a user's new token version (never moves backwards)."""
+        entry = self._versions.get(user_id)
+        if entry is None or token_version >= entry[0]:
+            self._versions[user_id] = (token_version, revoked_at)
+
+    async def poll(self):
+        """Pick up revocations made since the last poll and forget expired ones."""
+        now = datetime.utcnow()
+        oldest = now - self.window
+        since = max(oldest, self._polled_at - REVOCATION_POLL_OVERLAP) if self._polled_at else oldest
+
+        cursor = User.get_motor_collection().find(
+            # $type matches the partial index filter so the index can be used
+            {"tokens_revoked_at": {"$type": "date", "$gte": since}},
+            projection={"token_version": True, "tokens_revoked_at": True},
+        )
+        async for doc in cursor:
+            self.record(str(doc["_id"]), doc.get("token_version", 0), doc["tokens_revoked_at"])
+
+        for user_id in [user_id for user_id, (_, revoked_at) in self._versions.items() if revoked_at < oldest]:
+            del self._versions[user_id]
+        self._polled_at = now
+        self.polls += 1
+
+    async def _poll_forever(self):
+        while True:
+            await asyncio.sleep(REVOCATION_POLL_SECONDS)
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Token revocation poll failed")
+
+    async def start(self):
+        """Load recent revocations and start polling for new ones."""
+        await self.poll()
+        if REVOCATION_POLL_SECONDS > 0:
+            self._poll_task = asyncio.create_task(self._poll_forever())
+
+    async def stop(self):
+        """Stop polling."""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+
+    def stats(self) -> dict:
+        """Return tracked users and poll counters."""
+        return {
+            "users": len(self._versions),
+            "polled_at": self._polled_at.isoformat() if self._polled_at else None,
+            "polls": self.polls,
+            "rejected": self.rejected,
+        }
+
+
+token_revocations = TokenRevocations(window=timedelta(hours=REVOCATION_WINDOW_HOURS))
@@ -0,0 +1,93 @@
+"""
+Authenticated User Cache
+In-process TTL + LRU cache of User documents used by get_current_user.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.models.user import User
+
+# Cache settings
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class UserCache:
+    """
+    LRU cache of User documents keyed by user id, with a per-entry TTL.
+
+    Routes that change a user must call invalidate() after writing so the
+    next request reloads the document. The TTL bounds how stale an entry can
+    get when the write happened in another worker process.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id) -> Optional[User]:
+        """Return a cached user, or None when missing or expired."""
+        user_id = str(user_id)
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def put(self, user: User):
+        """Store a user, evicting the least recently used entries if full."""
+        if self.max_entries <= 0:
+            return
+        user_id = str(user.id)
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id):
+        """Drop a user so the next lookup goes back to MongoDB."""
+        if self._entries.pop(str(user_id), None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop every cached user."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+user_cache = UserCache(
+    ttl_seconds=USER_CACHE_TTL_SECONDS,
+    max_entries=USER_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,287 @@
+"""
+API Benchmark
+Drives main.app in-process against a MongoDB database and reports throughput,
+latency percentiles and MongoDB commands per request for each operation.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --users 5000 --concurrency 50 --duration 30
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+
+Requests go through httpx's ASGI transport, so no server or network is
+involved and the numbers reflect the application and the database. MongoDB
+commands are counted with a pymongo command listener; a context variable set
+around each request attributes them to the operation that issued them, and
+commands from background tasks (job queue, cache refreshes) are reported
+separately.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Never benchmark against the application database by accident
+os.environ.setdefault("DATABASE_NAME", "lets_learn_bench")
+
+import httpx
+from pymongo import monitoring
+
+from benchmarks.scenarios import MIXES, OPERATIONS, RunContext, login
+
+BACKGROUND = "(background)"
+WARMUP = "(warmup)"
+
+_operation: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("benchmark_operation", default=None)
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts MongoDB commands per benchmark operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def started(self, event):
+        operation = _operation.get() or BACKGROUND
+        with self._lock:
+            self.counts[operation] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, db_commands: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    requests = len(ordered)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "db_ops_per_request": round(db_commands / requests, 2) if requests else 0.0,
+    }
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    ctx: RunContext,
+    mix: Dict[str, int],
+    concurrency: int,
+    duration: float,
+    tag: Optional[str] = None,
+):
+    """Run the mix with `concurrency` workers for `duration` seconds."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            name = ctx.rng.choices(names, weights)[0]
+            token = _operation.set(tag or name)
+            started = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, ctx)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            finally:
+                _operation.reset(token)
+            latencies[name].append(time.perf_counter() - started)
+            if failed:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def prepare(args):
+    """Seed the dataset unless --skip-seed and return the lesson ids to complete."""
+    import seed_data
+    from app.services.content_cache import content_cache
+    from app.services.leaderboard import leaderboard
+
+    if not args.skip_seed:
+        print(f"Seeding {args.users} synthetic users into {os.environ['DATABASE_NAME']}...")
+        await seed_data.seed_lessons()
+        await seed_data.seed_daily_challenges()
+        await seed_data.seed_badge_definitions()
+        await seed_data.generate_synthetic_data(args.users, args.seed, args.batch_size)
+        await content_cache.load()
+        await leaderboard.load()
+
+    lesson_ids = [lesson.lesson_id for lesson in content_cache.lessons]
+    if not lesson_ids:
+        sys.exit("No lessons found; run without --skip-seed first.")
+    return lesson_ids
+
+
+async def run(args) -> dict:
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    # Imported after the listener is registered so the app's client reports to it
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        lesson_ids = await prepare(args)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            # Log in a pool of users whose tokens the authenticated operations share
+            ctx = RunContext(args.users, [], lesson_ids, args.seed)
+            for _ in range(min(args.sessions, args.users)):
+                response = await login(client, ctx)
+                response.raise_for_status()
+                ctx.tokens.append(response.json()["token"])
+
+            if args.warmup:
+                await drive(client, ctx, MIXES[args.mix], args.concurrency, args.warmup, tag=WARMUP)
+
+            counter.reset()
+            latencies, errors, elapsed = await drive(client, ctx, MIXES[args.mix], args.concurrency, args.duration)
+            commands = dict(counter.counts)
+
+    operations = {
+        name: summarize(latencies[name], errors[name], commands.get(name, 0), elapsed)
+        for name in sorted(latencies)
+    }
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    total = summarize(
+        all_latencies,
+        sum(errors.values()),
+        sum(count for name, count in commands.items() if name in latencies),
+        elapsed,
+    )
+    total["background_db_ops"] = commands.get(BACKGROUND, 0)
+
+    return {
+        "config": {
+            "mix": args.mix,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "sessions": args.sessions,
+            "seed": args.seed,
+            "database": os.environ["DATABASE_NAME"],
+            "python": platform.python_version(),
+            "run_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        },
+        "total": total,
+        "operations": operations,
+    }
+
+
+def print_report(result: dict):
+    header = f"{'operation':<18}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'db ops/req':>12}"
+    print()
+    print(header)
+    print("-" * len(header))
+    rows = list(result["operations"].items()) + [("TOTAL", result["total"])]
+    for name, stats in rows:
+        print(
+            f"{name:<18}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput']:>10}"
+            f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['db_ops_per_request']:>12}"
+        )
+    print(f"\nBackground MongoDB commands during the run: {result['total']['background_db_ops']}")
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed beyond tolerance."""
+    regressions = []
+    current = dict(result["operations"], TOTAL=result["total"])
+    previous = dict(baseline["operations"], TOTAL=baseline["total"])
+
+    print(f"\nCompared with baseline from {baseline['config'].get('run_at', 'unknown')} (tolerance {tolerance:.0%}):")
+    for name, stats in current.items():
+        before = previous.get(name)
+        if before is None:
+            continue
+        checks = [
+            ("throughput", stats["throughput"], before["throughput"], -1),
+            ("p95_ms", stats["p95_ms"], before["p95_ms"], 1),
+            ("p99_ms", stats["p99_ms"], before["p99_ms"], 1),
+            ("db_ops_per_request", stats["db_ops_per_request"], before["db_ops_per_request"], 1),
+        ]
+        for metric, now, then, worse in checks:
+            if not then:
+                continue
+            change = (now - then) / then
+            flag = ""
+            if change * worse > tolerance:
+                flag = "  <-- regression"
+                regressions.append(f"{name}.{metric}: {then} -> {now}")
+            print(f"  {name:<18}{metric:<20}{then:>10} -> {now:<10}({change:+.1%}){flag}")
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the Lets Learn API hot paths.")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed", help="weighted operation mix")
+    parser.add_argument("--users", type=int, default=2000, help="synthetic users in the dataset")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent simulated clients")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument("--sessions", type=int, default=200, help="users logged in before the run")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and request choice")
+    parser.add_argument("--batch-size", type=int, default=1000, help="insert batch size when seeding")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the dataset from a previous run")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--save-baseline", help="write the results to this file as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}.")
+            sys.exit(1)
+        print("\nNo regressions beyond tolerance.")
+
+
+if __name__ == "__main__":
+    main()
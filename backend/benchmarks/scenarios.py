@@ -0,0 +1,92 @@
+"""
+Benchmark Scenarios
+The API operations the benchmark drives and the weighted mixes they run in.
+
+Each operation is an async function taking the shared httpx client and the
+run context and returning the response. Mixes map operation names to weights.
+"""
+
+import random
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from seed_data import SYNTHETIC_PASSWORD, synthetic_email
+
+
+class RunContext:
+    """State shared by the benchmark workers."""
+
+    def __init__(self, users: int, tokens: List[str], lesson_ids: List[str], seed: int):
+        self.users = users
+        self.tokens = tokens
+        self.lesson_ids = lesson_ids
+        self.rng = random.Random(seed)
+
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+
+Operation = Callable[[httpx.AsyncClient, RunContext], Awaitable[httpx.Response]]
+
+
+async def login(client: httpx.AsyncClient, ctx: RunContext) -> httpx.Response:
+    return await client.post("/api/auth/login", json={
+        "email": synthetic_email(ctx.rng.randrange(ctx.users)),
+        "password": SYNTHETIC_PASSWORD,
+    })
+
+
+async def me(client: httpx.AsyncClient, ctx: RunContext) -> httpx.Response:
+    return await client.get("/api/auth/me", headers=ctx.auth())
+
+
+async def lessons(client: httpx.AsyncClient, ctx: RunContext) -> httpx.Response:
+    return await client.get("/api/lessons", params={"lang": ctx.rng.choice(("en", "ar"))})
+
+
+async def daily_challenge(client: httpx.AsyncClient, ctx: RunContext) -> httpx.Response:
+    return await client.get("/api/daily-challenge", params={"lang": ctx.rng.choice(("en", "ar"))})
+
+
+async def leaderboard(client: httpx.AsyncClient, ctx: RunContext) -> httpx.Response:
+    return await client.get("/api/leaderboard", params={"limit": 10})
+
+
+async def progress(client: httpx.AsyncClient, ctx: RunContext) -> httpx.Response:
+    return await client.get("/api/progress", headers=ctx.auth())
+
+
+async def complete_lesson(client: httpx.AsyncClient, ctx: RunContext) -> httpx.Response:
+    return await client.post(
+        f"/api/progress/lesson/{ctx.rng.choice(ctx.lesson_ids)}/complete",
+        params={"coins_earned": 10},
+        headers=ctx.auth(),
+    )
+
+
+OPERATIONS: Dict[str, Operation] = {
+    "login": login,
+    "me": me,
+    "lessons": lessons,
+    "daily_challenge": daily_challenge,
+    "leaderboard": leaderboard,
+    "progress": progress,
+    "complete_lesson": complete_lesson,
+}
+
+MIXES: Dict[str, Dict[str, int]] = {
+    # Typical traffic: mostly reads, some lesson completions, few logins
+    "mixed": {
+        "login": 2,
+        "me": 20,
+        "lessons": 20,
+        "daily_challenge": 8,
+        "leaderboard": 20,
+        "progress": 15,
+        "complete_lesson": 15,
+    },
+    "browse": {"lessons": 30, "daily_challenge": 10, "leaderboard": 30, "me": 15, "progress": 15},
+    "write": {"complete_lesson": 60, "me": 20, "leaderboard": 20},
+    "login": {"login": 100},
+}
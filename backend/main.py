@@ -5,11 +5,26 @@ that teaches 7-year-old children Scratch programming.
 """
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from app.database.connection import init_db
-from app.routers import auth, progress, badges
+from app.database.connection import init_db, close_db
+from app.database.monitoring import DBStatsMiddleware
+from app.routers import auth, progress, badges, sync, classes, admin, stream
+from app.services.hashing import hasher
+from app.services.leaderboard import leaderboard
+from app.services.live_updates import live_updates
+from app.services.content_cache import content_cache
+from app.services.jobs import job_queue
+from app.services.analytics import rollup_scheduler
+from app.services.lesson_tracking import heartbeat_buffer
+from app.services.health import health_monitor
+from app.services.token_revocation import token_revocations
+from app.services.response_cache import catalog_responses
+from app.services.metrics import registry, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.services.i18n import resolve_language, project_language, LANGUAGE_PATTERN
 
 
 @asynccontextmanager
@@ -17,8 +32,29 @@ async def lifespan(app: FastAPI):
     """Manage application lifecycle - initialize and cleanup resources."""
     # Startup: Initialize MongoDB connection
     await init_db()
+    await content_cache.start()
+    await leaderboard.start()
+    await live_updates.start()
+    await job_queue.start()
+    await token_revocations.start()
+    await rollup_scheduler.start()
+    await heartbeat_buffer.start()
+    await health_monitor.start()
     yield
-    # Shutdown: Cleanup (if needed)
+    # Shutdown: stop health checks, end live streams, stop the rollup
+    # scheduler, flush buffered heartbeats, finish queued jobs, stop the
+    # revocation, leaderboard and content refreshes, release the password
+    # hashing pool and close the database pool
+    await health_monitor.stop()
+    await live_updates.stop()
+    await rollup_scheduler.stop()
+    await heartbeat_buffer.stop()
+    await job_queue.drain()
+    await token_revocations.stop()
+    await leaderboard.stop()
+    await content_cache.stop()
+    hasher.shutdown()
+    await close_db()
 
 
 app = FastAPI(
@@ -28,6 +64,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Count MongoDB commands per request (and expose them as headers in debug mode)
+app.add_middleware(DBStatsMiddleware)
+
 # Configure CORS for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -37,10 +76,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms for /metrics. Added last so it is outermost and
+# also times CORS preflights and rejections (as "(unmatched)" routes)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(progress.router)
 app.include_router(badges.router)
+app.include_router(sync.router)
+app.include_router(classes.router)
+app.include_router(admin.router)
+app.include_router(stream.router)
 
 
 @app.get("/")
@@ -55,18 +102,42 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/live")
+async def liveness_probe():
+    """Liveness probe: the process is up. Never touches the database."""
+    return health_monitor.liveness()
+
+
+@app.get("/health/ready")
+async def readiness_probe():
+    """Readiness probe: database reachable, pool not saturated, caches loaded."""
+    # Reads the verdict kept by the background health check, so probes are O(1)
+    ready, checks = health_monitor.readiness()
+    return JSONResponse(checks, status_code=200 if ready else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in the text exposition format."""
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/api/lessons")
-async def get_lessons():
+async def get_lessons(
+    request: Request,
+    lang: Optional[str] = Query(None, pattern=LANGUAGE_PATTERN)
+):
     """Get list of Scratch programming lessons for kids."""
-    # Import here to avoid circular imports during startup
-    from app.models.course import Lesson
-    
-    # Get lessons from MongoDB (excluding daily challenges)
-    lessons = await Lesson.find(Lesson.course_id != "daily_challenges").sort("+order").to_list()
-    
+    # Served as pre-encoded JSON built once per content version and language
+    lang = resolve_language(request, lang)
+    return catalog_responses.respond(request, ("lessons", lang), lambda: _build_lessons(lang))
+
+
+def _build_lessons(lang: str) -> dict:
+    """Build the lesson list from the content cache (excluding daily challenges)."""
     return {
         "lessons": [
-            {
+            project_language({
                 "id": lesson.lesson_id,
                 "title": lesson.title,
                 "title_ar": lesson.title_ar,
@@ -78,8 +149,8 @@ async def get_lessons():
                 "character_name": lesson.character_name,
                 "character_joke": lesson.character_intro_joke,
                 "character_joke_ar": lesson.character_intro_joke_ar
-            }
-            for lesson in lessons
+            }, lang, ("title", "description", "character_joke"))
+            for lesson in content_cache.lessons
         ]
     }
 
@@ -1,25 +1,70 @@
 """
 Database Seed Script
 Populates MongoDB with initial lessons, daily challenges, and badge definitions.
-Run this script once to initialize the database with default data.
+
+Content is written with bulk upserts keyed by lesson_id / achievement_id, so the
+script can be re-run after editing the data below and only changed documents
+are touched. With --synthetic-users N it also generates N users with progress,
+lesson progress and achievements for load testing.
 """
 
+import argparse
 import asyncio
-from app.database.connection import init_db
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.database.connection import init_db, close_db
+from app.models.user import User
+from app.models.progress import Progress, LessonProgress
 from app.models.course import Lesson
-from app.models.achievement import AchievementDefinition
+from app.models.achievement import Achievement, AchievementDefinition
+from app.services.activity_calendar import encode_days
+from app.services.content_cache import bump_content_version, DAILY_CHALLENGE_COURSE
+from app.services.hashing import hasher
+
+# Synthetic users all share this username prefix and password
+SYNTHETIC_PREFIX = "synthetic_"
+SYNTHETIC_PASSWORD = "synthetic-password"
+SYNTHETIC_HISTORY_DAYS = 60
+
+# Fields managed by MongoDB / set only when a document is created
+_SERVER_FIELDS = {"id", "revision_id"}
+_INSERT_ONLY_FIELDS = {"created_at", "updated_at"}
+
+
+async def upsert_content(model, key_field: str, items: List[dict], label: str) -> int:
+    """
+    Upsert content documents keyed by key_field and return how many changed.
 
+    Defaults come from the model, creation timestamps are only written on
+    insert, and unchanged documents are not modified.
+    """
+    requests = []
+    for item in items:
+        fields = model(**item).model_dump(exclude=_SERVER_FIELDS)
+        on_insert = {field: fields.pop(field) for field in _INSERT_ONLY_FIELDS if field in fields}
+        requests.append(UpdateOne(
+            {key_field: fields[key_field]},
+            {"$set": fields, "$setOnInsert": on_insert},
+            upsert=True,
+        ))
 
-async def seed_lessons():
-    """Seed initial lessons into the database."""
+    result = await model.get_motor_collection().bulk_write(requests, ordered=False)
+    print(
+        f"  {label}: {result.upserted_count} created, {result.modified_count} updated, "
+        f"{len(items) - result.upserted_count - result.modified_count} unchanged"
+    )
+    return result.upserted_count + result.modified_count
+
+
+async def seed_lessons() -> int:
+    """Upsert the default lessons."""
     print("Seeding lessons...")
     
-    # Check if lessons already exist
-    existing_lessons = await Lesson.find_all().to_list()
-    if existing_lessons:
-        print(f"Found {len(existing_lessons)} existing lessons. Skipping lesson seeding.")
-        return
-    
     lessons_data = [
         {
             "lesson_id": "lesson_001",
@@ -68,24 +113,13 @@ async def seed_lessons():
         },
     ]
     
-    for lesson_data in lessons_data:
-        lesson = Lesson(**lesson_data)
-        await lesson.insert()
-        print(f"  ✓ Created lesson: {lesson.title}")
-    
-    print(f"Successfully seeded {len(lessons_data)} lessons!")
+    return await upsert_content(Lesson, "lesson_id", lessons_data, "lessons")
 
 
-async def seed_daily_challenges():
-    """Seed daily challenges as lessons with a special category."""
+async def seed_daily_challenges() -> int:
+    """Upsert daily challenges as lessons with a special category."""
     print("Seeding daily challenges...")
     
-    # Check if daily challenges already exist
-    existing_challenges = await Lesson.find(Lesson.course_id == "daily_challenges").to_list()
-    if existing_challenges:
-        print(f"Found {len(existing_challenges)} existing daily challenges. Skipping daily challenge seeding.")
-        return
-    
     challenges_data = [
         {
             "lesson_id": "dc_001",
@@ -194,24 +228,13 @@ async def seed_daily_challenges():
         },
     ]
     
-    for challenge_data in challenges_data:
-        challenge = Lesson(**challenge_data)
-        await challenge.insert()
-        print(f"  ✓ Created daily challenge: {challenge.title}")
-    
-    print(f"Successfully seeded {len(challenges_data)} daily challenges!")
+    return await upsert_content(Lesson, "lesson_id", challenges_data, "daily challenges")
 
 
-async def seed_badge_definitions():
-    """Seed badge definitions into the database."""
+async def seed_badge_definitions() -> int:
+    """Upsert the badge definitions."""
     print("Seeding badge definitions...")
     
-    # Check if badges already exist
-    existing_badges = await AchievementDefinition.find_all().to_list()
-    if existing_badges:
-        print(f"Found {len(existing_badges)} existing badge definitions. Skipping badge seeding.")
-        return
-    
     badges_data = [
         {
             "achievement_id": "first_steps",
@@ -313,16 +336,237 @@ async def seed_badge_definitions():
         },
     ]
     
-    for badge_data in badges_data:
-        badge = AchievementDefinition(**badge_data)
-        await badge.insert()
-        print(f"  ✓ Created badge: {badge.title}")
-    
-    print(f"Successfully seeded {len(badges_data)} badge definitions!")
+    return await upsert_content(AchievementDefinition, "achievement_id", badges_data, "badge definitions")
+
+
+def synthetic_username(index: int) -> str:
+    return f"{SYNTHETIC_PREFIX}{index:07d}"
+
+
+def synthetic_email(index: int) -> str:
+    return f"{synthetic_username(index)}@example.com"
+
+
+def _geometric(rng: random.Random, p: float, cap: int) -> int:
+    """Failures before the first success with probability p, capped at cap."""
+    count = 0
+    while count < cap and rng.random() > p:
+        count += 1
+    return count
+
+
+def _synthetic_user(
+    rng: random.Random,
+    index: int,
+    password_hash: str,
+    lessons: List[Lesson],
+    challenges: List[Lesson],
+    badges: List[AchievementDefinition],
+    now: datetime,
+) -> dict:
+    """
+    Build one synthetic user with consistent progress documents.
+
+    Activity is long-tailed: most users complete a lesson or two and a few
+    challenges, a small share go through everything with long streaks.
+    Counters, coins and earned badges agree with the generated rows.
+    """
+    user_id = ObjectId()
+    user_key = str(user_id)
+    created_at = now - timedelta(days=rng.randint(1, SYNTHETIC_HISTORY_DAYS))
+    last_activity = max(created_at, now - timedelta(days=rng.expovariate(1 / 5)))
+
+    # Lessons are taken in order; the next one may be in progress
+    completed = _geometric(rng, 0.35, len(lessons))
+    lesson_rows = []
+    coins = 0
+    time_spent = 0
+    for position, lesson in enumerate(lessons[:completed + 1]):
+        done = position < completed
+        if not done and rng.random() < 0.5:
+            break
+        seconds = int(lesson.duration_minutes * 60 * rng.uniform(0.6, 1.8) * (1 if done else rng.random()))
+        earned = lesson.coins_reward if done else 0
+        coins += earned
+        time_spent += seconds
+        started_at = created_at + (last_activity - created_at) * rng.random()
+        lesson_rows.append({
+            "user_id": user_key,
+            "lesson_id": lesson.lesson_id,
+            "course_id": lesson.course_id,
+            "status": "completed" if done else "in_progress",
+            "completion_percentage": 100 if done else rng.randint(5, 95),
+            "time_spent_seconds": seconds,
+            "attempts": 1 + _geometric(rng, 0.7, 4),
+            "hints_used": _geometric(rng, 0.6, 5),
+            "coins_earned": earned,
+            "started_at": started_at,
+            "completed_at": started_at + timedelta(seconds=seconds) if done else None,
+            "last_accessed": last_activity,
+        })
+
+    # Daily challenges on distinct days within the user's lifetime
+    lifetime_days = max(1, (now - created_at).days)
+    challenge_days = sorted(rng.sample(range(lifetime_days), min(lifetime_days, _geometric(rng, 0.12, 40))))
+    challenge_dates = [(now - timedelta(days=days_ago)).date() for days_ago in challenge_days]
+    for day in challenge_dates:
+        if challenges:
+            coins += challenges[day.timetuple().tm_yday % len(challenges)].coins_reward
 
+    # Streaks only survive if the user was active today or yesterday
+    longest_streak = _geometric(rng, 0.3, 30) + (1 if completed else 0)
+    current_streak = rng.randint(1, longest_streak) if longest_streak and (now - last_activity).days <= 1 else 0
 
-async def main():
+    # Extra coins from the add-coins endpoint
+    coins += int(rng.lognormvariate(2.5, 1.2)) if rng.random() < 0.4 else 0
+
+    counters = {
+        "lessons_completed": completed,
+        "challenges_completed": len(challenge_dates),
+        "puzzles_completed": len(challenge_dates),
+        "streak_days": longest_streak,
+        "total_coins": coins,
+    }
+    achievements = []
+    for badge in badges:
+        if counters.get(badge.requirement_type, 0) >= badge.requirement_value:
+            coins += badge.coins_reward
+            achievements.append({
+                "user_id": user_key,
+                "achievement_id": badge.achievement_id,
+                "earned_at": last_activity,
+                "context": "Synthetic data",
+            })
+
+    role = rng.choices(["student", "parent", "teacher"], weights=[95, 4, 1])[0]
+    return {
+        "user": {
+            "_id": user_id,
+            "username": synthetic_username(index),
+            "display_name": f"Synthetic {index}",
+            "email": synthetic_email(index),
+            "password_hash": password_hash,
+            "avatar": "default_avatar",
+            "role": role,
+            "scratchy_coins": coins,
+            "unlocked_skins": [],
+            "rewarded_badges": [doc["achievement_id"] for doc in achievements],
+            "preferred_language": rng.choices(["ar", "en"], weights=[60, 40])[0],
+            "created_at": created_at,
+            "updated_at": last_activity,
+            "last_login": last_activity,
+        },
+        "progress": {
+            "user_id": user_key,
+            "total_lessons_completed": completed,
+            "total_courses_completed": 1 if lessons and completed == len(lessons) else 0,
+            "total_challenges_completed": len(challenge_dates),
+            "total_time_spent_seconds": time_spent,
+            "current_streak": current_streak,
+            "longest_streak": max(longest_streak, current_streak),
+            "last_activity_date": last_activity,
+            "challenge_calendar": encode_days(challenge_dates),
+            "created_at": created_at,
+            "updated_at": last_activity,
+        },
+        "lesson_progress": lesson_rows,
+        "achievements": achievements,
+    }
+
+
+async def clear_synthetic_data(batch_size: int = 1000) -> int:
+    """Delete synthetic users and everything keyed by their ids."""
+    users = User.get_motor_collection()
+    cursor = users.find({"username": {"$regex": f"^{SYNTHETIC_PREFIX}"}}, projection={"_id": True})
+    deleted = 0
+    batch: List[ObjectId] = []
+
+    async def flush():
+        keys = [str(user_id) for user_id in batch]
+        for model in (Progress, LessonProgress, Achievement):
+            await model.get_motor_collection().delete_many({"user_id": {"$in": keys}})
+        await users.delete_many({"_id": {"$in": batch}})
+
+    async for doc in cursor:
+        batch.append(doc["_id"])
+        if len(batch) >= batch_size:
+            await flush()
+            deleted += len(batch)
+            batch = []
+    if batch:
+        await flush()
+        deleted += len(batch)
+    return deleted
+
+
+async def generate_synthetic_data(users: int, seed: Optional[int] = 42, batch_size: int = 1000) -> dict:
+    """
+    Replace the synthetic dataset with `users` generated users.
+
+    Content must already be seeded. Documents are written with unordered
+    insert_many batches; every synthetic user logs in with SYNTHETIC_PASSWORD.
+    Returns the number of documents written per collection.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    all_lessons = await Lesson.find_all().sort("+order").to_list()
+    lessons = [lesson for lesson in all_lessons if lesson.course_id != DAILY_CHALLENGE_COURSE]
+    challenges = [lesson for lesson in all_lessons if lesson.course_id == DAILY_CHALLENGE_COURSE]
+    badges = await AchievementDefinition.find_all().to_list()
+
+    removed = await clear_synthetic_data(batch_size)
+    if removed:
+        print(f"  Removed {removed} existing synthetic users")
+
+    # One bcrypt hash shared by every synthetic user
+    password_hash = await hasher.hash(SYNTHETIC_PASSWORD)
+
+    collections = {
+        "user": User.get_motor_collection(),
+        "progress": Progress.get_motor_collection(),
+        "lesson_progress": LessonProgress.get_motor_collection(),
+        "achievements": Achievement.get_motor_collection(),
+    }
+    counts = dict.fromkeys(collections, 0)
+    pending = {name: [] for name in collections}
+
+    async def flush():
+        for name, docs in pending.items():
+            if docs:
+                await collections[name].insert_many(docs, ordered=False)
+                counts[name] += len(docs)
+                pending[name] = []
+
+    for index in range(users):
+        generated = _synthetic_user(rng, index, password_hash, lessons, challenges, badges, now)
+        pending["user"].append(generated["user"])
+        pending["progress"].append(generated["progress"])
+        pending["lesson_progress"].extend(generated["lesson_progress"])
+        pending["achievements"].extend(generated["achievements"])
+        if len(pending["user"]) >= batch_size:
+            await flush()
+            print(f"  ✓ {counts['user']}/{users} users")
+    await flush()
+
+    return counts
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Seed the Lets Learn database.")
+    parser.add_argument(
+        "--synthetic-users", type=int, default=0,
+        help="also generate this many synthetic users (replaces earlier synthetic data)",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the generator")
+    parser.add_argument("--batch-size", type=int, default=1000, help="documents per insert_many batch")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
     """Main function to run all seeding operations."""
+    args = parse_args(argv)
+
     print("=" * 60)
     print("Starting Database Seeding...")
     print("=" * 60)
@@ -331,11 +575,27 @@ async def main():
     await init_db()
     
     # Run all seeding operations
-    await seed_lessons()
+    changed = await seed_lessons()
     print()
-    await seed_daily_challenges()
+    changed += await seed_daily_challenges()
     print()
-    await seed_badge_definitions()
+    changed += await seed_badge_definitions()
+    
+    # Tell running API workers to reload their content cache
+    if changed:
+        version = await bump_content_version()
+        print()
+        print(f"Content version is now {version}")
+    
+    if args.synthetic_users:
+        print()
+        print(f"Generating {args.synthetic_users} synthetic users...")
+        counts = await generate_synthetic_data(args.synthetic_users, args.seed, args.batch_size)
+        print("  " + ", ".join(f"{name}: {count}" for name, count in counts.items()))
+        print(f"  Log in as {synthetic_email(0)} with password {SYNTHETIC_PASSWORD!r}")
+        hasher.shutdown()
+    
+    await close_db()
     
     print()
     print("=" * 60)
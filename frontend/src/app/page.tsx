@@ -14,11 +14,21 @@ import { TutorialView, LessonCard } from '@/components/tutorial/TutorialView';
 import { BadgeGrid } from '@/components/badges/BadgeDisplay';
 import { useAuth } from '@/contexts/AuthContext';
 import { useProgress } from '@/contexts/ProgressContext';
-import { fetchLessons, fetchLeaderboard } from '@/services/api';
+import { fetchLessons, fetchLeaderboard, subscribeToLiveUpdates } from '@/services/api';
+import type { ApiLeaderboardEntry } from '@/services/api';
 import type { Lesson, LeaderboardEntry } from '@/types';
 
 type View = 'home' | 'playground' | 'dashboard' | 'avatar' | 'leaderboard' | 'tutorial';
 
+// Transform API data to match frontend LeaderboardEntry type
+const toLeaderboardEntry = (entry: ApiLeaderboardEntry): LeaderboardEntry => ({
+  rank: entry.rank || 0,
+  userId: entry.user_id || '',
+  displayName: entry.display_name || '',
+  avatar: entry.avatar || 'default_avatar',
+  scratchyCoins: entry.scratchy_coins || 0,
+});
+
 export default function Home() {
   const { t } = useTranslation();
   const { user, isAuthenticated } = useAuth();
@@ -80,15 +90,7 @@ export default function Home() {
       try {
         setIsLoadingLeaderboard(true);
         const data = await fetchLeaderboard(10);
-        // Transform API data to match frontend LeaderboardEntry type
-        const transformedLeaderboard: LeaderboardEntry[] = data.map((entry) => ({
-          rank: entry.rank || 0,
-          userId: entry.user_id || '',
-          displayName: entry.display_name || '',
-          avatar: entry.avatar || 'default_avatar',
-          scratchyCoins: entry.scratchy_coins || 0,
-        }));
-        setLeaderboardEntries(transformedLeaderboard);
+        setLeaderboardEntries(data.map(toLeaderboardEntry));
       } catch (error) {
         console.error('Failed to fetch leaderboard:', error);
         // Keep leaderboard empty on error
@@ -100,6 +102,30 @@ export default function Home() {
     loadLeaderboard();
   }, []);
 
+  // Live leaderboard and coin updates while signed in, instead of polling
+  useEffect(() => {
+    if (!isAuthenticated) return;
+
+    return subscribeToLiveUpdates({
+      onSnapshot: (entries, me) => {
+        setLeaderboardEntries(entries.map(toLeaderboardEntry));
+        setIsLoadingLeaderboard(false);
+        if (me.scratchy_coins !== null) setScratchyCoins(me.scratchy_coins);
+      },
+      onLeaderboard: (changed, removed) => {
+        setLeaderboardEntries(prev => {
+          const updated = new Map(prev.map(entry => [entry.userId, entry] as const));
+          removed.forEach(userId => updated.delete(userId));
+          changed.forEach(entry => updated.set(entry.user_id, toLeaderboardEntry(entry)));
+          return [...updated.values()].sort((a, b) => a.rank - b.rank);
+        });
+      },
+      onMe: (me) => {
+        if (me.scratchy_coins !== null) setScratchyCoins(me.scratchy_coins);
+      },
+    });
+  }, [isAuthenticated]);
+
   const handleEarnCoins = (amount: number) => {
     setScratchyCoins(prev => prev + amount);
   };
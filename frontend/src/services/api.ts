@@ -22,7 +22,7 @@ interface ApiLesson {
   character_joke_ar?: string;
 }
 
-interface ApiLeaderboardEntry {
+export interface ApiLeaderboardEntry {
   rank: number;
   user_id: string;
   display_name: string;
@@ -98,7 +98,7 @@ function createHeaders(includeAuth: boolean = false): HeadersInit {
  * Fetch lessons from the backend
  */
 export async function fetchLessons(): Promise<ApiLesson[]> {
-  const response = await fetch(`${API_URL}/api/lessons`, {
+  const response = await fetch(`${API_URL}/api/lessons?lang=both`, {
     headers: createHeaders(),
   });
   
@@ -161,7 +161,7 @@ export async function completeLesson(lessonId: string, coinsEarned: number): Pro
  * Fetch daily challenge from the backend
  */
 export async function fetchDailyChallenge(): Promise<ApiDailyChallenge> {
-  const response = await fetch(`${API_URL}/api/daily-challenge`, {
+  const response = await fetch(`${API_URL}/api/daily-challenge?lang=both`, {
     headers: createHeaders(),
   });
   
@@ -193,7 +193,7 @@ export async function completeDailyChallenge(): Promise<{ message: string; coins
  * Fetch all badge definitions from the backend
  */
 export async function fetchBadges(): Promise<ApiBadge[]> {
-  const response = await fetch(`${API_URL}/api/badges/`, {
+  const response = await fetch(`${API_URL}/api/badges/?lang=both`, {
     headers: createHeaders(),
   });
   
@@ -203,3 +203,98 @@ export async function fetchBadges(): Promise<ApiBadge[]> {
   
   return response.json();
 }
+
+/**
+ * Get a short-lived token for opening the live updates stream
+ */
+export async function fetchStreamToken(): Promise<{ token: string; expires_in: number }> {
+  const response = await fetch(`${API_URL}/api/stream/token`, {
+    method: 'POST',
+    headers: createHeaders(true),
+  });
+  
+  if (!response.ok) {
+    throw new Error('Failed to get stream token');
+  }
+  
+  return response.json();
+}
+
+export interface LiveUpdateHandlers {
+  onSnapshot: (leaderboard: ApiLeaderboardEntry[], me: ApiLivePosition) => void;
+  onLeaderboard: (changed: ApiLeaderboardEntry[], removed: string[]) => void;
+  onMe: (me: ApiLivePosition) => void;
+}
+
+interface ApiLivePosition {
+  scratchy_coins: number | null;
+  rank: number | null;
+}
+
+const LIVE_RETRY_MIN_MS = 1000;
+const LIVE_RETRY_MAX_MS = 30000;
+
+/**
+ * Subscribe to leaderboard and coin updates over Server-Sent Events
+ * Stream tokens are only valid for a minute, so EventSource's own reconnect
+ * (same URL) would be refused: every reconnect fetches a new token instead.
+ * Returns a function that closes the stream.
+ */
+export function subscribeToLiveUpdates(handlers: LiveUpdateHandlers): () => void {
+  let source: EventSource | null = null;
+  let timer: ReturnType<typeof setTimeout> | null = null;
+  let retryMs = LIVE_RETRY_MIN_MS;
+  let closed = false;
+
+  const reconnect = (delayMs: number) => {
+    source?.close();
+    source = null;
+    if (!closed && timer === null) {
+      timer = setTimeout(() => {
+        timer = null;
+        connect();
+      }, delayMs);
+    }
+  };
+
+  const backOff = () => {
+    reconnect(retryMs);
+    retryMs = Math.min(retryMs * 2, LIVE_RETRY_MAX_MS);
+  };
+
+  const connect = async () => {
+    let token: string;
+    try {
+      token = (await fetchStreamToken()).token;
+    } catch {
+      backOff();
+      return;
+    }
+    if (closed) return;
+
+    source = new EventSource(`${API_URL}/api/stream?token=${encodeURIComponent(token)}`);
+    source.addEventListener('snapshot', (event) => {
+      retryMs = LIVE_RETRY_MIN_MS;
+      const data = JSON.parse((event as MessageEvent).data);
+      handlers.onSnapshot(data.leaderboard, data.me);
+    });
+    source.addEventListener('leaderboard', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      handlers.onLeaderboard(data.changed, data.removed);
+    });
+    source.addEventListener('me', (event) => {
+      handlers.onMe(JSON.parse((event as MessageEvent).data));
+    });
+    // Sent when the server ends the stream on purpose
+    source.addEventListener('reconnect', () => reconnect(0));
+    source.onerror = backOff;
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    if (timer !== null) clearTimeout(timer);
+    source?.close();
+  };
+}